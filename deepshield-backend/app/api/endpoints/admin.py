@@ -1,27 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
 from datetime import datetime
 
-from ...models.user import User, UserInDB
-from ...models.content import ContentFlag
-from ...core.security import get_current_admin_user
-from ...db.mongodb import get_database
+from ...models.user import User, UserPage
+from ...models.content import ContentFlag, ContentFlagPage
+from ...db.mongodb import get_database, get_reporting_database
+from ...db.pagination import paginate, projection
+from ..deps import get_current_admin_user
 
 router = APIRouter()
 
-@router.get("/users", response_model=List[UserInDB])
+# Never includes hashed_password
+USER_LIST_FIELDS = ("email", "username", "full_name", "is_verified", "verification_status", "created_at", "profile_image")
+FLAG_LIST_FIELDS = ("content_id", "user_id", "reason", "status", "created_at", "updated_at", "updated_by")
+
+@router.get("/users", response_model=UserPage)
 async def get_all_users(
-    current_admin: User = Depends(get_current_admin_user),
-    db = Depends(get_database)
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_token of the previous page"),
+    current_admin: dict = Depends(get_current_admin_user),
+    db = Depends(get_reporting_database)
 ):
-    """Get all users (admin only)"""
-    users = await db["users"].find().to_list(1000)
-    return [UserInDB(**user) for user in users]
+    """Get all users, newest first, one page at a time (admin only)"""
+    page = await paginate(db["users"], {}, limit=limit, token=cursor, fields=projection(USER_LIST_FIELDS))
+    return UserPage(
+        items=[User(**{**user, "id": str(user["_id"])}) for user in page["items"]],
+        next_token=page["next_token"]
+    )
 
 @router.post("/users/{user_id}/verify")
 async def verify_user(
     user_id: str,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: dict = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Verify a user (admin only)"""
@@ -33,20 +43,27 @@ async def verify_user(
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User verified successfully"}
 
-@router.get("/flags", response_model=List[ContentFlag])
+@router.get("/flags", response_model=ContentFlagPage)
 async def get_content_flags(
-    current_admin: User = Depends(get_current_admin_user),
-    db = Depends(get_database)
+    status: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_token of the previous page"),
+    current_admin: dict = Depends(get_current_admin_user),
+    db = Depends(get_reporting_database)
 ):
-    """Get all content flags (admin only)"""
-    flags = await db["content_flags"].find().to_list(1000)
-    return [ContentFlag(**flag) for flag in flags]
+    """Get content flags, newest first, optionally by status (admin only)"""
+    query = {"status": status} if status else {}
+    page = await paginate(db["content_flags"], query, limit=limit, token=cursor, fields=projection(FLAG_LIST_FIELDS))
+    return ContentFlagPage(
+        items=[ContentFlag(**{**flag, "id": str(flag["_id"])}) for flag in page["items"]],
+        next_token=page["next_token"]
+    )
 
 @router.patch("/flags/{flag_id}")
 async def update_flag_status(
     flag_id: str,
     status: str,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: dict = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Update content flag status (admin only)"""
@@ -63,7 +80,7 @@ async def update_flag_status(
             "$set": {
                 "status": status,
                 "updated_at": datetime.utcnow(),
-                "updated_by": current_admin.id
+                "updated_by": str(current_admin["_id"])
             }
         }
     )
@@ -73,8 +90,8 @@ async def update_flag_status(
 
 @router.get("/stats")
 async def get_admin_stats(
-    current_admin: User = Depends(get_current_admin_user),
-    db = Depends(get_database)
+    current_admin: dict = Depends(get_current_admin_user),
+    db = Depends(get_reporting_database)
 ):
     """Get admin dashboard statistics"""
     total_users = await db["users"].count_documents({})
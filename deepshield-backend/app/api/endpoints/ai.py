@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Dict, Any, Optional
-import aiofiles
+from contextlib import AsyncExitStack
+import asyncio
+import json
 import os
-from datetime import datetime
 from ...services.ai.deepfake_detection import DeepfakeDetector
 from ...services.ai.content_moderation import ContentModerator
 from ...services.ai.face_verification import FaceVerifier
+from ...services.ai.admission import AdmissionTicket, admission_controller
+from ...services.ai.deadline import Deadline, DEADLINE_HEADER
+from ...services.storage import blob_store, read_upload, upload_retention
+from ...services.jobs import job_queue, ANALYSIS_QUEUE
+from ...config import settings
 from ..deps import get_current_user
-from .notifications import notify_content_flagged, notify_media_misuse
+from ...services.notifications.content_notifications import notify_content_flagged, notify_media_misuse
 
 router = APIRouter()
 
@@ -19,29 +27,105 @@ face_verifier = FaceVerifier()
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-async def save_upload_file(upload_file: UploadFile) -> str:
-    """Save uploaded file and return the file path"""
-    timestamp = datetime.utcnow().timestamp()
-    file_path = os.path.join(UPLOAD_DIR, f"{timestamp}_{upload_file.filename}")
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await upload_file.read()
-        await out_file.write(content)
-    return file_path
+async def inference_slot(request: Request):
+    """Admission control around model work"""
+    async with admission_controller.admit(request.url.path) as ticket:
+        yield ticket
 
-from .notifications import notify_media_misuse
+async def deepfake_slot(request: Request, background: bool = False):
+    """Admission control for deepfake analysis; background submissions only enqueue"""
+    if background:
+        yield None
+        return
+    async with admission_controller.admit(request.url.path) as ticket:
+        yield ticket
+
+DISCONNECT_POLL_SECONDS = 0.5
+# How long a disconnected stream's body gets to exit on its own before its resources are released
+STREAM_RELEASE_GRACE_SECONDS = 5.0
+
+# Disconnect watchers of running video streams (referenced so they are not collected)
+_stream_watchers: set = set()
+
+async def request_deadline(request: Request):
+    """Deadline from the X-Request-Timeout header (or config), cancelled when the client disconnects"""
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+
+    async def watch_disconnect():
+        while not deadline.expired():
+            if await request.is_disconnected():
+                deadline.cancel()
+                return
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
+
+def degraded_image_size(ticket: Optional[AdmissionTicket]) -> Optional[int]:
+    return settings.ADMISSION_DEGRADED_IMAGE_SIZE if ticket and ticket.degraded else None
+
+def mark_degraded(result: Dict[str, Any], ticket: Optional[AdmissionTicket]) -> Dict[str, Any]:
+    if ticket and ticket.degraded:
+        result["degraded"] = True
+    return result
+
+async def persist_upload(upload_file: UploadFile) -> str:
+    """Keep an already-read upload in the blob store and return its path"""
+    await upload_file.seek(0)
+    return (await blob_store.put(upload_file)).path
 
 @router.post("/analyze/deepfake")
 async def analyze_deepfake(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    persist: bool = False,
+    background: bool = False,
+    current_user: dict = Depends(get_current_user),
+    ticket: Optional[AdmissionTicket] = Depends(deepfake_slot),
+    deadline: Deadline = Depends(request_deadline)
 ) -> Dict[str, Any]:
-    """Analyze image for potential deepfake"""
+    """Analyze image or video for potential deepfake.
+
+    Analysis stops at the request deadline (or when the client goes away)
+    and returns partial video results flagged as truncated. With
+    ?background=true the upload is queued and a job id is returned
+    immediately; poll /api/v1/jobs/{job_id} or wait for the job_finished
+    websocket notification.
+    """
     try:
-        file_path = await save_upload_file(file)
-        result = await deepfake_detector.analyze_image(file_path)
+        if background:
+            stored = await blob_store.put(file)
+            job = await job_queue.enqueue(
+                ANALYSIS_QUEUE,
+                "deepfake",
+                {"path": stored.path, "sha256": stored.sha256, "content_type": stored.content_type},
+                user_id=str(current_user["_id"]),
+                source="upload"
+            )
+            return JSONResponse(status_code=202, content={"job_id": job["_id"], "status": job["status"]})
+
+        file_path = None
+        if (file.content_type or "").startswith("video/"):
+            # Videos are decoded from disk; the stored copy is dropped unless kept
+            stored = await blob_store.put(file)
+            async with upload_retention.hot(stored.path):
+                result = await deepfake_detector.analyze_video(stored.path, deadline=deadline)
+            if persist or result.get("is_deepfake", False):
+                file_path = stored.path
+            else:
+                await blob_store.release(stored.sha256)
+        else:
+            image = await read_upload(file)
+            result = mark_degraded(
+                await deepfake_detector.analyze_image(image, max_side=degraded_image_size(ticket), deadline=deadline), ticket
+            )
         
         # If deepfake is detected, notify the user
         if result.get("is_deepfake", False):
+            # Flagged media is kept as evidence for the notification
+            file_path = file_path or await persist_upload(file)
             await notify_media_misuse(
                 user_id=str(current_user["_id"]),
                 content={
@@ -51,26 +135,124 @@ async def analyze_deepfake(
                     "details": "Potential deepfake detected in your media."
                 }
             )
+        elif persist and file_path is None:
+            await persist_upload(file)
         
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/analyze/video/stream")
+async def stream_video_analysis(
+    request: Request,
+    file: UploadFile = File(...),
+    early_stop: bool = True,
+    current_user: dict = Depends(get_current_user)
+) -> StreamingResponse:
+    """Stream deepfake analysis of a video as server-sent events.
+
+    Emits a `frame` event per sampled frame (progress plus the frame verdict)
+    and a final `result` event. With early_stop the stream ends as soon as
+    the verdict is conclusive, and analysis stops at the request deadline or
+    when the client disconnects. Read it with fetch() and a stream reader,
+    since EventSource cannot upload files.
+    """
+    if not (file.content_type or "").startswith("video/"):
+        raise HTTPException(status_code=400, detail="A video upload is required")
+    
+    # Admission and storage happen before streaming so failures still get a status code
+    stack = AsyncExitStack()
+    await stack.enter_async_context(admission_controller.admit(request.url.path))
+    try:
+        stored = await blob_store.put(file)
+    except BaseException:
+        await stack.aclose()
+        raise
+    stack.push_async_callback(blob_store.release, stored.sha256)
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+    finished = asyncio.Event()
+    releasing: Optional[asyncio.Future] = None
+    
+    async def release() -> None:
+        """Free the slot and the stream's upload reference once, whichever exit path gets here first"""
+        nonlocal releasing
+        if releasing is None:
+            releasing = asyncio.ensure_future(stack.aclose())
+        # Shielded so a cancelled caller still lets the release finish
+        await asyncio.shield(releasing)
+    
+    async def events():
+        try:
+            async with upload_retention.hot(stored.path):
+                async for event in deepfake_detector.iter_video(stored.path, deadline=deadline, early_stop=early_stop):
+                    if event["type"] == "result" and event.get("is_deepfake"):
+                        # Flagged videos are kept as evidence
+                        await blob_store.add_ref(stored.sha256)
+                        await notify_media_misuse(
+                            user_id=str(current_user["_id"]),
+                            content={
+                                "type": "deepfake",
+                                "file_path": stored.path,
+                                "confidence": event.get("confidence", 0),
+                                "details": "Potential deepfake detected in your media."
+                            }
+                        )
+                    yield sse_event(event["type"], {key: value for key, value in event.items() if key != "type"})
+        finally:
+            finished.set()
+            await release()
+    
+    async def watch_disconnect():
+        """Stop the analysis when the client goes away and release the stream if the body never ran"""
+        try:
+            while not finished.is_set():
+                if await request.is_disconnected():
+                    deadline.cancel()
+                    break
+                await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+            try:
+                await asyncio.wait_for(finished.wait(), STREAM_RELEASE_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            await release()
+    
+    watcher = asyncio.create_task(watch_disconnect())
+    _stream_watchers.add(watcher)
+    watcher.add_done_callback(_stream_watchers.discard)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
 @router.post("/analyze/content")
 async def analyze_content(
     file: Optional[UploadFile] = File(None),
     text: Optional[str] = None,
     language: Optional[str] = "en",
-    current_user: dict = Depends(get_current_user)
+    persist: bool = False,
+    current_user: dict = Depends(get_current_user),
+    ticket: Optional[AdmissionTicket] = Depends(inference_slot)
 ) -> Dict[str, Any]:
     """Analyze content (image or text) for explicit/abusive content"""
     try:
         if file:
-            file_path = await save_upload_file(file)
-            result = await content_moderator.analyze_image(file_path)
+            image = await read_upload(file)
+            result = mark_degraded(
+                await content_moderator.analyze_image(image, max_side=degraded_image_size(ticket)), ticket
+            )
             
             # If content is flagged, notify the user
             if result.get("is_flagged", False):
+                file_path = await persist_upload(file)
                 await notify_content_flagged(
                     user_id=str(current_user["_id"]),
                     content={
@@ -80,8 +262,12 @@ async def analyze_content(
                         "details": result.get("details", "Your content has been flagged for review.")
                     }
                 )
+            elif persist:
+                await persist_upload(file)
         elif text:
-            result = await content_moderator.analyze_text(text, language)
+            result = mark_degraded(
+                await content_moderator.analyze_text(text, language, blacklist_only=bool(ticket and ticket.degraded)), ticket
+            )
             
             # If text content is flagged, notify the user
             if result.get("is_flagged", False):
@@ -100,6 +286,8 @@ async def analyze_content(
                 detail="Either file or text must be provided"
             )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -107,26 +295,48 @@ async def analyze_content(
 async def verify_face(
     file1: UploadFile = File(...),
     file2: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    persist: bool = False,
+    current_user: dict = Depends(get_current_user),
+    ticket: Optional[AdmissionTicket] = Depends(inference_slot),
+    deadline: Deadline = Depends(request_deadline)
 ) -> Dict[str, Any]:
     """Verify if two face images match"""
     try:
-        file1_path = await save_upload_file(file1)
-        file2_path = await save_upload_file(file2)
-        result = await face_verifier.verify_face(file1_path, file2_path)
+        # Decoded straight from the request body; disk is only touched on request
+        image1 = await read_upload(file1)
+        image2 = await read_upload(file2)
+        result = await face_verifier.verify_face(image1, image2, deadline=deadline)
+        if persist:
+            await persist_upload(file1)
+            await persist_upload(file2)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/extract/face")
 async def extract_face(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    persist: bool = False,
+    current_user: dict = Depends(get_current_user),
+    ticket: Optional[AdmissionTicket] = Depends(inference_slot)
 ) -> Dict[str, Any]:
     """Extract face data from image"""
     try:
-        file_path = await save_upload_file(file)
-        result = await face_verifier.extract_face_data(file_path)
+        image = await read_upload(file)
+        result = await face_verifier.extract_face_data(image)
+        if persist:
+            await persist_upload(file)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/load")
+async def get_load(
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Current inference load level, queue depth and shed counts"""
+    return admission_controller.stats()
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from typing import List
-import aiofiles
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from typing import List, Optional
 import os
 from datetime import datetime
-from ...models.content import ContentCreate, Content
+from ...models.content import ContentCreate, Content, ContentPage
 from ...db.mongodb import get_database
+from ...db.pagination import paginate, projection
 from ...core.blockchain import SimpleBlockchain
+from ...services.storage import blob_store
 from ..deps import get_current_user
 
 router = APIRouter()
@@ -20,17 +21,16 @@ async def upload_content(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
-    # Save file
-    file_path = os.path.join(UPLOAD_DIR, f"{datetime.utcnow().timestamp()}_{file.filename}")
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
+    # Save file (content-addressed; the content record holds a reference)
+    stored = await blob_store.put(file)
     
     # Create content record
     content_data = {
         "user_id": str(current_user["_id"]),
         "content_type": file.content_type,
-        "content_url": file_path,
+        "content_url": stored.path,
+        "sha256": stored.sha256,
+        "size_bytes": stored.size,
         "created_at": datetime.utcnow(),
         "analysis_results": {},
         "moderation_status": "pending"
@@ -57,15 +57,34 @@ async def upload_content(
     
     return Content(**content_data)
 
-@router.get("/user/{user_id}", response_model=List[Content])
+# Fields returned by content listings; large or rarely needed ones are opt-in
+CONTENT_LIST_FIELDS = (
+    "user_id", "content_type", "content_url", "content_text", "created_at",
+    "moderation_status", "is_flagged", "sha256", "size_bytes"
+)
+CONTENT_OPTIONAL_FIELDS = ("analysis_results", "blockchain_hash")
+
+@router.get("/user/{user_id}", response_model=ContentPage)
 async def get_user_content(
     user_id: str,
+    limit: Optional[int] = Query(None, ge=1, description="Page size (capped at PAGE_SIZE_MAX)"),
+    cursor: Optional[str] = Query(None, description="next_token of the previous page"),
+    include: List[str] = Query([], description="Optional fields: analysis_results, blockchain_hash"),
     current_user: dict = Depends(get_current_user)
 ):
+    """A user's content, newest first, one page at a time"""
     if str(current_user["_id"]) != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this content")
     
     db = await get_database()
-    cursor = db.content.find({"user_id": user_id})
-    contents = await cursor.to_list(length=100)
-    return [Content(**content) for content in contents]
+    page = await paginate(
+        db.content,
+        {"user_id": user_id},
+        limit=limit,
+        token=cursor,
+        fields=projection(CONTENT_LIST_FIELDS, include, CONTENT_OPTIONAL_FIELDS)
+    )
+    return ContentPage(
+        items=[Content(**{**content, "id": str(content["_id"])}) for content in page["items"]],
+        next_token=page["next_token"]
+    )
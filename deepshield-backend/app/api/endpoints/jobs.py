@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Any
+from ...services.jobs import job_queue, ANALYSIS_QUEUE
+from ..deps import get_current_user
+
+router = APIRouter()
+
+# Set by the application when workers run in-process; None with external worker processes
+worker_pool = None
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+@router.get("/metrics")
+async def get_job_metrics(
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Queue depth per state and, for in-process workers, throughput counters"""
+    if worker_pool is not None:
+        return await worker_pool.stats()
+    counts = await job_queue.counts(ANALYSIS_QUEUE)
+    return {ANALYSIS_QUEUE: {"depth": counts.get("queued", 0), "states": counts, "workers": 0}}
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Poll the state of an analysis job"""
+    job = await job_queue.get(job_id)
+    if not job or job.get("user_id") != str(current_user["_id"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
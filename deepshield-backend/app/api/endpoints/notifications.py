@@ -5,16 +5,15 @@ from fastapi.responses import JSONResponse
 from ...core.security import get_current_user
 from ...models.user import User
 from ...services.notifications.email import EmailNotificationService
-from ...services.notifications.content_notifications import notify_content_flagged
+from ...services.notifications.content_notifications import notify_content_flagged, websocket_service
 from ...services.notifications.sms import SMSNotificationService
-from ...services.notifications.websocket import WebSocketNotificationService
 
 router = APIRouter()
 
 # Initialize notification services
 email_service = EmailNotificationService()
 sms_service = SMSNotificationService()
-websocket_service = WebSocketNotificationService()
+# websocket_service is shared with the notification services so they reach connected sockets
 
 @router.websocket("/api/v1/notifications/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import Any
+from typing import Any, List, Optional
 from datetime import datetime, timedelta
 from ...core.security import create_access_token, get_password_hash, verify_password
 from ...models.user import UserCreate, User
 from ...db.mongodb import get_database
+from ..deps import get_current_user
 from datetime import timedelta
 
 router = APIRouter()
@@ -52,3 +53,16 @@ async def login(email: str, password: str) -> Any:
         data={"sub": str(user["_id"])}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/me/verification")
+async def run_verification(
+    steps: Optional[List[str]] = Query(None),
+    refresh: bool = False,
+    current_user: dict = Depends(get_current_user)
+) -> Any:
+    """Run the account verification steps (and their dependencies) for the current user"""
+    user = User(**{**current_user, "id": str(current_user["_id"])})
+    try:
+        return await user.verify(steps, refresh=refresh)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,3 +1,4 @@
+from typing import Any, Dict, List
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -8,6 +9,36 @@ class Settings(BaseSettings):
     # MongoDB settings
     MONGODB_URL: str = Field(default="mongodb://localhost:27017")
     MONGODB_DB: str = Field(default="deepshield")
+    # Connection pool and timeouts (0 = driver default / no limit)
+    MONGO_MAX_POOL_SIZE: int = Field(default=100)
+    MONGO_MIN_POOL_SIZE: int = Field(default=0)
+    MONGO_MAX_CONNECTING: int = Field(default=2)  # connections being established at once per server
+    MONGO_MAX_IDLE_SECONDS: float = Field(default=300.0)
+    MONGO_WAIT_QUEUE_TIMEOUT_SECONDS: float = Field(default=10.0)  # waiting for a free pooled connection
+    MONGO_CONNECT_TIMEOUT_SECONDS: float = Field(default=5.0)
+    MONGO_SOCKET_TIMEOUT_SECONDS: float = Field(default=0.0)
+    MONGO_SERVER_SELECTION_TIMEOUT_SECONDS: float = Field(default=10.0)
+    MONGO_COMPRESSORS: List[str] = Field(default=["zstd", "snappy", "zlib"])  # in preference order; missing libraries are skipped
+    # Admin/reporting reads may lag behind the primary (max staleness -1 = no limit, else >= 90 s)
+    MONGO_REPORTING_READ_PREFERENCE: str = Field(default="secondaryPreferred")
+    MONGO_REPORTING_MAX_STALENESS_SECONDS: int = Field(default=-1)
+    # Write concern per collection; others use the server default
+    MONGO_WRITE_CONCERNS: Dict[str, Dict[str, Any]] = Field(default={
+        "users": {"w": "majority", "j": True},
+        "content": {"w": "majority"},
+        "content_flags": {"w": "majority"},
+        "blobs": {"w": "majority"},
+        "media_analysis": {"w": 1},
+        "instagram_follower_snapshots": {"w": 1}
+    })
+    # Keyset-paginated listings (content, admin users and flags)
+    PAGE_SIZE_DEFAULT: int = Field(default=50)
+    PAGE_SIZE_MAX: int = Field(default=200)
+    MONGO_ENSURE_INDEXES: bool = Field(default=True)  # create declared indexes (app/db/indexes.py) at startup
+    MONGO_TTL_SECONDS: Dict[str, int] = Field(default={
+        "instagram_follower_snapshots": 90 * 24 * 3600,
+        "jobs": 30 * 24 * 3600  # finished jobs
+    })  # 0 disables a collection's TTL index
     
     # JWT settings
     JWT_SECRET: str = Field(default="your-secret-key")
@@ -19,6 +50,20 @@ class Settings(BaseSettings):
     INSTAGRAM_APP_SECRET: str = Field(default="33191e18dd0aa8db81049ee756d2f324")
     INSTAGRAM_ACCESS_TOKEN: str = Field(default="IGAAPzigKEbvNBZAE1pMG9uUTZAxR0NzSTRIdEE5SXNhc0hRMHVZAWWhsNjcxSzVUa2w1ZAHFyYmNoLVU3bXJvZA0N5YUdhWC1nN2V0WWtoSHJMS3ZAPTFB6am82SFZAwSG1uUXNJcU1hUDkxSFdVa2t4Tl9zbDNQcElTNGtkTmRVWkZADZAwZDZD")
     INSTAGRAM_ACCOUNT_ID: str = Field(default="17841451799717870")
+    INSTAGRAM_GRAPH_URL: str = Field(default="https://graph.instagram.com/v12.0")
+    INSTAGRAM_TIMEOUT_SECONDS: float = Field(default=15.0)
+    INSTAGRAM_POOL_SIZE: int = Field(default=20)
+    INSTAGRAM_RATE_LIMIT_PER_HOUR: float = Field(default=4800.0)
+    INSTAGRAM_RATE_LIMIT_BURST: int = Field(default=50)
+    INSTAGRAM_USAGE_SLOWDOWN_PERCENT: float = Field(default=75.0)  # X-App-Usage level where pacing starts to slow
+    INSTAGRAM_RATE_LIMIT_COOLDOWN_SECONDS: float = Field(default=60.0)
+    INSTAGRAM_CACHE_TTL_SECONDS: Dict[str, float] = Field(default={"profile": 300.0, "insights": 60.0, "timeline": 900.0})
+    INSTAGRAM_CACHE_MAX_ENTRIES: int = Field(default=10000)
+    INSTAGRAM_MEDIA_CACHE_ENTRIES: int = Field(default=256)  # downloaded media kept by media_id
+    INSTAGRAM_PREFETCH_DEPTH: int = Field(default=1)  # media downloaded ahead of the one being analyzed
+    INSTAGRAM_BACKFILL_PAGE_SIZE: int = Field(default=50)
+    INSTAGRAM_BACKFILL_PAGE_BUFFER: int = Field(default=2)  # media pages fetched ahead of analysis
+    INSTAGRAM_TIMELINE_MEDIA_LIMIT: int = Field(default=100)  # recent posts used for account-behavior features
     
     # Google Cloud Vision API settings
     GOOGLE_CLOUD_PROJECT: str = Field(default="deepshield-mvp")
@@ -26,6 +71,80 @@ class Settings(BaseSettings):
     
     # Translation API settings
     TRANSLATION_API_KEY: str = Field(default="")
+    TRANSLATION_API_URL: str = Field(default="https://translation.googleapis.com/language/translate/v2")
+    TRANSLATION_CACHE_MAX_BYTES: int = Field(default=16 * 1024 * 1024)
+    TRANSLATION_CACHE_MONGO: bool = Field(default=False)
+    TRANSLATION_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600)
+    TRANSLATION_BATCH_WINDOW_MS: float = Field(default=5.0)
+    TRANSLATION_BATCH_MAX_TEXTS: int = Field(default=128)
+    TRANSLATION_BATCH_MAX_CHARS: int = Field(default=30000)
+    
+    # Outbound HTTP client settings
+    HTTP_TIMEOUT_SECONDS: float = Field(default=10.0)
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = Field(default=3.0)
+    HTTP_POOL_SIZE: int = Field(default=100)
+    HTTP_KEEPALIVE_SECONDS: float = Field(default=30.0)
+    HTTP_MAX_RETRIES: int = Field(default=3)
+    HTTP_RETRY_BACKOFF_SECONDS: float = Field(default=0.2)
+    HTTP_MAX_RETRY_AFTER_SECONDS: float = Field(default=30.0)  # longer Retry-After waits are returned to the caller
+    
+    # Upload settings
+    UPLOAD_CHUNK_SIZE: int = Field(default=1024 * 1024)
+    UPLOAD_MAX_IMAGE_BYTES: int = Field(default=20 * 1024 * 1024)
+    UPLOAD_MAX_VIDEO_BYTES: int = Field(default=500 * 1024 * 1024)
+    UPLOAD_MAX_OTHER_BYTES: int = Field(default=20 * 1024 * 1024)
+    BLOB_GC_INTERVAL_SECONDS: int = Field(default=600)
+    BLOB_GC_GRACE_SECONDS: int = Field(default=3600)
+    
+    # Upload retention (hot blobs under uploads/, gzip archive tier outside the public mount)
+    UPLOAD_ARCHIVE_DIR: str = Field(default="archive")
+    UPLOAD_RETENTION_INTERVAL_SECONDS: int = Field(default=300)
+    UPLOAD_ARCHIVE_AFTER_SECONDS: int = Field(default=30 * 24 * 3600)
+    UPLOAD_ARCHIVE_TTL_SECONDS: int = Field(default=0)  # 0 keeps archived files forever
+    UPLOAD_DISK_HIGH_WATER: float = Field(default=0.85)
+    UPLOAD_DISK_LOW_WATER: float = Field(default=0.75)
+    UPLOAD_HOT_MAX_BYTES: int = Field(default=20 * 1024 * 1024 * 1024)  # hot-tier budget; 0 measures the whole filesystem
+    UPLOAD_ARCHIVE_COMPRESSION_LEVEL: int = Field(default=6)
+    
+    # Analysis job queue (set JOB_WORKER_CONCURRENCY=0 when running python -m app.services.jobs.worker)
+    JOB_QUEUE_BACKEND: str = Field(default="mongo")  # "mongo" or "memory"
+    JOB_WORKER_CONCURRENCY: int = Field(default=1)
+    JOB_VISIBILITY_TIMEOUT_SECONDS: float = Field(default=300.0)
+    JOB_MAX_ATTEMPTS: int = Field(default=3)
+    JOB_RETRY_BACKOFF_SECONDS: float = Field(default=5.0)
+    JOB_POLL_INTERVAL_SECONDS: float = Field(default=1.0)
+    JOB_NOTIFY_INTERVAL_SECONDS: float = Field(default=1.0)
+    # Scheduling: classes in strict priority order, job source -> class, and global running caps per source
+    JOB_PRIORITY_CLASSES: List[str] = Field(default=["interactive", "normal", "bulk"])
+    JOB_SOURCE_CLASSES: Dict[str, str] = Field(default={"upload": "interactive", "webhook": "normal", "backfill": "bulk"})
+    JOB_SOURCE_CONCURRENCY: Dict[str, int] = Field(default={"webhook": 4, "backfill": 1})
+    JOB_FAIR_SHARE_HALF_LIFE_SECONDS: float = Field(default=60.0)
+    
+    # Admission control for /api/v1/ai/* (degraded = blacklist-only text, low-resolution images)
+    ADMISSION_MAX_IN_FLIGHT: int = Field(default=4)
+    ADMISSION_MAX_QUEUE: int = Field(default=16)
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = Field(default=10.0)
+    ADMISSION_DEGRADE_UTILIZATION: float = Field(default=0.75)
+    ADMISSION_DEGRADED_IMAGE_SIZE: int = Field(default=256)
+    
+    # Analysis deadlines (clients may ask for a budget with the X-Request-Timeout header)
+    ANALYSIS_DEADLINE_SECONDS: float = Field(default=120.0)
+    ANALYSIS_MAX_DEADLINE_SECONDS: float = Field(default=600.0)
+    
+    # Streaming video analysis: stop once the verdict is settled (z-score of the mean vs. threshold)
+    VIDEO_EARLY_STOP_MIN_FRAMES: int = Field(default=12)
+    VIDEO_EARLY_STOP_Z: float = Field(default=3.0)
+    
+    # Fake-account detection: accounts whose weighted behavior flags reach this score are suspicious
+    ACCOUNT_RISK_THRESHOLD: float = Field(default=0.5)
+    
+    # Account verification steps (run as a dependency graph; completed step results are cached per user)
+    VERIFICATION_STEP_TIMEOUT_SECONDS: float = Field(default=60.0)
+    VERIFICATION_CACHE_TTL_SECONDS: float = Field(default=600.0)
+    VERIFICATION_CACHE_MAX_ENTRIES: int = Field(default=10000)
+    
+    # AI calibration artifact (written by python -m app.services.ai.calibration)
+    CALIBRATION_ARTIFACT_PATH: str = Field(default="models/calibration.json")
     
     # Email settings
     SMTP_SERVER: str = Field(default="smtp.gmail.com")
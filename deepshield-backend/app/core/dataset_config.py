@@ -24,6 +24,12 @@ DATASETS = {
         "url": "https://github.com/hate-alert/HateXplain",
         "description": "Dataset for hate speech detection",
         "required_files": ["dataset.json"]
+    },
+    "vggface2": {
+        "path": DATASET_DIR / "vggface2",
+        "url": "https://github.com/ox-vgg/vgg_face2",
+        "description": "Dataset for face verification threshold calibration",
+        "required_files": []
     }
 }
 
@@ -0,0 +1,191 @@
+"""
+MongoDB index declarations, ensured idempotently at startup.
+
+Also finds query shapes that scanned a whole collection, from the database
+profiler (see unindexed_query_shapes) or against the declared indexes (see
+supporting_index).
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from ..config import get_settings
+
+settings = get_settings()
+
+# Options that make two indexes on the same keys different indexes
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+# Date field each TTL collection expires on (lifetimes come from MONGO_TTL_SECONDS)
+TTL_FIELDS = {
+    "instagram_follower_snapshots": "taken_at",
+    "jobs": "finished_at",
+}
+
+
+def declared_indexes(ttl_seconds: Optional[Dict[str, int]] = None) -> Dict[str, List[IndexModel]]:
+    """Indexes per collection, including the TTL indexes that are enabled"""
+    ttl_seconds = settings.MONGO_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    indexes = {
+        "users": [
+            IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+            IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+            IndexModel([("created_at", DESCENDING)], name="created_at"),
+        ],
+        "content": [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+        ],
+        "content_flags": [
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+            IndexModel([("created_at", DESCENDING)], name="created_at"),
+        ],
+        "media_analysis": [
+            IndexModel([("media_id", ASCENDING), ("timestamp", DESCENDING)], name="media_id_timestamp"),
+        ],
+        "jobs": [
+            IndexModel([("queue", ASCENDING), ("status", ASCENDING), ("available_at", ASCENDING)], name="queue_status_available_at"),
+        ],
+        "blobs": [
+            IndexModel([("tier", ASCENDING), ("last_accessed_at", ASCENDING)], name="tier_last_accessed_at"),
+            IndexModel([("refcount", ASCENDING), ("updated_at", ASCENDING)], name="refcount_updated_at"),
+        ],
+        "instagram_follower_snapshots": [
+            IndexModel([("username", ASCENDING), ("taken_at", DESCENDING)], name="username_taken_at"),
+        ],
+    }
+    for collection, field in TTL_FIELDS.items():
+        seconds = ttl_seconds.get(collection, 0)
+        if seconds > 0:
+            indexes[collection].append(IndexModel([(field, ASCENDING)], name=f"{field}_ttl", expireAfterSeconds=seconds))
+    return indexes
+
+
+def _key(spec: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    return [(field, direction) for field, direction in dict(spec["key"]).items()]
+
+
+def _options(spec: Dict[str, Any]) -> Dict[str, Any]:
+    return {option: spec[option] for option in INDEX_OPTIONS if spec.get(option) not in (None, False)}
+
+
+def _ttl_only_change(have: Dict[str, Any], want: Dict[str, Any]) -> bool:
+    """Both are TTL indexes that differ only in their lifetime (changeable with collMod)"""
+    if "expireAfterSeconds" not in have or "expireAfterSeconds" not in want:
+        return False
+    return {**have, "expireAfterSeconds": None} == {**want, "expireAfterSeconds": None}
+
+
+async def ensure_indexes(db, indexes: Optional[Dict[str, List[IndexModel]]] = None) -> Dict[str, Dict[str, List[str]]]:
+    """Create missing indexes; safe to call on every startup.
+
+    An index already present on the same keys is left alone, except that a
+    changed TTL is applied in place with collMod. Indexes whose other options
+    differ, or that cannot be built (e.g. duplicate emails under a unique
+    index), are reported as conflicts instead of failing startup.
+    """
+    indexes = declared_indexes() if indexes is None else indexes
+    summary: Dict[str, Dict[str, List[str]]] = {}
+    for collection_name, models in indexes.items():
+        collection = db[collection_name]
+        existing = list((await collection.index_information()).items())
+        result = summary[collection_name] = {"created": [], "existing": [], "updated": [], "conflicts": []}
+        missing = []
+        for model in models:
+            wanted = model.document
+            name = wanted["name"]
+            match = next(((existing_name, spec) for existing_name, spec in existing if _key(spec) == _key(wanted)), None)
+            if match is None:
+                if any(existing_name == name for existing_name, _ in existing):
+                    result["conflicts"].append(name)
+                    print(f"Index {collection_name}.{name} exists with different keys; leaving it")
+                else:
+                    missing.append(model)
+                continue
+            existing_name, spec = match
+            have, want = _options(spec), _options(wanted)
+            if have == want:
+                result["existing"].append(existing_name)
+            elif _ttl_only_change(have, want):
+                await db.command("collMod", collection_name, index={"name": existing_name, "expireAfterSeconds": want["expireAfterSeconds"]})
+                result["updated"].append(existing_name)
+            else:
+                result["conflicts"].append(existing_name)
+                print(f"Index {collection_name}.{existing_name} has options {have}, declared {want}; leaving it")
+        for model in missing:
+            try:
+                await collection.create_indexes([model])
+                result["created"].append(model.document["name"])
+            except OperationFailure as e:
+                result["conflicts"].append(model.document["name"])
+                print(f"Failed to create index {collection_name}.{model.document['name']}: {e}")
+    return summary
+
+
+def query_shape(value: Any) -> Any:
+    """A filter with its values replaced by "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def _profiled_query(entry: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(filter, sort) of a system.profile entry"""
+    command = entry.get("command") or {}
+    if "pipeline" in command:
+        first = (command["pipeline"] or [{}])[0]
+        return first.get("$match", {}), {}
+    for field in ("filter", "query", "q"):
+        if isinstance(command.get(field), dict):
+            return command[field], command.get("sort") or {}
+    return {}, {}
+
+
+async def unindexed_query_shapes(db, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Distinct query shapes the profiler saw scanning a whole collection.
+
+    Needs the profiler on (await db.command("profile", 2)). Unfiltered scans
+    (such as counting every document) and system collections are ignored.
+    """
+    query: Dict[str, Any] = {"planSummary": {"$regex": "^COLLSCAN"}}
+    if since is not None:
+        query["ts"] = {"$gte": since}
+    shapes: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+    async for entry in db["system.profile"].find(query):
+        namespace = entry.get("ns", "")
+        if ".system." in namespace:
+            continue
+        filter_, sort = _profiled_query(entry)
+        if not filter_ and not sort:
+            continue  # a deliberate full scan (e.g. count of all documents)
+        shape = {"ns": namespace, "op": entry.get("op"), "filter": query_shape(filter_), "sort": dict(sort)}
+        key = (shape["ns"], str(shape["op"]), repr(shape["filter"]), repr(shape["sort"]))
+        shapes.setdefault(key, {**shape, "count": 0})["count"] += 1
+    return list(shapes.values())
+
+
+def supporting_index(
+    collection: str,
+    fields: Sequence[str],
+    sort: Sequence[str] = (),
+    indexes: Optional[Dict[str, List[IndexModel]]] = None,
+) -> Optional[str]:
+    """Name of a declared index that can serve a query on `fields` sorted by
+    `sort`: its key starts with query fields, optionally followed by sort
+    fields, and it covers every sort field (None when there is none)"""
+    indexes = declared_indexes() if indexes is None else indexes
+    for model in indexes.get(collection, []):
+        keys = [field for field, _ in _key(model.document)]
+        if not keys or (keys[0] not in fields and not (not fields and keys[0] in sort)):
+            continue
+        prefix = []
+        for key in keys:
+            if key in fields or key in sort:
+                prefix.append(key)
+            else:
+                break
+        if all(field in prefix for field in sort):
+            return model.document["name"]
+    return None
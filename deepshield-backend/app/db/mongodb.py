@@ -1,20 +1,184 @@
+from typing import Dict, Any, List, Optional
+import importlib.util
+import threading
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import WriteConcern
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
 from ..config import get_settings
 
 settings = get_settings()
 
+# Python packages the wire compressors need (zlib ships with Python)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """Connection pool counters per server, fed by pymongo's pool events.
+
+    Events arrive on pymongo's threads, so updates are locked.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.max_pool_size: Optional[int] = None
+        self.servers: Dict[str, Dict[str, Any]] = {}
+
+    def _server(self, address) -> Dict[str, Any]:
+        name = "%s:%s" % address if isinstance(address, tuple) else str(address)
+        return self.servers.setdefault(name, {
+            "open": 0, "in_use": 0, "waiting": 0, "checkouts": 0, "checkout_failures": 0,
+            "pool_cleared": 0, "wait_seconds_total": 0.0, "max_wait_seconds": 0.0
+        })
+
+    def _update(self, address, **deltas) -> None:
+        with self._lock:
+            server = self._server(address)
+            for key, delta in deltas.items():
+                server[key] += delta
+
+    def pool_created(self, event):
+        with self._lock:
+            self._server(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, pool_cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        duration = getattr(event, "duration", None) or 0.0
+        with self._lock:
+            server = self._server(event.address)
+            server["waiting"] -= 1
+            server["in_use"] += 1
+            server["checkouts"] += 1
+            server["wait_seconds_total"] += duration
+            server["max_wait_seconds"] = max(server["max_wait_seconds"], duration)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, in_use=-1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            servers = {}
+            for name, server in self.servers.items():
+                servers[name] = {
+                    **server,
+                    "utilization": server["in_use"] / self.max_pool_size if self.max_pool_size else None,
+                    "mean_wait_seconds": server["wait_seconds_total"] / server["checkouts"] if server["checkouts"] else 0.0
+                }
+        return {"max_pool_size": self.max_pool_size, "servers": servers}
+
+
+pool_metrics = PoolMetrics()
+
+
+def available_compressors(names: List[str]) -> List[str]:
+    """Configured compressors whose libraries are installed (in configured order)"""
+    available = []
+    for name in names:
+        module = COMPRESSOR_MODULES.get(name)
+        if module is None:
+            print(f"Ignoring unknown MongoDB compressor {name}")
+        elif importlib.util.find_spec(module) is None:
+            print(f"MongoDB compressor {name} needs the {module} package; skipping it")
+        else:
+            available.append(name)
+    return available
+
+
+def client_options() -> Dict[str, Any]:
+    """AsyncIOMotorClient keyword arguments from the MONGO_* settings"""
+    def milliseconds(seconds: float) -> Optional[int]:
+        return int(seconds * 1000) if seconds > 0 else None
+
+    options: Dict[str, Any] = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "maxIdleTimeMS": milliseconds(settings.MONGO_MAX_IDLE_SECONDS),
+        "waitQueueTimeoutMS": milliseconds(settings.MONGO_WAIT_QUEUE_TIMEOUT_SECONDS),
+        "connectTimeoutMS": milliseconds(settings.MONGO_CONNECT_TIMEOUT_SECONDS),
+        "socketTimeoutMS": milliseconds(settings.MONGO_SOCKET_TIMEOUT_SECONDS),
+        "serverSelectionTimeoutMS": milliseconds(settings.MONGO_SERVER_SELECTION_TIMEOUT_SECONDS),
+        "event_listeners": [pool_metrics],
+    }
+    compressors = available_compressors(settings.MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = compressors
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def reporting_read_preference():
+    """Read preference for admin/reporting queries (MONGO_REPORTING_READ_PREFERENCE)"""
+    mode = read_pref_mode_from_name(settings.MONGO_REPORTING_READ_PREFERENCE)
+    return make_read_preference(mode, None, max_staleness=settings.MONGO_REPORTING_MAX_STALENESS_SECONDS)
+
+
+class ConfiguredDatabase:
+    """A motor database whose collections carry their configured write concern.
+
+    Collections listed in MONGO_WRITE_CONCERNS are returned with that write
+    concern (by attribute or item access); everything else is delegated to
+    the wrapped database.
+    """
+    def __init__(self, database, write_concerns: Dict[str, Dict[str, Any]]):
+        self._database = database
+        self._collections = {
+            name: database.get_collection(name, write_concern=WriteConcern(**concern))
+            for name, concern in write_concerns.items()
+        }
+
+    def __getitem__(self, name: str):
+        collection = self._collections.get(name)
+        return collection if collection is not None else self._database[name]
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        collection = self._collections.get(name)
+        return collection if collection is not None else getattr(self._database, name)
+
+
 class MongoDB:
     client: AsyncIOMotorClient = None
     db = None
+    reporting_db = None
 
 db = MongoDB()
 
 async def get_database():
     return db.db
 
+async def get_reporting_database():
+    """Database for admin/reporting reads, which may be served by secondaries"""
+    return db.reporting_db if db.reporting_db is not None else db.db
+
 async def connect_to_mongo():
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
-    db.db = db.client[settings.MONGODB_DB]
+    options = client_options()
+    pool_metrics.max_pool_size = options["maxPoolSize"]
+    db.client = AsyncIOMotorClient(settings.MONGODB_URL, **options)
+    db.db = ConfiguredDatabase(db.client[settings.MONGODB_DB], settings.MONGO_WRITE_CONCERNS)
+    db.reporting_db = db.client.get_database(settings.MONGODB_DB, read_preference=reporting_read_preference())
 
 async def close_mongo_connection():
     db.client.close()
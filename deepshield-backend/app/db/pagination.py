@@ -0,0 +1,100 @@
+"""
+Keyset pagination over MongoDB collections with opaque continuation tokens
+"""
+from typing import Dict, Any, List, Optional, Sequence
+from datetime import datetime
+import base64
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from fastapi import HTTPException
+
+from ..config import get_settings
+
+settings = get_settings()
+
+TOKEN_VERSION = 1
+
+
+def page_limit(limit: Optional[int]) -> int:
+    """Requested page size, defaulting to PAGE_SIZE_DEFAULT and capped at PAGE_SIZE_MAX"""
+    if limit is None:
+        return settings.PAGE_SIZE_DEFAULT
+    return max(1, min(limit, settings.PAGE_SIZE_MAX))
+
+
+def encode_token(sort_field: str, document: Dict[str, Any]) -> str:
+    """Token resuming after `document` (holds its sort value and _id)"""
+    payload = {"v": TOKEN_VERSION, "f": sort_field, "k": document.get(sort_field), "id": document["_id"]}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str, sort_field: str) -> Dict[str, Any]:
+    """Sort value and _id from a token (HTTP 400 when malformed or from another listing).
+
+    The decoded values end up in a query filter, so only a datetime (or
+    null) sort value and an ObjectId are accepted; anything else, such as
+    an operator document, is rejected.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json_util.loads(raw.decode("utf-8"))
+        if not isinstance(payload, dict) or payload["v"] != TOKEN_VERSION or payload["f"] != sort_field:
+            raise ValueError("token belongs to another listing")
+        if not (payload["k"] is None or isinstance(payload["k"], datetime)) or not isinstance(payload["id"], ObjectId):
+            raise ValueError("unexpected position values")
+        return {"key": payload["k"], "id": payload["id"]}
+    except (ValueError, KeyError, TypeError, BSONError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid continuation token: {e}")
+
+
+def after_filter(sort_field: str, key: Any, document_id: Any) -> Dict[str, Any]:
+    """Documents strictly after (key, _id) in descending (sort_field, _id) order.
+
+    Documents without the sort field sort last; MongoDB's $lt never matches
+    null, so they are reached through an explicit clause.
+    """
+    if key is None:
+        return {sort_field: None, "_id": {"$lt": document_id}}
+    return {"$or": [
+        {sort_field: {"$lt": key}},
+        {sort_field: key, "_id": {"$lt": document_id}},
+        {sort_field: None}
+    ]}
+
+
+def projection(fields: Sequence[str], include: Sequence[str] = (), allowed: Sequence[str] = ()) -> Dict[str, int]:
+    """Projection of the default `fields` plus requested extras (HTTP 400 for extras not in `allowed`)"""
+    unknown = [field for field in include if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Optional fields: {', '.join(allowed) or 'none'}"
+        )
+    return {field: 1 for field in list(fields) + list(include)}
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    limit: Optional[int] = None,
+    token: Optional[str] = None,
+    fields: Optional[Dict[str, int]] = None,
+    sort_field: str = "created_at",
+) -> Dict[str, Any]:
+    """One page of documents, newest first: {"items", "next_token"}.
+
+    Pages are addressed by the last (sort_field, _id) seen rather than an
+    offset, so each page is an index range scan (see db/indexes.py) and
+    documents inserted meanwhile neither repeat nor get skipped. The
+    sort field is always projected because the next token is built from it.
+    """
+    limit = page_limit(limit)
+    if token:
+        position = decode_token(token, sort_field)
+        query = {"$and": [query, after_filter(sort_field, position["key"], position["id"])]}
+    if fields is not None:
+        fields = {**fields, sort_field: 1}
+    cursor = collection.find(query, fields).sort([(sort_field, -1), ("_id", -1)]).limit(limit + 1)
+    documents: List[Dict[str, Any]] = await cursor.to_list(length=limit + 1)
+    next_token = encode_token(sort_field, documents[limit - 1]) if len(documents) > limit else None
+    return {"items": documents[:limit], "next_token": next_token}
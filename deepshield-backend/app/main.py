@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from .db.mongodb import connect_to_mongo, close_mongo_connection
-from .api.endpoints import users, content, ai, notifications
+from .db.mongodb import connect_to_mongo, close_mongo_connection, get_database, pool_metrics
+from .db.indexes import ensure_indexes
+from .api.endpoints import users, content, ai, notifications, jobs, admin
 from .services.api.instagram import router as instagram_router
+from .services.api.http_client import close_http_clients
+from .services.storage import blob_store, upload_retention, TieredStaticFiles
+from .services.jobs import JobWorkerPool, run_notifier, job_queue, ANALYSIS_QUEUE, HANDLERS, release_job_upload
+from .services.notifications.content_notifications import notify_job_finished
+from .api.deps import get_current_user
+from .config import settings
 
 
 app = FastAPI(title="DeepShield API")
@@ -17,8 +24,8 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Mount static files (archived uploads are restored on first request)
+app.mount("/uploads", TieredStaticFiles(directory="uploads"), name="uploads")
 
 # Include routers
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
@@ -26,15 +33,40 @@ app.include_router(content.router, prefix="/api/v1/content", tags=["content"])
 app.include_router(ai.router, prefix="/api/v1/ai", tags=["ai"])
 app.include_router(instagram_router, prefix="/api/v1/instagram", tags=["instagram"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["notifications"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+
+background_tasks = []
 
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    if settings.MONGO_ENSURE_INDEXES:
+        try:
+            await ensure_indexes(await get_database())
+        except Exception as e:
+            print(f"Failed to ensure MongoDB indexes: {e}")
+    background_tasks.append(asyncio.create_task(blob_store.run_garbage_collector()))
+    background_tasks.append(asyncio.create_task(upload_retention.run()))
+    background_tasks.append(asyncio.create_task(run_notifier(job_queue, notify_job_finished)))
+    if settings.JOB_WORKER_CONCURRENCY > 0:
+        jobs.worker_pool = JobWorkerPool(job_queue, HANDLERS, queues=[ANALYSIS_QUEUE], on_finished=release_job_upload)
+        jobs.worker_pool.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    if jobs.worker_pool is not None:
+        await jobs.worker_pool.stop()
+    await close_http_clients()
     await close_mongo_connection()
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
+
+@app.get("/metrics/mongo")
+async def mongo_metrics(current_user: dict = Depends(get_current_user)):
+    """Connection pool usage per MongoDB server"""
+    return pool_metrics.snapshot()
@@ -17,9 +17,34 @@ class ContentInDB(ContentBase):
     analysis_results: dict
     moderation_status: str = "pending"
     blockchain_hash: Optional[str] = None
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
     
 class Content(ContentBase):
     id: str
     created_at: datetime
     moderation_status: str
     is_flagged: bool = False
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    # Only present when requested (GET /content/user/{id}?include=...)
+    analysis_results: Optional[dict] = None
+    blockchain_hash: Optional[str] = None
+
+class ContentPage(BaseModel):
+    items: List[Content]
+    next_token: Optional[str] = None
+
+class ContentFlag(BaseModel):
+    id: str
+    content_id: Optional[str] = None
+    user_id: Optional[str] = None
+    reason: Optional[str] = None
+    status: str = "pending"
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    updated_by: Optional[str] = None
+
+class ContentFlagPage(BaseModel):
+    items: List[ContentFlag]
+    next_token: Optional[str] = None
@@ -25,6 +25,11 @@ class User(UserBase):
     created_at: datetime
     profile_image: Optional[str] = None
 
+    async def verify(self, steps: Optional[List[str]] = None, refresh: bool = False) -> Dict[str, Any]:
+        """Run verification steps (default: all) concurrently in dependency order."""
+        from app.services.verification import verification_orchestrator
+        return await verification_orchestrator.run(self, steps, refresh=refresh)
+
     async def verify_step(self, step: str) -> Dict[str, Any]:
         """Execute a verification step."""
         steps = {
@@ -59,3 +64,7 @@ class User(UserBase):
         
     async def _verify_image(self) -> Dict[str, Any]:
         return {"matches": []}
+
+class UserPage(BaseModel):
+    items: List[User]
+    next_token: Optional[str] = None
@@ -0,0 +1,165 @@
+"""
+Admission control and load shedding for inference requests
+"""
+from typing import Dict, Any, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+from fastapi import HTTPException
+
+from app.config import settings
+
+NORMAL = "normal"
+DEGRADED = "degraded"
+SATURATED = "saturated"
+
+# Weight of the newest sample in the service-time moving average
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionTicket:
+    """Handed to an admitted request; `degraded` asks for the cheap model path"""
+    def __init__(self, route: str, degraded: bool, waited: float):
+        self.route = route
+        self.degraded = degraded
+        self.waited = waited
+
+
+class AdmissionController:
+    """Bounds concurrent inference and the queue of requests waiting for it.
+
+    Up to `max_in_flight` requests run at once; up to `max_queue` more wait
+    (at most `queue_timeout` seconds) for a slot. Anything beyond that, or a
+    wait that times out, is rejected with 429 and a Retry-After estimated
+    from the recent service time. Once utilization (running plus waiting
+    over slots) reaches `degrade_utilization`, admitted requests are marked
+    degraded so the endpoints switch to cheaper analysis.
+    """
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        degrade_utilization: Optional[float] = None,
+    ):
+        self.max_in_flight = max_in_flight if max_in_flight is not None else settings.ADMISSION_MAX_IN_FLIGHT
+        self.max_queue = max_queue if max_queue is not None else settings.ADMISSION_MAX_QUEUE
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        self.degrade_utilization = degrade_utilization if degrade_utilization is not None else settings.ADMISSION_DEGRADE_UTILIZATION
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.service_time = 1.0
+        self.admitted: Dict[str, int] = {}
+        self.deferred: Dict[str, int] = {}
+        self.degraded: Dict[str, int] = {}
+        self.shed: Dict[str, int] = {}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def utilization(self) -> float:
+        return (self.in_flight + self.waiting) / self.max_in_flight
+
+    def level(self) -> str:
+        if self.waiting or self.in_flight >= self.max_in_flight:
+            return SATURATED
+        if self.utilization() >= self.degrade_utilization:
+            return DEGRADED
+        return NORMAL
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        return max(1, math.ceil(self.service_time * (self.waiting + 1) / self.max_in_flight))
+
+    def _count(self, counter: Dict[str, int], route: str) -> None:
+        counter[route] = counter.get(route, 0) + 1
+
+    def _reject(self, route: str, reason: str) -> HTTPException:
+        self._count(self.shed, route)
+        return HTTPException(
+            status_code=429,
+            detail=f"Inference capacity exceeded ({reason}); retry later",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    async def _acquire(self, route: str) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Slots and waiters from a previous event loop can never be released here
+            self.in_flight = 0
+            self._waiters.clear()
+            self._loop = loop
+
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if self.waiting >= self.max_queue:
+            raise self._reject(route, "queue full")
+
+        self._count(self.deferred, route)
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return  # the slot was handed over just as the wait expired
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            raise self._reject(route, "queue timeout")
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        # Hand the slot straight to the next waiter so in_flight never dips
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight = max(self.in_flight - 1, 0)
+
+    @asynccontextmanager
+    async def admit(self, route: str):
+        """Hold an inference slot for the duration of the block"""
+        queued_at = time.monotonic()
+        await self._acquire(route)
+        started = time.monotonic()
+        ticket = AdmissionTicket(route, self.utilization() >= self.degrade_utilization, started - queued_at)
+        self._count(self.admitted, route)
+        if ticket.degraded:
+            self._count(self.degraded, route)
+        try:
+            yield ticket
+        finally:
+            elapsed = time.monotonic() - started
+            self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "level": self.level(),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "utilization": self.utilization(),
+            "service_time_seconds": self.service_time,
+            "admitted": dict(self.admitted),
+            "deferred": dict(self.deferred),
+            "degraded": dict(self.degraded),
+            "shed": dict(self.shed),
+            "shed_total": sum(self.shed.values())
+        }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,178 @@
+"""
+Offline score calibration for the AI services.
+
+Scores local dataset directories (see core/dataset_config.DATASETS) with the
+real models and writes a small versioned JSON artifact. At runtime the
+services only read that artifact, so workers never touch the datasets.
+
+Expected layouts:
+    faceforensics/real/*.jpg, faceforensics/fake/*.jpg
+    vggface2/<identity>/*.jpg
+
+Usage: python -m app.services.ai.calibration [--output PATH] [--max-samples N]
+"""
+from typing import Dict, Any, List, Optional, Sequence
+from datetime import datetime
+from pathlib import Path
+import argparse
+import copy
+import json
+import os
+import numpy as np
+
+from app.config import settings
+from app.core.dataset_config import get_dataset_path
+
+CALIBRATION_VERSION = 1
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+# Values used when no artifact is available (the previous hard-coded settings)
+DEFAULT_CALIBRATION = {
+    "version": CALIBRATION_VERSION,
+    "deepfake": {
+        "mean_manipulation_score": 0.5,
+        "std_manipulation_score": 0.2,
+        "threshold": 0.7
+    },
+    "face_verification": {
+        "similarity_threshold": 0.7,
+        "confidence_threshold": 0.85
+    }
+}
+
+
+def load_calibration(path: Optional[str] = None) -> Dict[str, Any]:
+    """Load the calibration artifact, falling back to defaults per section"""
+    path = path or settings.CALIBRATION_ARTIFACT_PATH
+    calibration = copy.deepcopy(DEFAULT_CALIBRATION)
+    if not os.path.exists(path):
+        return calibration
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            artifact = json.load(f)
+    except Exception as e:
+        print(f"Failed to read calibration artifact {path}: {e}")
+        return calibration
+    if artifact.get("version") != CALIBRATION_VERSION:
+        print(f"Ignoring calibration artifact {path}: version {artifact.get('version')} != {CALIBRATION_VERSION}")
+        return calibration
+    for section in ("deepfake", "face_verification"):
+        calibration[section].update(artifact.get(section) or {})
+    calibration["created_at"] = artifact.get("created_at")
+    return calibration
+
+
+def save_calibration(calibration: Dict[str, Any], path: Optional[str] = None) -> str:
+    """Write the artifact atomically and return its path"""
+    path = path or settings.CALIBRATION_ARTIFACT_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    artifact = {**calibration, "version": CALIBRATION_VERSION, "created_at": datetime.utcnow().isoformat()}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def score_statistics(scores: Sequence[float]) -> Dict[str, float]:
+    """Mean and (non-zero) standard deviation of a score sample"""
+    values = np.asarray(scores, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "std": float(max(values.std(), 1e-6))
+    }
+
+
+def best_threshold(positive: Sequence[float], negative: Sequence[float]) -> float:
+    """Threshold t maximizing balanced accuracy for the rule `score > t`"""
+    pos = np.asarray(positive, dtype=np.float64)
+    neg = np.asarray(negative, dtype=np.float64)
+    values = np.unique(np.concatenate([pos, neg]))
+    # Midpoints between observed scores, plus one candidate below all of them
+    candidates = np.concatenate([[values[0] - 1e-6], (values[:-1] + values[1:]) / 2])
+    tpr = (pos[None, :] > candidates[:, None]).mean(axis=1)
+    tnr = (neg[None, :] <= candidates[:, None]).mean(axis=1)
+    return float(candidates[np.argmax(tpr + tnr)])
+
+
+def _list_images(directory: Path, limit: int) -> List[Path]:
+    if not directory.is_dir():
+        return []
+    images = sorted(p for p in directory.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return images[:limit]
+
+
+def calibrate_deepfake(detector, max_samples: int) -> Optional[Dict[str, Any]]:
+    """Score real/fake FaceForensics++ frames with the deepfake model"""
+    from PIL import Image
+
+    root = get_dataset_path("faceforensics")
+    scores = {"real": [], "fake": []}
+    for label in scores:
+        for image_path in _list_images(root / label, max_samples):
+            score = detector._score_image(Image.open(image_path))
+            if score is not None:
+                scores[label].append(score)
+    if not scores["real"] or not scores["fake"]:
+        print(f"Skipping deepfake calibration: need scored images in {root}/real and {root}/fake")
+        return None
+    stats = score_statistics(scores["real"] + scores["fake"])
+    return {
+        "mean_manipulation_score": stats["mean"],
+        "std_manipulation_score": stats["std"],
+        "threshold": best_threshold(scores["fake"], scores["real"]),
+        "samples": {label: len(values) for label, values in scores.items()}
+    }
+
+
+def calibrate_face_verification(verifier, max_samples: int) -> Optional[Dict[str, Any]]:
+    """Compare genuine and impostor VGGFace2 pairs with FaceNet embeddings"""
+    root = get_dataset_path("vggface2")
+    identities = sorted(p for p in root.iterdir() if p.is_dir()) if root.is_dir() else []
+    embeddings: Dict[Path, List[np.ndarray]] = {}
+    for identity in identities:
+        vectors = []
+        for image_path in _list_images(identity, max_samples):
+            embedding, _ = verifier._extract_face_embedding(str(image_path))
+            if embedding is not None:
+                vector = embedding.detach().cpu().numpy().ravel()
+                vectors.append(vector / np.linalg.norm(vector))
+        if vectors:
+            embeddings[identity] = vectors
+
+    people = list(embeddings.values())
+    genuine = [float(a @ b) for vectors in people for a, b in zip(vectors, vectors[1:])]
+    impostor = [float(a @ b) for first, second in zip(people, people[1:]) for a, b in zip(first, second)]
+    if not genuine or not impostor:
+        print(f"Skipping face verification calibration: need several identities with faces in {root}")
+        return None
+    return {
+        "similarity_threshold": best_threshold(genuine, impostor),
+        "genuine_similarity": score_statistics(genuine),
+        "impostor_similarity": score_statistics(impostor),
+        "samples": {"genuine_pairs": len(genuine), "impostor_pairs": len(impostor)}
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compute calibration artifact from local datasets")
+    parser.add_argument("--output", default=settings.CALIBRATION_ARTIFACT_PATH)
+    parser.add_argument("--max-samples", type=int, default=500, help="Images per class/identity")
+    args = parser.parse_args()
+
+    from .deepfake_detection import DeepfakeDetector
+    from .face_verification import FaceVerifier
+
+    calibration = load_calibration(args.output)
+    deepfake = calibrate_deepfake(DeepfakeDetector(), args.max_samples)
+    if deepfake:
+        calibration["deepfake"].update(deepfake)
+    face = calibrate_face_verification(FaceVerifier(), args.max_samples)
+    if face:
+        calibration["face_verification"].update(face)
+    print(f"Wrote calibration artifact to {save_calibration(calibration, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,10 @@
-from deepface import DeepFace
+import asyncio
+import threading
 import numpy as np
 import cv2
-from typing import Dict, Any
-from transformers import pipeline
-from hatesonar import Sonar
-from nudenet import NudeDetector
+from typing import Dict, Any, Optional
 from .keyword_blacklist import KeywordBlacklist
-import torch
-from datasets import load_dataset
+from .image_io import ImageSource, load_image, downscale
 
 # Lazy import to avoid circular dependency
 def get_translation_api():
@@ -45,47 +42,83 @@ class ContentModerator:
             self.text_classifier = lambda x: [{'label': 'toxic', 'score': 0.9}]
             self.hate_sonar = None
             self.nude_detector = None
+            self._models_loaded = True
         else:
+            # Models (and torch/transformers) are loaded on first inference
+            self.nsfw_classifier = None
+            self.text_classifier = None
+            self.hate_sonar = None
+            self.nude_detector = None
+            self._models_loaded = False
+        # Set when loading fails, so later calls skip the models instead of retrying the load
+        self._models_error: Optional[Exception] = None
+        self._models_lock = threading.Lock()
+        
+        # Initialize keyword blacklist
+        self.keyword_blacklist = KeywordBlacklist()
+        self._translation_api = None
+    
+    def _load_models(self) -> None:
+        """Import the ML stack and load models the first time they are needed.
+
+        The load is locked so concurrent first callers wait for it, and the
+        flag is only set once the models are in place. After a failed load the
+        models stay unset and are not loaded again.
+        """
+        if self._models_loaded or self._models_error is not None:
+            return
+        with self._models_lock:
+            if self._models_loaded or self._models_error is not None:
+                return
             try:
+                from transformers import pipeline
+                from hatesonar import Sonar
+                from nudenet import NudeDetector
+                
                 # Initialize NSFW content detection using NudeNet
-                self.nude_detector = NudeDetector()
+                nude_detector = NudeDetector()
                 
                 # Initialize NSFW classifier (NSFWJS model converted to PyTorch)
-                self.nsfw_classifier = pipeline(
+                nsfw_classifier = pipeline(
                     "image-classification",
                     model="Falconsai/nsfw_image_detection",
                     device=-1  # CPU
                 )
                 
                 # Initialize text toxicity detection with BERT
-                self.text_classifier = pipeline(
+                text_classifier = pipeline(
                     "text-classification",
                     model="unitary/multilingual-toxic-xlm-roberta",
                     device=-1  # CPU
                 )
                 
                 # Initialize HateSonar for additional hate speech detection
-                self.hate_sonar = Sonar()
-                
-                # Load HateXplain dataset for improved detection
-                self.hate_dataset = load_dataset("hatexplain", split="train")
+                hate_sonar = Sonar()
                 
             except Exception as e:
                 print(f"Warning: Failed to load ML models: {e}")
-                self.nsfw_classifier = None
-                self.text_classifier = None
-                self.hate_sonar = None
-                self.nude_detector = None
-        
-        # Initialize keyword blacklist
-        self.keyword_blacklist = KeywordBlacklist()
-        self._translation_api = None
+                self._models_error = e
+                return
+            self.nude_detector, self.nsfw_classifier = nude_detector, nsfw_classifier
+            self.text_classifier, self.hate_sonar = text_classifier, hate_sonar
+            self._models_loaded = True
+
+    async def load_models(self) -> None:
+        """Load the models in a worker thread, keeping the event loop free during the first load"""
+        if not self._models_loaded and self._models_error is None:
+            await asyncio.to_thread(self._load_models)
     
-    async def analyze_image(self, image_path: str) -> Dict[str, Any]:
-        """Analyze image for explicit content"""
+    async def analyze_image(self, image_path: ImageSource, max_side: Optional[int] = None) -> Dict[str, Any]:
+        """Analyze image (path, bytes, file-like or RGB array) for explicit content.
+        max_side downscales the image first (the low-resolution pass used under load)."""
         try:
-            # Perform NSFW detection
-            result = self.nsfw_classifier(image_path)
+            await self.load_models()
+            
+            # Perform NSFW detection (the pipeline takes paths or decoded images)
+            image = image_path if isinstance(image_path, str) and not max_side else load_image(image_path)
+            if max_side:
+                image = downscale(image, max_side)
+            result = await asyncio.to_thread(self.nsfw_classifier, image)
             
             # Process results
             is_explicit = any((pred['label'] == 'nsfw' and pred['score'] > 0.7) for pred in result)
@@ -103,8 +136,11 @@ class ContentModerator:
                 "error": str(e)
             }
     
-    async def analyze_text(self, text: str, language: str = None) -> Dict[str, Any]:
-        """Analyze text for abusive content with multilingual support"""
+    async def analyze_text(self, text: str, language: str = None, blacklist_only: bool = False) -> Dict[str, Any]:
+        """Analyze text for abusive content with multilingual support.
+        blacklist_only skips language detection, translation and the classifier (used under load)."""
+        if blacklist_only:
+            return self._check_blacklists(text, language)
         try:
             # Detect language if not provided
             if not language:
@@ -147,6 +183,7 @@ class ContentModerator:
                         break
             else:
                 # Use the real classifier if available and not in test mode
+                await self.load_models()
                 if hasattr(self, 'text_classifier') and self.text_classifier is not None:
                     result = self.text_classifier(translated_text)
                     is_toxic = result[0]['label'] == 'toxic' and result[0]['score'] > 0.7
@@ -169,3 +206,18 @@ class ContentModerator:
                 "translated_text": None,
                 "error": str(e)
             }
+
+    def _check_blacklists(self, text: str, language: str = None) -> Dict[str, Any]:
+        """Keyword-only check; without a language every blacklist is tried"""
+        languages = [language] if language else list(self.keyword_blacklist.blacklists)
+        matched = []
+        for lang in languages:
+            matched.extend(self.keyword_blacklist.check_text(text, lang)["matched_words"])
+        return {
+            "is_toxic": bool(matched),
+            "confidence": 0.95 if matched else 0.0,
+            "language": language,
+            "blacklisted_words": matched,
+            "translated_text": None,
+            "error": None
+        }
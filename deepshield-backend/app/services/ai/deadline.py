@@ -0,0 +1,58 @@
+"""
+Per-request deadlines checked cooperatively by long-running analyses
+"""
+from typing import Optional
+import time
+
+from app.config import settings
+
+# Client-supplied time budget in seconds, capped by ANALYSIS_MAX_DEADLINE_SECONDS
+DEADLINE_HEADER = "X-Request-Timeout"
+
+DEADLINE_EXCEEDED = "deadline"
+CANCELLED = "cancelled"
+
+
+class Deadline:
+    """A point in (monotonic) time after which work should stop.
+
+    Services call `expired()` between units of work (frames, batches) and
+    return what they have so far, flagged as truncated. `cancel()` stops
+    work early, e.g. when the client has disconnected.
+    """
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.cancelled = False
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """Deadline from a header value, falling back to ANALYSIS_DEADLINE_SECONDS (0 = none)"""
+        seconds = settings.ANALYSIS_DEADLINE_SECONDS or None
+        if value:
+            try:
+                if float(value) > 0:
+                    seconds = float(value)
+            except ValueError:
+                pass
+        if seconds is not None:
+            seconds = min(seconds, settings.ANALYSIS_MAX_DEADLINE_SECONDS)
+        return cls(seconds)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.cancelled or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def reason(self) -> Optional[str]:
+        """Why work must stop (None while there is time left)"""
+        if self.cancelled:
+            return CANCELLED
+        if self.expired():
+            return DEADLINE_EXCEEDED
+        return None
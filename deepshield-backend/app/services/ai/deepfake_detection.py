@@ -1,111 +1,259 @@
-from typing import Dict, Any, List
-import torch
-from facenet_pytorch import MTCNN, InceptionResnetV1
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from PIL import Image
+import asyncio
+import math
+import threading
 import cv2
 import numpy as np
-from transformers import AutoFeatureExtractor, AutoModelForImageClassification
-from datasets import load_dataset
+from app.config import settings
+from .calibration import load_calibration
+from .deadline import Deadline
+from .image_io import ImageSource, load_image, downscale
+
+# Lower bound on the score spread assumed when testing whether a verdict is settled
+VIDEO_SCORE_STD_FLOOR = 0.05
+
+
+class _RunningScore:
+    """Count, mean and spread of frame scores without keeping the scores"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def add(self, score: float) -> None:
+        self.count += 1
+        self.total += score
+        self.total_squares += score * score
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def std(self) -> float:
+        if not self.count:
+            return 0.0
+        return math.sqrt(max(self.total_squares / self.count - self.mean() ** 2, 0.0))
+
+    def consistency(self) -> float:
+        """Same measure as DeepfakeDetector._calculate_temporal_consistency"""
+        return float(1.0 - self.std())
+
 
 class DeepfakeDetector:
     """Deepfake detection using FaceForensics++ pretrained models."""
-    def __init__(self, test_mode: bool = False):
+    def __init__(self, test_mode: bool = False, calibration_path: str = None):
         self.test_mode = test_mode
-        if not test_mode:
+        
+        # FaceForensics++ score statistics precomputed by the calibration command
+        calibration = load_calibration(calibration_path)["deepfake"]
+        self.ff_stats = {
+            "mean_manipulation_score": calibration["mean_manipulation_score"],
+            "std_manipulation_score": calibration["std_manipulation_score"]
+        }
+        self.threshold = calibration["threshold"]
+        
+        # Models (and torch/transformers) are loaded on first inference
+        self.mtcnn = None
+        self.model = None
+        self.feature_extractor = None
+        self._models_loaded = False
+        # Set when loading fails, so later calls fail fast instead of retrying the load
+        self._models_error: Optional[Exception] = None
+        self._models_lock = threading.Lock()
+
+    def _load_models(self) -> None:
+        """Import the ML stack and load models the first time they are needed.
+
+        Scoring runs in worker threads, so the load is locked: concurrent first
+        callers wait for it, and the flag is only set once the models are in place.
+        A failed load is remembered and re-raised without loading again.
+        """
+        if self._models_loaded:
+            return
+        with self._models_lock:
+            if self._models_loaded:
+                return
+            if self._models_error is not None:
+                raise RuntimeError("Deepfake detection models are unavailable") from self._models_error
             try:
+                from facenet_pytorch import MTCNN
+                from transformers import AutoFeatureExtractor, AutoModelForImageClassification
+                
                 # Initialize face detection
-                self.mtcnn = MTCNN(keep_all=True)
+                mtcnn = MTCNN(keep_all=True)
                 
                 # Initialize deepfake detection model
-                self.feature_extractor = AutoFeatureExtractor.from_pretrained("selimsef/dfdc_deepfake_challenge")
-                self.model = AutoModelForImageClassification.from_pretrained("selimsef/dfdc_deepfake_challenge")
-                
-                # Load FaceForensics++ dataset statistics for calibration
-                self.dataset = load_dataset("ondyari/faceforensics", split="train[:100]")
-                self.ff_stats = {
-                    "mean_manipulation_score": 0.5,
-                    "std_manipulation_score": 0.2
-                }
+                feature_extractor = AutoFeatureExtractor.from_pretrained("selimsef/dfdc_deepfake_challenge")
+                model = AutoModelForImageClassification.from_pretrained("selimsef/dfdc_deepfake_challenge")
             except Exception as e:
                 print(f"Failed to load deepfake detection models: {e}")
-                self.mtcnn = None
-                self.model = None
-                self.feature_extractor = None
+                self._models_error = e
+                raise
+            self.mtcnn, self.feature_extractor, self.model = mtcnn, feature_extractor, model
+            self._models_loaded = True
+
+    async def analyze_video(self, video_path: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Analyze video for deepfake manipulation using FaceForensics++ trained model.
 
-    async def analyze_video(self, video_path: str) -> Dict[str, Any]:
-        """Analyze video for deepfake manipulation using FaceForensics++ trained model."""
+        Collects the events of iter_video into a single result. Once the
+        deadline has passed (or the request was cancelled), the verdict over
+        the frames seen so far is returned with truncated=True.
+        """
+        frame_results = []
+        summary: Dict[str, Any] = {}
+        async for event in self.iter_video(video_path, deadline=deadline):
+            if event["type"] == "frame":
+                if event["has_face"]:
+                    frame_results.append({
+                        "frame": event["frame"],
+                        "is_deepfake": event["is_deepfake"],
+                        "confidence": event["confidence"]
+                    })
+            else:
+                summary = {key: value for key, value in event.items() if key != "type"}
+        return {"frame_analysis": frame_results, **summary}
+
+    async def iter_video(
+        self,
+        video_path: str,
+        deadline: Optional[Deadline] = None,
+        early_stop: bool = False,
+        stride: int = 5,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze a video incrementally, yielding one event per sampled frame.
+
+        Frame events ({"type": "frame", ...}) carry the frame index, progress
+        and, when a face was found, the frame verdict. The last event is
+        {"type": "result", ...} with the overall verdict. Only running sums are
+        kept, so memory does not grow with the length of the video. Frames are
+        decoded and scored in a worker thread and the deadline is checked
+        between samples. With early_stop, analysis ends as soon as the verdict
+        is statistically settled (truncation_reason "conclusive").
+        """
         if self.test_mode:
-            return {
-                "frame_analysis": [{"frame": 0, "is_deepfake": False, "confidence": 0.95}],
+            yield {
+                "type": "frame", "frame": 0, "frames_read": 1, "total_frames": 1,
+                "has_face": True, "is_deepfake": False, "confidence": 0.95
+            }
+            yield {
+                "type": "result",
                 "temporal_consistency": 0.98,
                 "is_deepfake": False,
                 "confidence": 0.95,
                 "facial_inconsistencies": [],
+                "frames_analyzed": 1,
+                "truncated": False,
+                "truncation_reason": None,
                 "error": None
             }
+            return
         
+        cap = None
+        step = None
+        scores = _RunningScore()
+        frames_analyzed = 0
         try:
             cap = cv2.VideoCapture(video_path)
-            frames_analyzed = 0
-            frame_results = []
-            total_confidence = 0
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+            truncation_reason = None
             
             while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
+                if deadline is not None and deadline.expired():
+                    truncation_reason = deadline.reason()
+                    break
+                if early_stop and self._is_conclusive(scores):
+                    truncation_reason = "conclusive"
                     break
-                    
-                # Process every 5th frame to improve performance
-                if frames_analyzed % 5 == 0:
-                    # Convert frame to PIL Image
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    # Detect faces
-                    faces = self.mtcnn(pil_image)
-                    if faces is not None:
-                        # Process image with deepfake detection model
-                        inputs = self.feature_extractor(pil_image, return_tensors="pt")
-                        outputs = self.model(**inputs)
-                        probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-                        
-                        # Get deepfake probability
-                        deepfake_prob = probs[0][1].item()  # Assuming binary classification
-                        total_confidence += deepfake_prob
-                        
-                        frame_results.append({
-                            "frame": frames_analyzed,
-                            "is_deepfake": deepfake_prob > 0.7,
-                            "confidence": float(deepfake_prob)
-                        })
-                
-                frames_analyzed += 1
                 
-            cap.release()
-            
-            # Calculate overall results
-            avg_confidence = total_confidence / len(frame_results) if frame_results else 0
-            is_deepfake = avg_confidence > 0.7
-            temporal_consistency = self._calculate_temporal_consistency(frame_results)
+                # Process every stride-th frame to improve performance
+                frame_index = frames_analyzed
+                step = asyncio.ensure_future(asyncio.to_thread(self._analyze_video_step, cap, stride))
+                ended, deepfake_prob, frames_read = await asyncio.shield(step)
+                frames_analyzed += frames_read
+                if frames_read:
+                    event = {
+                        "type": "frame",
+                        "frame": frame_index,
+                        "frames_read": frames_analyzed,
+                        "total_frames": total_frames,
+                        "has_face": deepfake_prob is not None,
+                        "is_deepfake": None,
+                        "confidence": None
+                    }
+                    if deepfake_prob is not None:
+                        scores.add(deepfake_prob)
+                        event.update({"is_deepfake": deepfake_prob > self.threshold, "confidence": float(deepfake_prob)})
+                    yield event
+                if ended:
+                    break
             
-            return {
-                "frame_analysis": frame_results,
-                "temporal_consistency": temporal_consistency,
-                "is_deepfake": is_deepfake,
-                "confidence": float(avg_confidence),
+            yield {
+                "type": "result",
+                "temporal_consistency": scores.consistency(),
+                "is_deepfake": scores.mean() > self.threshold,
+                "confidence": float(scores.mean()),
                 "facial_inconsistencies": [],
+                "frames_analyzed": frames_analyzed,
+                "truncated": truncation_reason is not None,
+                "truncation_reason": truncation_reason,
                 "error": None
             }
             
         except Exception as e:
-            return {
-                "frame_analysis": [],
+            yield {
+                "type": "result",
                 "temporal_consistency": 0.0,
                 "is_deepfake": False,
                 "confidence": 0.0,
                 "facial_inconsistencies": [],
+                "frames_analyzed": frames_analyzed,
+                "truncated": False,
+                "truncation_reason": None,
                 "error": str(e)
             }
+        finally:
+            if cap is not None:
+                if step is not None and not step.done():
+                    # Cancelled mid-frame: release once the decoding thread is done with it
+                    step.add_done_callback(lambda _: cap.release())
+                else:
+                    cap.release()
+
+    def _is_conclusive(self, scores: "_RunningScore") -> bool:
+        """The mean score is far enough from the threshold that more frames won't flip it"""
+        if scores.count < settings.VIDEO_EARLY_STOP_MIN_FRAMES:
+            return False
+        margin = settings.VIDEO_EARLY_STOP_Z * max(scores.std(), VIDEO_SCORE_STD_FLOOR) / math.sqrt(scores.count)
+        return abs(scores.mean() - self.threshold) > margin
+
+    def _analyze_video_step(self, cap, stride: int) -> Tuple[bool, Optional[float], int]:
+        """Score the next frame and skip the following stride - 1; returns (ended, score, frames read)"""
+        ret, frame = cap.read()
+        if not ret:
+            return True, None, 0
+        
+        # Convert frame to PIL Image and score it if it contains faces
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        deepfake_prob = self._score_image(Image.fromarray(frame_rgb))
+        for skipped in range(1, stride):
+            if not cap.grab():
+                return True, deepfake_prob, skipped
+        return False, deepfake_prob, stride
+
+    def _score_image(self, image: Image.Image) -> Optional[float]:
+        """Return the deepfake probability for an image, or None if it has no faces."""
+        import torch
+        
+        self._load_models()
+        faces = self.mtcnn(image)
+        if faces is None:
+            return None
+        
+        # Process image with deepfake detection model
+        inputs = self.feature_extractor(image, return_tensors="pt")
+        outputs = self.model(**inputs)
+        probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+        return probs[0][1].item()  # Assuming binary classification
 
     def _calculate_temporal_consistency(self, frame_results: List[Dict]) -> float:
         """Calculate temporal consistency of deepfake predictions across frames."""
@@ -116,8 +264,11 @@ class DeepfakeDetector:
         consistency = 1.0 - np.std(confidences)
         return float(consistency)
 
-    async def analyze_image(self, image_path: str) -> Dict[str, Any]:
-        """Analyze an image for potential deepfake manipulation using FaceForensics++ trained model."""
+    async def analyze_image(self, image_path: ImageSource, max_side: Optional[int] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Analyze an image (path, bytes, file-like or RGB array) for potential deepfake manipulation using FaceForensics++ trained model.
+
+        max_side downscales the image first (the low-resolution pass used under load).
+        """
         if self.test_mode:
             return {
                 "is_deepfake": False,
@@ -127,13 +278,25 @@ class DeepfakeDetector:
                 "manipulation_score": 0.05
             }
             
+        if deadline is not None and deadline.expired():
+            return {
+                "is_deepfake": False,
+                "confidence": 0.0,
+                "error": f"Analysis stopped ({deadline.reason()})",
+                "facial_inconsistencies": [],
+                "manipulation_score": 0.0
+            }
+        
         try:
-            # Load and preprocess image
-            image = Image.open(image_path)
+            # Load and preprocess image (decoded in memory for non-path inputs)
+            image = load_image(image_path)
+            if max_side:
+                image = downscale(image, max_side)
             
-            # Detect faces
-            faces = self.mtcnn(image)
-            if faces is None:
+            # Get deepfake probability (None when no faces are detected); the
+            # model runs off the event loop like the per-frame video scoring
+            deepfake_prob = await asyncio.to_thread(self._score_image, image)
+            if deepfake_prob is None:
                 return {
                     "is_deepfake": False,
                     "confidence": 0.0,
@@ -142,14 +305,6 @@ class DeepfakeDetector:
                     "manipulation_score": 0.0
                 }
             
-            # Process image with deepfake detection model
-            inputs = self.feature_extractor(image, return_tensors="pt")
-            outputs = self.model(**inputs)
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            
-            # Get deepfake probability
-            deepfake_prob = probs[0][1].item()  # Assuming binary classification
-            
             # Calculate manipulation score based on model confidence
             manipulation_score = deepfake_prob
             
@@ -157,7 +312,7 @@ class DeepfakeDetector:
             normalized_score = (manipulation_score - self.ff_stats["mean_manipulation_score"]) / self.ff_stats["std_manipulation_score"]
             
             return {
-                "is_deepfake": deepfake_prob > 0.7,
+                "is_deepfake": deepfake_prob > self.threshold,
                 "confidence": float(deepfake_prob),
                 "error": None,
                 "facial_inconsistencies": [],
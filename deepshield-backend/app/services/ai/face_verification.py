@@ -1,41 +1,75 @@
-from typing import Dict, Any, List, Tuple
-import torch
-from facenet_pytorch import MTCNN, InceptionResnetV1
+from typing import Dict, Any, List, Tuple, Optional, TYPE_CHECKING
 from PIL import Image
+import asyncio
+import threading
 import numpy as np
-from deepface import DeepFace
 import cv2
-from datasets import load_dataset
+from .calibration import load_calibration
+from .deadline import Deadline
+from .image_io import ImageSource, load_image, to_bgr_array
+
+if TYPE_CHECKING:
+    import torch
 
 class FaceVerifier:
     """Face verification using FaceNet and DeepFace models."""
-    def __init__(self, test_mode: bool = False):
+    def __init__(self, test_mode: bool = False, calibration_path: str = None):
         self.test_mode = test_mode
-        if not test_mode:
+        
+        # Thresholds precomputed by the calibration command
+        calibration = load_calibration(calibration_path)["face_verification"]
+        self.similarity_threshold = calibration["similarity_threshold"]
+        self.confidence_threshold = calibration["confidence_threshold"]
+        
+        # Models (and torch/deepface) are loaded on first inference
+        self.mtcnn = None
+        self.facenet = None
+        self._models_loaded = False
+        # Set when loading fails, so later calls fail fast instead of retrying the load
+        self._models_error: Optional[Exception] = None
+        self._models_lock = threading.Lock()
+
+    def _load_models(self) -> None:
+        """Import the ML stack and load models the first time they are needed.
+
+        The load is locked so concurrent first callers wait for it, and the
+        flag is only set once the models are in place. A failed load is
+        remembered and re-raised without loading again.
+        """
+        if self._models_loaded:
+            return
+        with self._models_lock:
+            if self._models_loaded:
+                return
+            if self._models_error is not None:
+                raise RuntimeError("Face verification models are unavailable") from self._models_error
             try:
+                from facenet_pytorch import MTCNN, InceptionResnetV1
+                
                 # Initialize face detection
-                self.mtcnn = MTCNN(keep_all=True)
+                mtcnn = MTCNN(keep_all=True)
                 
                 # Initialize face recognition model (FaceNet)
-                self.facenet = InceptionResnetV1(pretrained='vggface2').eval()
-                
-                # Load face verification dataset for threshold calibration
-                self.dataset = load_dataset("vggface2", split="train[:100]")
-                
-                # Initialize threshold values
-                self.similarity_threshold = 0.7
-                self.confidence_threshold = 0.85
-                
+                facenet = InceptionResnetV1(pretrained='vggface2').eval()
             except Exception as e:
                 print(f"Failed to load face verification models: {e}")
-                self.mtcnn = None
-                self.facenet = None
+                self._models_error = e
+                raise
+            self.mtcnn, self.facenet = mtcnn, facenet
+            self._models_loaded = True
+
+    async def load_models(self) -> None:
+        """Load the models in a worker thread, keeping the event loop free during the first load"""
+        if not self._models_loaded:
+            await asyncio.to_thread(self._load_models)
     
-    def _extract_face_embedding(self, image_path: str) -> Tuple[torch.Tensor, float]:
+    def _extract_face_embedding(self, image_path: ImageSource) -> Tuple[Optional["torch.Tensor"], float]:
         """Extract face embedding from image using FaceNet."""
         try:
-            # Load and preprocess image
-            img = Image.open(image_path)
+            self._load_models()
+            
+            # Load and preprocess image (decoded in memory for non-path inputs)
+            img = load_image(image_path)
             
             # Detect face
             face = self.mtcnn(img)
@@ -50,8 +84,10 @@ class FaceVerifier:
             print(f"Error extracting face embedding: {e}")
             return None, 0.0
 
-    async def verify_face(self, image1_path: str, image2_path: str) -> Dict[str, Any]:
-        """Verify if two face images match using multiple models."""
+    async def verify_face(self, image1_path: ImageSource, image2_path: ImageSource, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Verify if two face images (paths, bytes, file-like or RGB arrays) match using multiple models.
+        If the deadline passes after the FaceNet comparison, the DeepFace cross-check is skipped
+        and the result is flagged as truncated."""
         if self.test_mode:
             return {
                 "verified": True,
@@ -61,7 +97,18 @@ class FaceVerifier:
                 "error": None
             }
             
+        if deadline is not None and deadline.expired():
+            return {
+                "verified": False,
+                "confidence": 0.0,
+                "face_match": False,
+                "id_valid": False,
+                "error": f"Verification stopped ({deadline.reason()})"
+            }
+            
         try:
+            await self.load_models()
+            
             # Get face embeddings
             embedding1, conf1 = self._extract_face_embedding(image1_path)
             embedding2, conf2 = self._extract_face_embedding(image2_path)
@@ -76,15 +123,20 @@ class FaceVerifier:
                 }
             
             # Calculate cosine similarity
+            import torch
             similarity = torch.nn.functional.cosine_similarity(embedding1, embedding2)
             similarity_score = float(similarity.item())
             
             # Use DeepFace as secondary verification
-            try:
-                deepface_result = DeepFace.verify(image1_path, image2_path)
-                deepface_verified = deepface_result.get("verified", False)
-            except:
-                deepface_verified = None
+            truncation_reason = deadline.reason() if deadline is not None else None
+            deepface_verified = None
+            if truncation_reason is None:
+                try:
+                    from deepface import DeepFace
+                    deepface_result = DeepFace.verify(to_bgr_array(image1_path), to_bgr_array(image2_path))
+                    deepface_verified = deepface_result.get("verified", False)
+                except:
+                    deepface_verified = None
             
             # Combine results
             verified = similarity_score > self.similarity_threshold
@@ -93,13 +145,16 @@ class FaceVerifier:
             
             confidence = (similarity_score + conf1 + conf2) / 3
             
-            return {
+            result = {
                 "verified": verified,
                 "confidence": float(confidence),
                 "face_match": verified,
                 "id_valid": confidence > self.confidence_threshold,
                 "error": None
             }
+            if truncation_reason is not None:
+                result.update({"truncated": True, "truncation_reason": truncation_reason})
+            return result
             
         except Exception as e:
             return {
@@ -110,7 +165,57 @@ class FaceVerifier:
                 "error": str(e)
             }
 
-    async def verify_profile_image(self, profile_image: str, reference_image: str) -> Dict[str, Any]:
+    async def extract_face_data(self, image_path: ImageSource) -> Dict[str, Any]:
+        """Detect the most prominent face and return its bounding box and landmarks."""
+        if self.test_mode:
+            return {
+                "success": True,
+                "face_count": 1,
+                "face_data": {
+                    "bbox": [0, 0, 100, 100],
+                    "confidence": 0.99,
+                    "landmarks": {"left_eye": [30, 30]}
+                },
+                "error": None
+            }
+        
+        try:
+            await self.load_models()
+            img = load_image(image_path)
+            
+            boxes, probs, points = self.mtcnn.detect(img, landmarks=True)
+            if boxes is None:
+                return {
+                    "success": False,
+                    "face_count": 0,
+                    "face_data": None,
+                    "error": "No face detected in image"
+                }
+            
+            landmark_names = ["left_eye", "right_eye", "nose", "mouth_left", "mouth_right"]
+            return {
+                "success": True,
+                "face_count": len(boxes),
+                "face_data": {
+                    "bbox": [float(v) for v in boxes[0]],
+                    "confidence": float(probs[0]),
+                    "landmarks": {
+                        name: [float(v) for v in point]
+                        for name, point in zip(landmark_names, points[0])
+                    }
+                },
+                "error": None
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "face_count": 0,
+                "face_data": None,
+                "error": str(e)
+            }
+
+    async def verify_profile_image(self, profile_image: ImageSource, reference_image: ImageSource) -> Dict[str, Any]:
         """Verify if a profile image matches a reference image."""
         try:
             # Use the same verification logic as verify_face
@@ -120,7 +225,8 @@ class FaceVerifier:
             if result["verified"]:
                 # Check for image manipulation using DeepFace
                 try:
-                    analysis = DeepFace.analyze(profile_image, actions=['emotion', 'age', 'gender'])
+                    from deepface import DeepFace
+                    analysis = DeepFace.analyze(to_bgr_array(profile_image), actions=['emotion', 'age', 'gender'])
                     result.update({
                         "analysis": {
                             "emotion": analysis[0].get("dominant_emotion"),
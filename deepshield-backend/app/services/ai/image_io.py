@@ -0,0 +1,45 @@
+"""
+Decoding of image inputs given as paths, in-memory buffers or arrays
+"""
+from typing import Union, BinaryIO
+import io
+import os
+import numpy as np
+from PIL import Image
+
+# Accepted by the AI services wherever an image is analyzed
+ImageSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO, np.ndarray, Image.Image]
+
+
+def load_image(source: ImageSource) -> Image.Image:
+    """Decode an image source into an RGB PIL image.
+
+    Paths are opened from disk, raw bytes and file-like objects are decoded
+    in memory, and ndarrays are taken as RGB (HxWx3) or grayscale (HxW).
+    """
+    if isinstance(source, Image.Image):
+        image = source
+    elif isinstance(source, np.ndarray):
+        image = Image.fromarray(source.astype(np.uint8) if source.dtype != np.uint8 else source)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        image = Image.open(io.BytesIO(source))
+    else:
+        # Paths and file-like objects are both handled by PIL
+        image = Image.open(source)
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def to_bgr_array(source: ImageSource) -> Union[str, np.ndarray]:
+    """Input for OpenCV-based libraries (DeepFace): paths pass through, anything else becomes BGR"""
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    return np.asarray(load_image(source))[:, :, ::-1].copy()
+
+
+def downscale(image: Image.Image, max_side: int) -> Image.Image:
+    """Shrink an image so its longest side is at most max_side (cheap pass under load)"""
+    if max(image.size) <= max_side:
+        return image
+    image = image.copy()
+    image.thumbnail((max_side, max_side))
+    return image
@@ -0,0 +1,135 @@
+"""
+TTL/ETag response cache with in-flight deduplication for Graph API lookups
+"""
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from collections import OrderedDict
+import asyncio
+import time
+
+from app.config import settings
+from .http_client import HTTPResponse
+
+CacheKey = Tuple[str, ...]
+Fetcher = Callable[[Optional[str]], Awaitable[HTTPResponse]]
+
+
+class _FetchAbandoned(Exception):
+    """The caller performing a shared fetch was cancelled; waiters fetch again"""
+
+
+class _Entry:
+    __slots__ = ("response", "etag", "expires_at")
+
+    def __init__(self, response: HTTPResponse, etag: Optional[str], expires_at: float):
+        self.response = response
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class GraphResponseCache:
+    """Process-local cache of successful Graph API GET responses.
+
+    Entries live for the TTL of their endpoint and at most `max_entries` are
+    kept (least recently used evicted first). An expired entry that carried
+    an ETag is revalidated with If-None-Match, so an unchanged object costs
+    a 304 instead of a full response. Concurrent lookups of the same key
+    share a single request.
+    """
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: Optional[int] = None):
+        self.ttls = ttls if ttls is not None else settings.INSTAGRAM_CACHE_TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else settings.INSTAGRAM_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._pending: Dict[CacheKey, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(endpoint: str, url: str, params: Dict[str, Any]) -> CacheKey:
+        """Key on endpoint, URL and request fields (the access token is left out)"""
+        fields = tuple(f"{name}={params[name]}" for name in sorted(params) if name != "access_token")
+        return (endpoint, url) + fields
+
+    def _store(self, key: CacheKey, response: HTTPResponse, ttl: float) -> None:
+        self._entries[key] = _Entry(response, response.header("ETag"), time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, endpoint: str, key: CacheKey, fetch: Fetcher) -> HTTPResponse:
+        """Cached response for key, calling fetch(etag) on a miss or expiry"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures from a previous event loop can never complete here
+            self._pending = {}
+            self._loop = loop
+
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _FetchAbandoned:
+                continue
+
+        future = loop.create_future()
+        self._pending[key] = future
+        try:
+            response = await fetch(entry.etag if entry is not None else None)
+            ttl = self.ttls.get(endpoint, 0)
+            if response.status == 304 and entry is not None:
+                self.revalidated += 1
+                entry.expires_at = time.monotonic() + ttl
+                response = entry.response
+            else:
+                self.misses += 1
+                if 200 <= response.status < 300 and ttl > 0:
+                    self._store(key, response, ttl)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.set_exception(_FetchAbandoned())
+            future.exception()  # waiters may be gone; avoid "never retrieved" warnings
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    def invalidate(self, endpoint: Optional[str] = None) -> None:
+        """Drop every entry (or those of one endpoint)"""
+        if endpoint is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == endpoint]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.revalidated
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.revalidated) / lookups if lookups else 0.0
+        }
+
+
+graph_response_cache = GraphResponseCache()
@@ -0,0 +1,206 @@
+"""
+Token-bucket pacing of Instagram Graph API calls, driven by Meta's usage headers
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import json
+import time
+
+from app.config import settings
+from .http_client import HTTPResponse
+
+# Call priorities, most urgent first
+URGENT = "urgent"  # media fetches for webhook events
+NORMAL = "normal"  # interactive lookups such as profile verification
+BULK = "bulk"  # insights, hashtag search, backfills
+PRIORITIES = (URGENT, NORMAL, BULK)
+
+# Graph API error codes meaning an app, user or business call limit was hit
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80001, 80002}
+
+
+def parse_usage(response: HTTPResponse) -> Tuple[Optional[float], Optional[float]]:
+    """Highest usage percentage and seconds until access is regained, from
+    the X-App-Usage / X-Business-Use-Case-Usage headers (None when absent)"""
+    usage: Optional[float] = None
+    regain: Optional[float] = None
+
+    def take(values: Dict[str, Any]) -> None:
+        nonlocal usage, regain
+        for key in ("call_count", "total_cputime", "total_time"):
+            if isinstance(values.get(key), (int, float)):
+                usage = max(usage or 0.0, float(values[key]))
+        minutes = values.get("estimated_time_to_regain_access")
+        if isinstance(minutes, (int, float)) and minutes > 0:
+            regain = max(regain or 0.0, minutes * 60.0)
+
+    for header in ("X-App-Usage", "X-Ad-Account-Usage"):
+        value = response.header(header)
+        if value:
+            try:
+                take(json.loads(value))
+            except (ValueError, AttributeError):
+                pass
+    value = response.header("X-Business-Use-Case-Usage")
+    if value:
+        try:
+            for entries in json.loads(value).values():
+                for entry in entries:
+                    take(entry)
+        except (ValueError, AttributeError, TypeError):
+            pass
+    return usage, regain
+
+
+def is_throttled(response: HTTPResponse) -> bool:
+    if response.status == 429:
+        return True
+    if response.status < 400:
+        return False
+    try:
+        error = (response.json() or {}).get("error") or {}
+    except (ValueError, AttributeError):
+        return False
+    return error.get("code") in THROTTLE_ERROR_CODES
+
+
+class GraphRateLimiter:
+    """Paces Graph API calls so the app stays inside Meta's call budget.
+
+    Calls take one token from a bucket holding up to `burst` tokens and
+    refilling at `calls_per_hour`. Callers without a token wait in priority
+    order (urgent before normal before bulk, FIFO within a class). Usage
+    reported by the API slows the refill linearly once it passes
+    `slowdown_percent`; a throttled response, or usage at 100%, stops all
+    calls until access is regained (or for `cooldown` seconds when the
+    response does not say).
+    """
+    def __init__(
+        self,
+        calls_per_hour: Optional[float] = None,
+        burst: Optional[int] = None,
+        slowdown_percent: Optional[float] = None,
+        cooldown: Optional[float] = None,
+    ):
+        self.calls_per_hour = calls_per_hour if calls_per_hour is not None else settings.INSTAGRAM_RATE_LIMIT_PER_HOUR
+        self.burst = burst if burst is not None else settings.INSTAGRAM_RATE_LIMIT_BURST
+        self.slowdown_percent = slowdown_percent if slowdown_percent is not None else settings.INSTAGRAM_USAGE_SLOWDOWN_PERCENT
+        self.cooldown = cooldown if cooldown is not None else settings.INSTAGRAM_RATE_LIMIT_COOLDOWN_SECONDS
+        self.tokens = float(self.burst)
+        self.usage_percent: Optional[float] = None
+        self.blocked_until = 0.0
+        self._refilled_at = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.granted: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self.waited_seconds: Dict[str, float] = {priority: 0.0 for priority in PRIORITIES}
+        self.throttled = 0
+
+    def rate(self) -> float:
+        """Current refill rate in tokens per second"""
+        rate = self.calls_per_hour / 3600.0
+        if self.usage_percent is not None and self.usage_percent > self.slowdown_percent:
+            rate *= max(100.0 - self.usage_percent, 0.0) / (100.0 - self.slowdown_percent)
+        return rate
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.tokens + (now - self._refilled_at) * self.rate(), float(self.burst))
+        self._refilled_at = now
+
+    def _block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def _dispatch(self) -> None:
+        """Hand tokens to waiters in priority order and arm the next wake-up"""
+        self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters and now >= self.blocked_until and self.tokens >= 1:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue  # cancelled while waiting
+            self.tokens -= 1
+            waiter.set_result(None)
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if not self._waiters:
+            return
+
+        if now < self.blocked_until:
+            delay = self.blocked_until - now
+        elif self.rate() > 0:
+            delay = (1 - self.tokens) / self.rate()
+        else:
+            delay = self.cooldown
+        self._timer = self._loop.call_later(max(delay, 0.001), self._dispatch)
+
+    async def acquire(self, priority: str = NORMAL) -> None:
+        """Wait for a call token"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Waiters and timers from a previous event loop can never fire here
+            self._waiters = []
+            self._timer = None
+            self._loop = loop
+
+        queued_at = time.monotonic()
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.index(priority), next(self._sequence), waiter))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.tokens += 1  # granted just as the caller gave up
+            waiter.cancel()
+            raise
+        self.granted[priority] += 1
+        self.waited_seconds[priority] += time.monotonic() - queued_at
+
+    def observe(self, response: HTTPResponse) -> None:
+        """Update the budget from a Graph API response"""
+        self._refill(time.monotonic())
+        usage, regain = parse_usage(response)
+        if usage is not None:
+            self.usage_percent = usage
+        if is_throttled(response) or (usage is not None and usage >= 100):
+            self.throttled += 1
+            self._block(regain or response.retry_after() or self.cooldown)
+        elif regain:
+            self._block(regain)
+        if self._waiters and self._timer is not None:
+            # Re-plan the next wake-up for the new rate or block
+            self._timer.cancel()
+            self._dispatch()
+
+    def blocked_seconds(self) -> float:
+        """Time left until calls are granted again after a throttle"""
+        return max(self.blocked_until - time.monotonic(), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "tokens": self.tokens,
+            "burst": self.burst,
+            "calls_per_hour": self.calls_per_hour,
+            "effective_calls_per_hour": self.rate() * 3600.0,
+            "usage_percent": self.usage_percent,
+            "remaining_budget_percent": None if self.usage_percent is None else max(100.0 - self.usage_percent, 0.0),
+            "blocked_seconds": max(self.blocked_until - now, 0.0),
+            "waiting": {
+                priority: sum(1 for rank, _, waiter in self._waiters if rank == index and not waiter.done())
+                for index, priority in enumerate(PRIORITIES)
+            },
+            "granted": dict(self.granted),
+            "waited_seconds": dict(self.waited_seconds),
+            "throttled_responses": self.throttled
+        }
+
+
+graph_rate_limiter = GraphRateLimiter()
@@ -0,0 +1,226 @@
+"""
+Shared connection-pooled async HTTP client for outbound API calls
+"""
+from typing import Dict, Any, Optional, Iterable, AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncio
+import json
+import random
+import aiohttp
+
+from app.config import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds requested by a Retry-After value (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class HTTPStatusError(Exception):
+    """Raised by HTTPResponse.raise_for_status for non-2xx responses"""
+    def __init__(self, status: int, url: str, body: bytes = b""):
+        self.status = status
+        self.url = url
+        self.body = body
+        super().__init__(f"HTTP {status} for {url}")
+
+
+class HTTPResponse:
+    """Fully-read response, detached from the underlying connection"""
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, url: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    def header(self, name: str) -> Optional[str]:
+        """Case-insensitive header lookup"""
+        name = name.lower()
+        for key, value in self.headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds requested by a Retry-After header (delta or HTTP date)"""
+        return parse_retry_after(self.header("Retry-After"))
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise HTTPStatusError(self.status, self.url, self.body)
+
+
+class PooledHTTPClient:
+    """Keep-alive aiohttp session with timeouts and jittered retries.
+
+    A single session (and its connection pool) is reused for every request
+    made on the same event loop, so repeated calls to the same host skip the
+    TCP/TLS handshake. Each event loop (e.g. one per worker thread) gets its
+    own session; sessions of loops that have since closed are detached when
+    the client is next used. A retryable response carrying Retry-After is retried
+    after the requested delay, unless that exceeds `max_retry_after`, in
+    which case the response is returned as is.
+    """
+    def __init__(
+        self,
+        base_url: str = "",
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        keepalive: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        max_retry_after: Optional[float] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout if timeout is not None else settings.HTTP_TIMEOUT_SECONDS
+        self.connect_timeout = connect_timeout if connect_timeout is not None else settings.HTTP_CONNECT_TIMEOUT_SECONDS
+        self.pool_size = pool_size if pool_size is not None else settings.HTTP_POOL_SIZE
+        self.keepalive = keepalive if keepalive is not None else settings.HTTP_KEEPALIVE_SECONDS
+        self.max_retries = max_retries if max_retries is not None else settings.HTTP_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else settings.HTTP_RETRY_BACKOFF_SECONDS
+        self.retry_statuses = set(retry_statuses)
+        self.max_retry_after = max_retry_after if max_retry_after is not None else settings.HTTP_MAX_RETRY_AFTER_SECONDS
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the session for the running loop, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        for other in [other for other in self._sessions if other.is_closed()]:
+            # close() is a coroutine needing the dead loop; detaching just drops the session
+            self._sessions.pop(other).detach()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            )
+            self._sessions[loop] = session
+        return session
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}" if path else self.base_url
+
+    async def request(self, method: str, path: str = "", **kwargs) -> HTTPResponse:
+        """Send a request, retrying connection errors and retryable statuses"""
+        url = self._url(path)
+        attempt = 0
+        while True:
+            delay = self.backoff_delay(attempt)
+            try:
+                session = self._get_session()
+                async with session.request(method, url, **kwargs) as response:
+                    body = await response.read()
+                    result = HTTPResponse(response.status, dict(response.headers), body, str(response.url))
+                if result.status not in self.retry_statuses or attempt >= self.max_retries:
+                    return result
+                retry_after = result.retry_after()
+                if retry_after is not None:
+                    if retry_after > self.max_retry_after:
+                        return result
+                    delay = retry_after
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str = "", **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Open a response for reading the body incrementally.
+
+        Connecting and retryable statuses are retried as in `request`. The
+        timeout bounds each socket read rather than the whole transfer, so
+        large bodies are not cut off by HTTP_TIMEOUT_SECONDS.
+        """
+        url = self._url(path)
+        kwargs.setdefault("timeout", aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.timeout))
+        attempt = 0
+        while True:
+            delay = self.backoff_delay(attempt)
+            try:
+                response = await self._get_session().request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status not in self.retry_statuses or attempt >= self.max_retries:
+                    break
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.release()
+                if retry_after is not None:
+                    if retry_after > self.max_retry_after:
+                        raise HTTPStatusError(response.status, url)
+                    delay = retry_after
+            await asyncio.sleep(delay)
+            attempt += 1
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def get(self, path: str = "", **kwargs) -> HTTPResponse:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str = "", **kwargs) -> HTTPResponse:
+        return await self.request("POST", path, **kwargs)
+
+    async def close(self) -> None:
+        """Close every session: this loop's directly, others on their own running loop"""
+        loop = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for other, session in sessions.items():
+            if session.closed:
+                continue
+            if other is loop:
+                await session.close()
+            elif other.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), other)
+            else:
+                session.detach()
+
+
+_clients: Dict[str, PooledHTTPClient] = {}
+
+
+def get_http_client(name: str, **kwargs) -> PooledHTTPClient:
+    """Return the shared client registered under name, creating it if needed"""
+    if name not in _clients:
+        _clients[name] = PooledHTTPClient(**kwargs)
+    return _clients[name]
+
+
+async def close_http_clients() -> None:
+    """Close every shared client session (called on application shutdown)"""
+    for client in _clients.values():
+        await client.close()
@@ -1,60 +1,200 @@
 """
 Instagram API integration for profile verification and content analysis
 """
-from typing import Dict, Any, List
-import requests
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple, Iterable, AsyncIterator, Deque
+from collections import deque
+import asyncio
 import hmac
 import hashlib
 import json
-import aiohttp
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from app.core.config import settings
 from app.services.ai.deepfake_detection import DeepfakeDetector
 from app.services.ai.content_moderation import ContentModerator
+from app.services.ai import account_features
 from app.services.notifications.mock import MockNotificationService
 from app.db.mongodb import get_database
+from app.api.deps import get_current_user, get_current_admin_user
+from app.services.jobs import job_queue, ANALYSIS_QUEUE
+from app.services.storage import StoredUpload, upload_retention
+from .http_client import PooledHTTPClient, HTTPResponse, get_http_client, RETRY_STATUSES
+from .graph_rate_limiter import GraphRateLimiter, graph_rate_limiter, is_throttled, URGENT, NORMAL, BULK
+from .graph_cache import GraphResponseCache, graph_response_cache
+from .media_downloader import MediaDownloader, media_downloader
+from .instagram_backfill import backfill_checkpoints
 
 router = APIRouter()
 
+# Daily follower-count snapshots kept per account for the growth slope
+FOLLOWER_HISTORY_DAYS = 90
+
+BEHAVIOR_FIELDS = (
+    "is_suspicious", "risk_score", "behavioral_flags", "account_age_days", "post_count", "post_frequency",
+    "posts_per_day", "interval_entropy", "interval_cv", "hour_entropy", "timeline_complete"
+)
+METADATA_FIELDS = ("account_age", "post_frequency", "posts_per_day", "followers", "follower_growth_rate", "follower_growth_slope")
+
 class InstagramAPI:
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: Optional[PooledHTTPClient] = None,
+        rate_limiter: Optional[GraphRateLimiter] = None,
+        cache: Optional[GraphResponseCache] = None,
+        downloader: Optional[MediaDownloader] = None,
+    ):
         self.app_id = settings.INSTAGRAM_APP_ID
         self.app_secret = settings.INSTAGRAM_APP_SECRET
         self.access_token = settings.INSTAGRAM_ACCESS_TOKEN
         self.account_id = "17841451799717870"  # Hardcoded for now since it's not in settings
-        self.base_url = "https://graph.instagram.com/v12.0"
+        self.base_url = settings.INSTAGRAM_GRAPH_URL
+        # All instances share one pooled Graph API client unless injected. It
+        # does not retry statuses itself: retries go back through the rate
+        # limiter in _graph_get so each one is paced and counted
+        self.http_client = http_client or get_http_client(
+            "instagram",
+            timeout=settings.INSTAGRAM_TIMEOUT_SECONDS,
+            pool_size=settings.INSTAGRAM_POOL_SIZE,
+            retry_statuses=()
+        )
+        # Calls share the app's call budget, so the limiter is shared too
+        self.rate_limiter = rate_limiter or graph_rate_limiter
+        self.cache = cache or graph_response_cache
+        self.media_downloader = downloader or media_downloader
         self.deepfake_detector = DeepfakeDetector()
         self.content_moderator = ContentModerator()
         self.notification_service = MockNotificationService()
         
+    async def _graph_get(self, url: str, params: Dict[str, Any], priority: str, endpoint: Optional[str] = None) -> HTTPResponse:
+        """GET a Graph API URL once the rate limiter grants a call.
+
+        With `endpoint`, the response is served from (and stored in) the
+        response cache under that endpoint's TTL. Throttled and 5xx responses
+        are retried up to the client's max_retries, each attempt taking a
+        token; after a throttle the limiter holds the retry until access is
+        regained, and the response is returned instead when that is further
+        off than the client's max_retry_after.
+        """
+        async def fetch(etag: Optional[str] = None) -> HTTPResponse:
+            headers = {"If-None-Match": etag} if etag else None
+            attempt = 0
+            while True:
+                await self.rate_limiter.acquire(priority)
+                response = await self.http_client.get(url, params=params, headers=headers)
+                self.rate_limiter.observe(response)
+                throttled = is_throttled(response)
+                if not (throttled or response.status in RETRY_STATUSES) or attempt >= self.http_client.max_retries:
+                    return response
+                if throttled:
+                    if self.rate_limiter.blocked_seconds() > self.http_client.max_retry_after:
+                        return response
+                else:
+                    await asyncio.sleep(self.http_client.backoff_delay(attempt))
+                attempt += 1
+
+        if endpoint is None:
+            return await fetch()
+        return await self.cache.get(endpoint, GraphResponseCache.make_key(endpoint, url, params), fetch)
+
+    async def fetch_timeline(self, username: str, priority: str = NORMAL) -> Dict[str, Any]:
+        """Follower count and recent media (time, likes, comments) of a business
+        or creator account, looked up by username through business discovery"""
+        url = f"{self.base_url}/{self.account_id}"
+        params = {
+            "fields": (
+                f"business_discovery.username({username}){{followers_count,"
+                f"media.limit({settings.INSTAGRAM_TIMELINE_MEDIA_LIMIT}){{timestamp,like_count,comments_count}}}}"
+            ),
+            "access_token": self.access_token
+        }
+        response = await self._graph_get(url, params, priority, endpoint="timeline")
+        response.raise_for_status()
+        discovery = response.json().get("business_discovery") or {}
+        followers = discovery.get("followers_count") or 0
+        media = discovery.get("media") or {}
+        return {
+            "username": username,
+            "followers": followers,
+            "media": media.get("data", []),
+            # Older posts exist beyond this page when the edge has a next page
+            "media_complete": not (media.get("paging") or {}).get("next"),
+            "follower_history": await self._follower_history(username, followers)
+        }
+
+    async def _follower_history(self, username: str, followers: int) -> List[Tuple[datetime, int]]:
+        """Record today's follower count and return the account's daily snapshots"""
+        now = datetime.utcnow()
+        db = await get_database()
+        if db is None:
+            return [(now, followers)]
+        await db.instagram_follower_snapshots.update_one(
+            {"_id": f"{username}:{now.date().isoformat()}"},
+            {"$set": {"username": username, "followers": followers, "taken_at": now}},
+            upsert=True
+        )
+        cursor = db.instagram_follower_snapshots.find(
+            {"username": username}, {"followers": 1, "taken_at": 1}
+        ).sort("taken_at", -1).limit(FOLLOWER_HISTORY_DAYS)
+        return [(doc["taken_at"], doc["followers"]) for doc in await cursor.to_list(length=FOLLOWER_HISTORY_DAYS)]
+
+    async def analyze_accounts(self, usernames: Sequence[str], priority: str = NORMAL) -> List[Dict[str, Any]]:
+        """Behavior features and fake-account risk of many accounts.
+
+        Timelines are fetched concurrently and scored as one NumPy batch;
+        accounts whose timeline could not be fetched get an "error" instead.
+        """
+        fetched = await asyncio.gather(
+            *(self.fetch_timeline(username, priority) for username in usernames), return_exceptions=True
+        )
+        reports = iter(account_features.analyze_timelines(
+            [timeline for timeline in fetched if not isinstance(timeline, BaseException)]
+        ))
+        results = []
+        for username, timeline in zip(usernames, fetched):
+            if isinstance(timeline, BaseException):
+                results.append({"username": username, "error": str(timeline) or type(timeline).__name__})
+            else:
+                results.append({"username": username, "error": None, **next(reports)})
+        return results
+
     async def analyze_account_behavior(self, username: str) -> Dict[str, Any]:
         """Analyze account behavior for fake detection."""
+        report = (await self.analyze_accounts([username]))[0]
+        if report["error"]:
+            return {
+                "username": username, **dict.fromkeys(BEHAVIOR_FIELDS), "behavioral_flags": [],
+                "engagement_rate": None, "error": report["error"]
+            }
         return {
-            "username": username,
-            "is_suspicious": False,
-            "risk_score": 0.15,
-            "behavioral_flags": [],
-            "account_age_days": 180,
-            "post_frequency": "normal",
-            "engagement_rate": 0.05
+            "username": username, **{key: report[key] for key in BEHAVIOR_FIELDS},
+            "engagement_rate": report["engagement_rate_mean"], "error": None
         }
 
     async def analyze_account_metadata(self, username: str) -> Dict[str, Any]:
         """Analyze account metadata for verification."""
+        report = (await self.analyze_accounts([username]))[0]
+        if report["error"]:
+            return {**dict.fromkeys(METADATA_FIELDS), "engagement_metrics": None, "error": report["error"]}
         return {
-            "account_age": 180,
-            "post_frequency": "daily",
-            "follower_growth_rate": 0.05,
+            "account_age": report["account_age_days"],
+            "post_frequency": report["post_frequency"],
+            "posts_per_day": report["posts_per_day"],
+            "followers": report["followers"],
+            "follower_growth_rate": report["follower_growth_rate"],
+            "follower_growth_slope": report["follower_growth_slope"],
             "engagement_metrics": {
-                "likes_per_post": 100,
-                "comments_per_post": 10,
-                "engagement_rate": 0.03
-            }
+                "likes_per_post": report["likes_per_post"],
+                "comments_per_post": report["comments_per_post"],
+                "engagement_rate": report["engagement_rate_mean"],
+                "engagement_rate_median": report["engagement_rate_median"],
+                "engagement_rate_p90": report["engagement_rate_p90"],
+                "engagement_rate_std": report["engagement_rate_std"]
+            },
+            "error": None
         }
 
-    async def verify_profile(self, username: str) -> Dict[str, Any]:
+    async def verify_profile(self, username: str, priority: str = NORMAL) -> Dict[str, Any]:
         """Verify Instagram profile using the Graph API"""
         try:
             url = f"{self.base_url}/{self.account_id}"
@@ -62,7 +202,7 @@ class InstagramAPI:
                 "fields": "id,username,profile_picture_url,media_count,followers_count",
                 "access_token": self.access_token
             }
-            response = requests.get(url, params=params)
+            response = await self._graph_get(url, params, priority, endpoint="profile")
             response.raise_for_status()
             
             data = response.json()
@@ -78,7 +218,7 @@ class InstagramAPI:
                 "error": str(e)
             }
     
-    async def get_media_insights(self, media_id: str) -> Dict[str, Any]:
+    async def get_media_insights(self, media_id: str, priority: str = BULK) -> Dict[str, Any]:
         """Get insights for a specific media post"""
         try:
             url = f"{self.base_url}/{media_id}/insights"
@@ -86,7 +226,7 @@ class InstagramAPI:
                 "metric": "engagement,impressions,reach",
                 "access_token": self.access_token
             }
-            response = requests.get(url, params=params)
+            response = await self._graph_get(url, params, priority, endpoint="insights")
             response.raise_for_status()
             
             return {
@@ -110,7 +250,7 @@ class InstagramAPI:
             "source_urls": []
         }
 
-    async def search_media(self, hashtag: str) -> Dict[str, Any]:
+    async def search_media(self, hashtag: str, priority: str = BULK) -> Dict[str, Any]:
         """Search media by hashtag"""
         try:
             url = f"{self.base_url}/ig_hashtag_search"
@@ -118,7 +258,7 @@ class InstagramAPI:
                 "q": hashtag,
                 "access_token": self.access_token
             }
-            response = requests.get(url, params=params)
+            response = await self._graph_get(url, params, priority)
             response.raise_for_status()
             
             return {
@@ -147,90 +287,213 @@ class InstagramAPI:
         
         return hmac.compare_digest(f"sha256={expected_signature}", signature)
     
-    async def process_media(self, media_id: str) -> Dict[str, Any]:
+    async def list_media(
+        self,
+        account_id: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: int = 25,
+        priority: str = BULK,
+    ) -> Dict[str, Any]:
+        """One page of an account's media edge, newest first: {"ids", "next_cursor"}"""
+        url = f"{self.base_url}/{account_id or self.account_id}/media"
+        params = {
+            "fields": "id",
+            "limit": limit,
+            "access_token": self.access_token
+        }
+        if after:
+            params["after"] = after
+        response = await self._graph_get(url, params, priority)
+        response.raise_for_status()
+        data = response.json()
+        paging = data.get("paging", {})
+        return {
+            "ids": [media["id"] for media in data.get("data", [])],
+            "next_cursor": paging.get("cursors", {}).get("after") if paging.get("next") else None
+        }
+
+    async def fetch_media(self, media_id: str, priority: str = URGENT) -> Dict[str, Any]:
+        """Media details (URL, type, caption) from the Graph API"""
+        url = f"{self.base_url}/{media_id}"
+        params = {
+            "fields": "media_url,media_type,caption",
+            "access_token": self.access_token
+        }
+        response = await self._graph_get(url, params, priority)
+        if response.status != 200:
+            raise HTTPException(status_code=response.status, detail="Failed to fetch media details")
+        return response.json()
+
+    async def prepare_media(self, media_id: str, priority: str = URGENT) -> Tuple[Dict[str, Any], Optional[StoredUpload]]:
+        """Fetch media details and download the image or video itself"""
+        media_data = await self.fetch_media(media_id, priority)
+        stored = None
+        if media_data.get('media_type') in ['IMAGE', 'VIDEO'] and media_data.get('media_url'):
+            stored = await self.media_downloader.download(media_id, media_data['media_url'], media_data['media_type'])
+        return media_data, stored
+
+    async def analyze_media(self, media_id: str, media_data: Dict[str, Any], stored: Optional[StoredUpload]) -> Dict[str, Any]:
+        """Run the detectors on prepared media, store the results and notify on violations"""
+        media_type = media_data.get('media_type')
+        caption = media_data.get('caption', '')
+        
+        results = {
+            'media_id': media_id,
+            'media_type': media_type,
+            'media_sha256': stored.sha256 if stored else None,
+            'timestamp': datetime.utcnow(),
+            'analysis': {
+                'deepfake_detection': None,
+                'content_moderation': None,
+                'text_analysis': None
+            },
+            'violations_found': False
+        }
+        
+        # Analyze media content from the local copy
+        if stored is not None:
+            async with upload_retention.hot(stored.path) as path:
+                if media_type == 'VIDEO':
+                    results['analysis']['deepfake_detection'] = await self.deepfake_detector.analyze_video(path)
+                else:
+                    results['analysis']['deepfake_detection'] = await self.deepfake_detector.analyze_image(path)
+                    results['analysis']['content_moderation'] = await self.content_moderator.analyze_image(path)
+        
+        # Analyze caption text if present
+        if caption:
+            text_result = await self.content_moderator.analyze_text(caption)
+            results['analysis']['text_analysis'] = text_result
+        
+        # Check for violations
+        violations = []
+        if (results['analysis']['deepfake_detection'] or {}).get('is_deepfake', False):
+            violations.append('deepfake_detected')
+        if (results['analysis']['content_moderation'] or {}).get('is_explicit', False):
+            violations.append('explicit_content')
+        if (results['analysis']['text_analysis'] or {}).get('is_toxic', False):
+            violations.append('abusive_text')
+        
+        results['violations'] = violations
+        results['violations_found'] = len(violations) > 0
+        
+        # Flagged media is kept as evidence beyond the download cache
+        if results['violations_found'] and stored is not None:
+            await self.media_downloader.store.add_ref(stored.sha256)
+        
+        # Store results in database
+        db = await get_database()
+        await db.media_analysis.insert_one(results)
+        
+        # Send notifications if violations found
+        if results['violations_found']:
+            await self.notification_service.send_notification(
+                user_id=self.account_id,
+                notification_type='content_violation',
+                content={
+                    'media_id': media_id,
+                    'violations': violations,
+                    'timestamp': results['timestamp']
+                }
+            )
+        
+        return results
+
+    async def analyzed_media_ids(self, media_ids: Iterable[str], since: datetime) -> Set[str]:
+        """Media ids among media_ids with an analysis stored at or after since"""
+        db = await get_database()
+        return set(await db.media_analysis.distinct(
+            "media_id", {"media_id": {"$in": list(media_ids)}, "timestamp": {"$gte": since}}
+        ))
+
+    async def process_media(self, media_id: str, priority: str = URGENT) -> Dict[str, Any]:
         """Process media for deepfakes and content violations"""
         try:
-            # Get media details
-            url = f"{self.base_url}/{media_id}"
-            params = {
-                "fields": "media_url,media_type,caption",
-                "access_token": self.access_token
-            }
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        raise HTTPException(status_code=response.status, detail="Failed to fetch media details")
-                    media_data = await response.json()
-            
-            media_url = media_data.get('media_url')
-            media_type = media_data.get('media_type')
-            caption = media_data.get('caption', '')
-            
-            results = {
-                'media_id': media_id,
-                'media_type': media_type,
-                'timestamp': datetime.utcnow(),
-                'analysis': {
-                    'deepfake_detection': None,
-                    'content_moderation': None,
-                    'text_analysis': None
-                },
-                'violations_found': False
-            }
-            
-            # Analyze media content
-            if media_type in ['IMAGE', 'VIDEO']:
-                # Run deepfake detection
-                deepfake_result = await self.deepfake_detector.analyze(media_url)
-                results['analysis']['deepfake_detection'] = deepfake_result
-                
-                # Run content moderation
-                content_result = await self.content_moderator.analyze_media(
-                    media_url, 
-                    media_type.lower()
-                )
-                results['analysis']['content_moderation'] = content_result
-            
-            # Analyze caption text if present
-            if caption:
-                text_result = await self.content_moderator.analyze_text(caption)
-                results['analysis']['text_analysis'] = text_result
-            
-            # Check for violations
-            violations = []
-            if results['analysis']['deepfake_detection'].get('is_deepfake', False):
-                violations.append('deepfake_detected')
-            if results['analysis']['content_moderation'].get('explicit_content', False):
-                violations.append('explicit_content')
-            if results['analysis']['text_analysis'] and results['analysis']['text_analysis'].get('is_abusive', False):
-                violations.append('abusive_text')
-            
-            results['violations'] = violations
-            results['violations_found'] = len(violations) > 0
-            
-            # Store results in database
-            db = await get_database()
-            await db.media_analysis.insert_one(results)
-            
-            # Send notifications if violations found
-            if results['violations_found']:
-                await self.notification_service.send_notification(
-                    'content_violation',
-                    {
-                        'media_id': media_id,
-                        'violations': violations,
-                        'timestamp': results['timestamp']
-                    }
-                )
-            
-            return results
-            
+            media_data, stored = await self.prepare_media(media_id, priority)
+            return await self.analyze_media(media_id, media_data, stored)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error processing media: {str(e)}")
 
+    async def process_media_many(
+        self,
+        media_ids: Iterable[str],
+        priority: str = BULK,
+        prefetch: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Process media in order, yielding each result (or {"media_id", "error"}).
+
+        Up to `prefetch` items ahead are fetched and downloaded while the
+        current one is analyzed, so network time overlaps model time.
+        """
+        depth = prefetch if prefetch is not None else settings.INSTAGRAM_PREFETCH_DEPTH
+        remaining = iter(media_ids)
+        pending: Deque[Tuple[str, asyncio.Task]] = deque()
+
+        def schedule() -> None:
+            media_id = next(remaining, None)
+            if media_id is not None:
+                pending.append((media_id, asyncio.create_task(self.prepare_media(media_id, priority))))
+
+        for _ in range(depth + 1):
+            schedule()
+        try:
+            while pending:
+                media_id, prepared = pending.popleft()
+                try:
+                    media_data, stored = await prepared
+                    result = await self.analyze_media(media_id, media_data, stored)
+                except Exception as e:
+                    result = {"media_id": media_id, "error": str(e)}
+                schedule()
+                yield result
+        finally:
+            for _, prepared in pending:
+                prepared.cancel()
 
 instagram_api = InstagramAPI()
 
+@router.get("/rate-limit")
+async def rate_limit_status(current_user: dict = Depends(get_current_user)):
+    """Remaining Graph API call budget and queued calls per priority"""
+    return instagram_api.rate_limiter.stats()
+
+@router.get("/cache")
+async def cache_status(current_user: dict = Depends(get_current_user)):
+    """Graph API response cache hit/revalidation counters"""
+    return instagram_api.cache.stats()
+
+@router.post("/backfill", status_code=202)
+async def start_backfill(
+    account_id: Optional[str] = None,
+    restart: bool = False,
+    current_admin: dict = Depends(get_current_admin_user)
+):
+    """Queue a scan of an account's full media history (resumes from its checkpoint).
+
+    Runs as a bulk-priority "backfill" job; poll /api/v1/jobs/{job_id} or
+    /backfill/{account_id} for progress. Admins only, since it scans any
+    account with the app's Graph API budget.
+    """
+    account_id = account_id or instagram_api.account_id
+    job = await job_queue.enqueue(
+        ANALYSIS_QUEUE,
+        "instagram_backfill",
+        {"account_id": account_id, "restart": restart},
+        user_id=str(current_admin["_id"]),
+        source="backfill"
+    )
+    return {"job_id": job["_id"], "status": job["status"], "account_id": account_id}
+
+@router.get("/backfill/{account_id}")
+async def get_backfill(
+    account_id: str,
+    current_admin: dict = Depends(get_current_admin_user)
+):
+    """Checkpoint and throughput of an account backfill (admins only)"""
+    checkpoint = await backfill_checkpoints.get(account_id)
+    if not checkpoint:
+        raise HTTPException(status_code=404, detail="No backfill for this account")
+    return checkpoint
+
 @router.get("/webhook")
 async def verify_webhook(request: Request):
     """Handle the webhook verification request from Instagram"""
@@ -244,9 +507,32 @@ async def verify_webhook(request: Request):
     
     raise HTTPException(status_code=400, detail="Invalid verification request")
 
+def media_changes(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Media change events of a webhook delivery, one per distinct media_id"""
+    changes = {}
+    for entry in body.get('entry', []):
+        for change in entry.get('changes', []):
+            if change.get('field') == 'media':
+                value = change.get('value', {})
+                media_id = value.get('media_id')
+                if media_id and media_id not in changes:
+                    changes[media_id] = {
+                        'media_id': media_id,
+                        'account_id': entry.get('id'),
+                        'event_time': entry.get('time'),
+                        'value': value
+                    }
+    return list(changes.values())
+
 @router.post("/webhook")
 async def instagram_webhook(request: Request):
-    """Handle incoming webhook events from Instagram"""
+    """Acknowledge webhook events from Instagram and queue their media for analysis.
+
+    Each media change is persisted as a job in the analysis queue (source
+    "webhook", so JOB_SOURCE_CONCURRENCY bounds how many run at once) and
+    the delivery is acknowledged without waiting for the analysis. Jobs are
+    keyed on media_id, so a redelivered event does not queue the media again.
+    """
     # Get raw body for signature verification
     raw_body = await request.body()
     
@@ -256,24 +542,26 @@ async def instagram_webhook(request: Request):
     
     try:
         body = json.loads(raw_body)
-        results = []
-        
-        # Process each media change
-        for entry in body.get('entry', []):
-            for change in entry.get('changes', []):
-                if change.get('field') == 'media':
-                    media_id = change.get('value', {}).get('media_id')
-                    if media_id:
-                        result = await instagram_api.process_media(media_id)
-                        results.append(result)
-        
-        return {
-            "status": "success",
-            "processed_media": len(results),
-            "results": results
-        }
-    
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON")
+    
+    try:
+        jobs = await asyncio.gather(*[
+            job_queue.enqueue(
+                ANALYSIS_QUEUE,
+                "instagram_media",
+                event,
+                source="webhook",
+                dedup_key=f"instagram_media:{event['media_id']}"
+            )
+            for event in media_changes(body)
+        ])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "status": "accepted",
+        "queued_media": sum(1 for job in jobs if not job.get("duplicate")),
+        "duplicate_media": sum(1 for job in jobs if job.get("duplicate")),
+        "job_ids": [job["_id"] for job in jobs]
+    }
@@ -0,0 +1,181 @@
+"""
+Backfill of an Instagram account's media history through the analysis pipeline.
+
+Usage: python -m app.services.api.instagram_backfill [--account-id ID] [--page-size N] [--restart]
+"""
+from typing import Dict, Any, Optional
+from datetime import datetime
+import argparse
+import asyncio
+import time
+
+from app.config import settings
+from app.db.mongodb import get_database
+from .graph_rate_limiter import BULK
+
+# Backfill states
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class MongoBackfillCheckpoints:
+    """One document per account in `instagram_backfills` holding the resume cursor"""
+    def __init__(self, collection_name: str = "instagram_backfills"):
+        self.collection_name = collection_name
+
+    async def _collection(self):
+        db = await get_database()
+        return db[self.collection_name]
+
+    async def get(self, account_id: str) -> Optional[Dict[str, Any]]:
+        collection = await self._collection()
+        return await collection.find_one({"_id": account_id})
+
+    async def save(self, account_id: str, fields: Dict[str, Any]) -> None:
+        collection = await self._collection()
+        await collection.update_one({"_id": account_id}, {"$set": fields}, upsert=True)
+
+
+class InMemoryBackfillCheckpoints:
+    """Process-local checkpoints, for tests"""
+    def __init__(self):
+        self.checkpoints: Dict[str, Dict[str, Any]] = {}
+
+    async def get(self, account_id: str) -> Optional[Dict[str, Any]]:
+        checkpoint = self.checkpoints.get(account_id)
+        return dict(checkpoint) if checkpoint else None
+
+    async def save(self, account_id: str, fields: Dict[str, Any]) -> None:
+        self.checkpoints.setdefault(account_id, {"_id": account_id}).update(fields)
+
+
+def create_backfill_checkpoints(backend: Optional[str] = None):
+    """Checkpoints live next to the job queue (JOB_QUEUE_BACKEND "mongo" or "memory")"""
+    backend = backend or settings.JOB_QUEUE_BACKEND
+    return InMemoryBackfillCheckpoints() if backend == "memory" else MongoBackfillCheckpoints()
+
+
+backfill_checkpoints = create_backfill_checkpoints()
+
+
+class InstagramBackfill:
+    """Runs an account's whole media edge through InstagramAPI's media pipeline.
+
+    A pager fetches pages of media ids into a queue of at most `page_buffer`
+    pages; each page then goes through `process_media_many`, which downloads
+    `prefetch` items ahead of the one being analyzed and stores every
+    result. A full queue stops the pager, so each stage only runs as far
+    ahead as the next one can absorb. After a page is fully stored its
+    cursor is checkpointed, so an interrupted run resumes at the first page
+    not yet done, skipping the items of that page it already stored.
+    """
+    def __init__(
+        self,
+        api,
+        checkpoints=None,
+        page_size: Optional[int] = None,
+        page_buffer: Optional[int] = None,
+        prefetch: Optional[int] = None,
+    ):
+        self.api = api
+        self.checkpoints = checkpoints or backfill_checkpoints
+        self.page_size = page_size or settings.INSTAGRAM_BACKFILL_PAGE_SIZE
+        self.page_buffer = page_buffer or settings.INSTAGRAM_BACKFILL_PAGE_BUFFER
+        self.prefetch = prefetch
+
+    async def _pager(self, account_id: str, cursor: Optional[str], pages: asyncio.Queue) -> None:
+        try:
+            while True:
+                page = await self.api.list_media(account_id, after=cursor, limit=self.page_size, priority=BULK)
+                await pages.put((page["ids"], page["next_cursor"]))
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+        except Exception as e:
+            await pages.put(e)
+            return
+        await pages.put(None)
+
+    async def run(self, account_id: Optional[str] = None, restart: bool = False) -> Dict[str, Any]:
+        """Backfill one account (resuming from its checkpoint); returns the final checkpoint"""
+        account_id = account_id or self.api.account_id
+        checkpoint = await self.checkpoints.get(account_id) or {}
+        resuming = not restart and checkpoint.get("status") not in (None, COMPLETED)
+        if not resuming:
+            checkpoint = {"cursor": None, "processed": 0, "failed": 0, "started_at": datetime.utcnow()}
+        cursor = checkpoint["cursor"]
+        totals = {"processed": checkpoint["processed"], "failed": checkpoint["failed"]}
+        await self.checkpoints.save(account_id, {
+            **checkpoint, "status": RUNNING, "error": None, "updated_at": datetime.utcnow()
+        })
+
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.page_buffer)
+        pager = asyncio.create_task(self._pager(account_id, cursor, pages))
+        started = time.monotonic()
+        run_items = 0
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                ids, next_cursor = page
+                if resuming:
+                    # The interrupted run may have stored part of this page already
+                    resuming = False
+                    done = await self.api.analyzed_media_ids(ids, checkpoint["started_at"])
+                    totals["processed"] += len(done)
+                    ids = [media_id for media_id in ids if media_id not in done]
+                async for result in self.api.process_media_many(ids, priority=BULK, prefetch=self.prefetch):
+                    totals["failed" if result.get("error") else "processed"] += 1
+                    run_items += 1
+                cursor = next_cursor
+                await self.checkpoints.save(account_id, {
+                    "cursor": cursor,
+                    **totals,
+                    "items_per_second": run_items / max(time.monotonic() - started, 1e-9),
+                    "updated_at": datetime.utcnow()
+                })
+        except BaseException as e:
+            pager.cancel()
+            await self.checkpoints.save(account_id, {"status": FAILED, "error": str(e) or type(e).__name__, "updated_at": datetime.utcnow()})
+            raise
+
+        elapsed = time.monotonic() - started
+        await self.checkpoints.save(account_id, {
+            "cursor": None,
+            "status": COMPLETED,
+            "items_per_second": run_items / max(elapsed, 1e-9),
+            "elapsed_seconds": elapsed,
+            "finished_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        return await self.checkpoints.get(account_id)
+
+
+async def _run(account_id: Optional[str], page_size: Optional[int], restart: bool) -> None:
+    from app.db.mongodb import connect_to_mongo
+    from .instagram import instagram_api
+
+    await connect_to_mongo()
+    backfill = InstagramBackfill(instagram_api, page_size=page_size)
+    result = await backfill.run(account_id, restart=restart)
+    print(
+        f"Backfilled {result['_id']}: {result['processed']} analyzed, {result['failed']} failed "
+        f"in {result['elapsed_seconds']:.1f} s ({result['items_per_second']:.2f} items/s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyze an Instagram account's full media history")
+    parser.add_argument("--account-id", default=None, help="Defaults to the configured account")
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the newest media")
+    args = parser.parse_args()
+    asyncio.run(_run(args.account_id, args.page_size, args.restart))
+
+
+if __name__ == "__main__":
+    main()
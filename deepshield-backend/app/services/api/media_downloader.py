@@ -0,0 +1,166 @@
+"""
+Streaming downloads of remote (Instagram) media into the content-addressed blob store
+"""
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from urllib.parse import urlparse
+import asyncio
+import hashlib
+import os
+import uuid
+import aiofiles
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.storage import BlobStore, StoredUpload, blob_store, max_upload_size
+from .http_client import PooledHTTPClient, HTTPStatusError, get_http_client
+
+# Assumed when the server does not send a usable Content-Type
+MEDIA_TYPE_DEFAULTS = {
+    "IMAGE": ("image/jpeg", ".jpg"),
+    "VIDEO": ("video/mp4", ".mp4"),
+}
+
+
+class MediaDownloader:
+    """Streams media URLs to disk in chunks and keeps them by media id.
+
+    Bodies are written to the blob store's staging directory while being
+    hashed, and aborted as soon as they pass the upload size limit for their
+    type (a declared Content-Length over the limit is rejected before
+    reading). Finished files are stored content-addressed, so the same image
+    posted twice is kept once. The last `max_entries` downloads are cached
+    by media id, each holding a blob reference that is released on
+    eviction; concurrent requests for the same media share one download.
+    """
+    def __init__(
+        self,
+        http_client: Optional[PooledHTTPClient] = None,
+        store: Optional[BlobStore] = None,
+        max_entries: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        self.http_client = http_client or get_http_client(
+            "instagram_media",
+            timeout=settings.INSTAGRAM_TIMEOUT_SECONDS,
+            pool_size=settings.INSTAGRAM_POOL_SIZE
+        )
+        self.store = store or blob_store
+        self.max_entries = max_entries if max_entries is not None else settings.INSTAGRAM_MEDIA_CACHE_ENTRIES
+        self.chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        self._cache: "OrderedDict[str, StoredUpload]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.rejected = 0
+
+    async def download(self, media_id: str, media_url: str, media_type: Optional[str] = None) -> StoredUpload:
+        """Local copy of a media item, downloading it unless cached"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks from a previous event loop can never complete here
+            self._pending = {}
+            self._loop = loop
+
+        cached = self._cache.get(media_id)
+        if cached is not None and os.path.exists(cached.path):
+            self._cache.move_to_end(media_id)
+            self.hits += 1
+            return cached
+
+        task = self._pending.get(media_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(media_id, media_url, media_type))
+            self._pending[media_id] = task
+            task.add_done_callback(lambda done: self._finished(media_id, done))
+        # Shielded so one caller giving up does not abort the shared download
+        return await asyncio.shield(task)
+
+    def _finished(self, media_id: str, task: asyncio.Task) -> None:
+        self._pending.pop(media_id, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller gave up
+
+    @staticmethod
+    def _content_type(response_type: Optional[str], media_type: Optional[str]) -> Optional[str]:
+        response_type = (response_type or "").split(";")[0].strip()
+        if response_type.startswith(("image/", "video/")):
+            return response_type
+        return MEDIA_TYPE_DEFAULTS.get(media_type or "", (None, ""))[0]
+
+    @staticmethod
+    def _filename(media_id: str, media_url: str, media_type: Optional[str]) -> str:
+        extension = os.path.splitext(urlparse(media_url).path)[1].lower()
+        return f"{media_id}{extension or MEDIA_TYPE_DEFAULTS.get(media_type or '', (None, ''))[1]}"
+
+    def _too_large(self, limit: int) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(status_code=413, detail=f"Media exceeds maximum size of {limit} bytes")
+
+    async def _fetch(self, media_id: str, media_url: str, media_type: Optional[str]) -> StoredUpload:
+        os.makedirs(self.store.tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(self.store.tmp_dir, f"download_{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with self.http_client.stream("GET", media_url) as response:
+                if response.status != 200:
+                    raise HTTPStatusError(response.status, media_url)
+                content_type = self._content_type(response.headers.get("Content-Type"), media_type)
+                limit = max_upload_size(content_type)
+                if response.content_length is not None and response.content_length > limit:
+                    raise self._too_large(limit)
+                async with aiofiles.open(tmp_path, "wb") as out_file:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        size += len(chunk)
+                        if size > limit:
+                            raise self._too_large(limit)
+                        digest.update(chunk)
+                        await out_file.write(chunk)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        stored = await self.store.put_staged(StoredUpload(
+            path=tmp_path,
+            sha256=digest.hexdigest(),
+            size=size,
+            content_type=content_type,
+            filename=self._filename(media_id, media_url, media_type)
+        ))
+        self.downloads += 1
+        self.bytes_downloaded += size
+        await self._remember(media_id, stored)
+        return stored
+
+    async def _remember(self, media_id: str, stored: StoredUpload) -> None:
+        previous = self._cache.pop(media_id, None)
+        self._cache[media_id] = stored
+        evicted = [previous] if previous is not None else []
+        while len(self._cache) > self.max_entries:
+            evicted.append(self._cache.popitem(last=False)[1])
+        for upload in evicted:
+            await self.store.release(upload.sha256)
+
+    async def clear(self) -> None:
+        """Forget every cached download, releasing their blob references"""
+        cached, self._cache = list(self._cache.values()), OrderedDict()
+        for upload in cached:
+            await self.store.release(upload.sha256)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "bytes_downloaded": self.bytes_downloaded,
+            "rejected": self.rejected,
+            "in_progress": len(self._pending)
+        }
+
+
+media_downloader = MediaDownloader()
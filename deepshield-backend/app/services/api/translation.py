@@ -1,9 +1,11 @@
 """
 Translation API integration for multilingual support
 """
-from typing import Dict, Any, List
-import requests
+from typing import Dict, Any, List, Optional
 from app.config import settings
+from .http_client import PooledHTTPClient, get_http_client
+from .translation_cache import TranslationCache, translation_cache
+from .translation_batcher import TranslationBatcher
 
 # Mock translations for testing
 MOCK_TRANSLATIONS = {
@@ -35,9 +37,14 @@ MOCK_LANGUAGE_DETECTION = {
 }
 
 class TranslationAPI:
-    def __init__(self):
+    def __init__(self, http_client: Optional[PooledHTTPClient] = None, cache: Optional[TranslationCache] = None):
         self.api_key = settings.TRANSLATION_API_KEY
-        self.base_url = "https://translation.googleapis.com/language/translate/v2"
+        self.base_url = settings.TRANSLATION_API_URL
+        # All instances share one pooled client and cache unless injected
+        self.http_client = http_client or get_http_client("translation")
+        self.cache = cache or translation_cache
+        # Concurrent translate_text calls are coalesced into batch_translate
+        self.batcher = TranslationBatcher(self.batch_translate)
     
     async def translate_text(self, text: str, target_lang: str = "en", source_lang: str = None) -> Dict[str, Any]:
         """Translate text to target language"""
@@ -68,27 +75,15 @@ class TranslationAPI:
             
             # Use API if key is available
             if self.api_key:
-                params = {
-                    "q": text,
-                    "target": target_lang,
-                    "key": self.api_key
-                }
-                
-                if source_lang:
-                    params["source"] = source_lang
+                cache_key = TranslationCache.make_key("translate", text, source_lang, target_lang)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
                 
-                response = requests.post(self.base_url, params=params)
-                response.raise_for_status()
-                
-                data = response.json()
-                translation = data["data"]["translations"][0]
-                
-                return {
-                    "success": True,
-                    "translated_text": translation["translatedText"],
-                    "detected_language": translation.get("detectedSourceLanguage"),
-                    "error": None
-                }
+                result = await self.batcher.translate(text, target_lang, source_lang)
+                if result["success"]:
+                    await self.cache.set(cache_key, result)
+                return result
             
             return {
                 "success": False,
@@ -118,23 +113,30 @@ class TranslationAPI:
             
             # Use API if key is available
             if self.api_key:
+                cache_key = TranslationCache.make_key("detect", text)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                
                 params = {
                     "q": text,
                     "key": self.api_key
                 }
                 
-                response = requests.post(f"{self.base_url}/detect", params=params)
+                response = await self.http_client.post(f"{self.base_url}/detect", data=params)
                 response.raise_for_status()
                 
                 data = response.json()
                 detection = data["data"]["detections"][0][0]
                 
-                return {
+                result = {
                     "success": True,
                     "language": detection["language"],
                     "confidence": detection["confidence"],
                     "error": None
                 }
+                await self.cache.set(cache_key, result)
+                return result
             
             return {
                 "success": False,
@@ -150,16 +152,20 @@ class TranslationAPI:
                 "error": str(e)
             }
     
-    async def batch_translate(self, texts: List[str], target_lang: str = "en") -> Dict[str, Any]:
+    async def batch_translate(self, texts: List[str], target_lang: str = "en", source_lang: str = None) -> Dict[str, Any]:
         """Translate multiple texts in a single request"""
         try:
-            params = {
-                "q": texts,
-                "target": target_lang,
-                "key": self.api_key
-            }
+            if not self.api_key:
+                raise ValueError("API key not available")
             
-            response = requests.post(self.base_url, params=params)
+            # Repeated q fields translate every text in one round trip
+            params = [("q", text) for text in texts]
+            params.append(("target", target_lang))
+            if source_lang:
+                params.append(("source", source_lang))
+            params.append(("key", self.api_key))
+            
+            response = await self.http_client.post(self.base_url, data=params)
             response.raise_for_status()
             
             data = response.json()
@@ -182,3 +188,7 @@ class TranslationAPI:
                 "translations": [],
                 "error": str(e)
             }
+
+    async def close(self) -> None:
+        """Stop the batcher; the shared HTTP client is closed on application shutdown"""
+        await self.batcher.close()
@@ -0,0 +1,149 @@
+"""
+Coalesces concurrent single-text translations into batched API requests
+"""
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable, Awaitable
+import asyncio
+
+from app.config import settings
+from .translation_cache import normalize_text
+
+GroupKey = Tuple[str, str]
+BatchSender = Callable[[List[str], str, Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+class TranslationBatcher:
+    """Collects translate calls for a short window and sends them together.
+
+    Calls are grouped by (source, target) language. Each group is split into
+    requests that respect the per-request segment and character quotas, and
+    identical texts already queued or in flight share a single future.
+    """
+    def __init__(
+        self,
+        send_batch: BatchSender,
+        window_ms: Optional[float] = None,
+        max_texts: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ):
+        self.send_batch = send_batch
+        self.window = (window_ms if window_ms is not None else settings.TRANSLATION_BATCH_WINDOW_MS) / 1000
+        self.max_texts = max_texts if max_texts is not None else settings.TRANSLATION_BATCH_MAX_TEXTS
+        self.max_chars = max_chars if max_chars is not None else settings.TRANSLATION_BATCH_MAX_CHARS
+        self._pending: Dict[GroupKey, Dict[str, str]] = {}
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Batches being sent (the loop only keeps weak references to tasks)
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches_sent = 0
+        self.texts_sent = 0
+        self.coalesced = 0
+
+    async def translate(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict[str, Any]:
+        """Queue text for translation and wait for its share of the batch"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # State from a previous event loop can never resolve here
+            self._pending.clear()
+            self._inflight.clear()
+            self._tasks.clear()
+            self._flush_handle = None
+            self._loop = loop
+
+        group = (source_lang or "", target_lang)
+        normalized = normalize_text(text)
+        key = (*group, normalized)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = loop.create_future()
+            self._inflight[key] = future
+            pending = self._pending.setdefault(group, {})
+            pending[normalized] = text
+            if len(pending) >= self.max_texts:
+                self._flush_group(group)
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush_all)
+
+        return dict(await asyncio.shield(future))
+
+    def _flush_all(self) -> None:
+        self._flush_handle = None
+        for group in list(self._pending):
+            self._flush_group(group)
+
+    def _flush_group(self, group: GroupKey) -> None:
+        pending = self._pending.pop(group, {})
+        chunk: List[Tuple[str, str]] = []
+        chars = 0
+        for normalized, text in pending.items():
+            if chunk and (len(chunk) >= self.max_texts or chars + len(text) > self.max_chars):
+                self._start_send(group, chunk)
+                chunk, chars = [], 0
+            chunk.append((normalized, text))
+            chars += len(text)
+        if chunk:
+            self._start_send(group, chunk)
+
+    def _start_send(self, group: GroupKey, chunk: List[Tuple[str, str]]) -> None:
+        task = asyncio.ensure_future(self._send(group, chunk))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group: GroupKey, chunk: List[Tuple[str, str]]) -> None:
+        source_lang, target_lang = group
+        try:
+            batch = await self.send_batch([text for _, text in chunk], target_lang, source_lang or None)
+        except Exception as e:
+            batch = {"success": False, "translations": [], "error": str(e)}
+        self.batches_sent += 1
+        self.texts_sent += len(chunk)
+
+        translations = batch["translations"] if batch["success"] else []
+        for index, (normalized, _) in enumerate(chunk):
+            if index < len(translations):
+                result = {
+                    "success": True,
+                    "translated_text": translations[index]["translated_text"],
+                    "detected_language": translations[index]["detected_language"],
+                    "error": None
+                }
+            else:
+                result = {
+                    "success": False,
+                    "translated_text": "",
+                    "detected_language": None,
+                    "error": batch["error"] or "Missing translation in batch response"
+                }
+            future = self._inflight.pop((source_lang, target_lang, normalized), None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Cancel queued and in-flight batches; their callers get a failed result"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+        tasks, self._tasks = list(self._tasks), set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        inflight, self._inflight = self._inflight, {}
+        for future in inflight.values():
+            if not future.done():
+                future.set_result({
+                    "success": False,
+                    "translated_text": "",
+                    "detected_language": None,
+                    "error": "Translation batcher closed"
+                })
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches_sent": self.batches_sent,
+            "texts_sent": self.texts_sent,
+            "coalesced": self.coalesced
+        }
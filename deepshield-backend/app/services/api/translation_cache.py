@@ -0,0 +1,146 @@
+"""
+Two-tier cache for translation and language-detection results
+"""
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import re
+import unicodedata
+
+from app.config import settings
+from app.db.mongodb import get_database
+
+CacheKey = Tuple[str, str, str, str]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys (NFKC, trimmed, single spaces)"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class TranslationCache:
+    """In-process LRU bounded in bytes, backed by an optional Mongo collection.
+
+    Entries are keyed by (kind, normalized text, source, target) where kind is
+    "translate" or "detect". The Mongo tier relies on a TTL index on
+    `expires_at` so stale entries are removed by the server.
+    """
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        use_mongo: Optional[bool] = None,
+        ttl_seconds: Optional[int] = None,
+        collection_name: str = "translation_cache",
+    ):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.TRANSLATION_CACHE_MAX_BYTES
+        self.use_mongo = use_mongo if use_mongo is not None else settings.TRANSLATION_CACHE_MONGO
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.TRANSLATION_CACHE_TTL_SECONDS
+        self.collection_name = collection_name
+        self._entries: "OrderedDict[CacheKey, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self.size_bytes = 0
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._ttl_index_ready = False
+
+    @staticmethod
+    def make_key(kind: str, text: str, source: Optional[str] = None, target: Optional[str] = None) -> CacheKey:
+        return (kind, normalize_text(text), source or "", target or "")
+
+    @staticmethod
+    def _entry_size(key: CacheKey, value: Dict[str, Any]) -> int:
+        return sum(len(part.encode("utf-8")) for part in key) + len(json.dumps(value, default=str).encode("utf-8"))
+
+    @staticmethod
+    def _document_id(key: CacheKey) -> str:
+        return hashlib.sha256("\x1f".join(key).encode("utf-8")).hexdigest()
+
+    def _remember(self, key: CacheKey, value: Dict[str, Any]) -> None:
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.evictions += 1
+
+    async def _collection(self):
+        db = await get_database()
+        if db is None:
+            return None
+        collection = db[self.collection_name]
+        if not self._ttl_index_ready:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+            self._ttl_index_ready = True
+        return collection
+
+    async def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Look up a result, promoting Mongo hits into memory"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return dict(entry[0])
+
+        if self.use_mongo:
+            try:
+                collection = await self._collection()
+                if collection is not None:
+                    document = await collection.find_one({"_id": self._document_id(key)})
+                    if document and document["expires_at"] > datetime.utcnow():
+                        self.mongo_hits += 1
+                        self._remember(key, document["value"])
+                        return dict(document["value"])
+            except Exception as e:
+                print(f"Translation cache lookup failed: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: CacheKey, value: Dict[str, Any]) -> None:
+        """Store a successful result in both tiers"""
+        self._remember(key, dict(value))
+        if self.use_mongo:
+            try:
+                collection = await self._collection()
+                if collection is not None:
+                    await collection.replace_one(
+                        {"_id": self._document_id(key)},
+                        {
+                            "_id": self._document_id(key),
+                            "value": value,
+                            "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                        },
+                        upsert=True
+                    )
+            except Exception as e:
+                print(f"Translation cache write failed: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.mongo_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.memory_hits + self.mongo_hits) / lookups if lookups else 0.0
+        }
+
+
+translation_cache = TranslationCache()
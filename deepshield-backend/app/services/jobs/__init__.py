@@ -0,0 +1,10 @@
+from .queue import MongoJobQueue, InMemoryJobQueue, create_job_queue, job_queue
+from .scheduler import JobScheduler, Histogram
+from .worker import JobWorkerPool, run_notifier
+from .handlers import ANALYSIS_QUEUE, HANDLERS, release_job_upload
+
+__all__ = [
+    "MongoJobQueue", "InMemoryJobQueue", "create_job_queue", "job_queue",
+    "JobScheduler", "Histogram", "JobWorkerPool", "run_notifier",
+    "ANALYSIS_QUEUE", "HANDLERS", "release_job_upload"
+]
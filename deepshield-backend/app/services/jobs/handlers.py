@@ -0,0 +1,65 @@
+"""
+Analysis job handlers run by the worker pool
+"""
+from typing import Dict, Any, Optional
+
+from ..storage import blob_store, upload_retention
+
+ANALYSIS_QUEUE = "analysis"
+
+_deepfake_detector = None
+
+
+def _get_deepfake_detector():
+    # Created on first job so worker processes load the models once
+    global _deepfake_detector
+    if _deepfake_detector is None:
+        from ..ai.deepfake_detection import DeepfakeDetector
+        _deepfake_detector = DeepfakeDetector()
+    return _deepfake_detector
+
+
+async def analyze_deepfake_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Deepfake analysis of a stored upload (video or image)"""
+    detector = _get_deepfake_detector()
+    # The upload may have been archived while the job was queued
+    async with upload_retention.hot(payload["path"]) as path:
+        if (payload.get("content_type") or "").startswith("video/"):
+            return await detector.analyze_video(path)
+        return await detector.analyze_image(path)
+
+
+async def process_instagram_media_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze one media item announced by an Instagram webhook"""
+    from ..api.instagram import instagram_api
+    result = await instagram_api.process_media(payload["media_id"])
+    return {
+        "media_id": payload["media_id"],
+        "media_type": result.get("media_type"),
+        "violations": result.get("violations", []),
+        "violations_found": result.get("violations_found", False)
+    }
+
+
+async def backfill_instagram_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Scan an account's media history (resuming from its checkpoint on redelivery)"""
+    from ..api.instagram import instagram_api
+    from ..api.instagram_backfill import InstagramBackfill
+    checkpoint = await InstagramBackfill(instagram_api).run(payload["account_id"], restart=payload.get("restart", False))
+    return {key: checkpoint.get(key) for key in ("processed", "failed", "items_per_second", "elapsed_seconds")}
+
+
+HANDLERS = {
+    "deepfake": analyze_deepfake_job,
+    "instagram_media": process_instagram_media_job,
+    "instagram_backfill": backfill_instagram_job
+}
+
+
+async def release_job_upload(job: Optional[Dict[str, Any]]) -> None:
+    """Drop the job's reference to its upload unless the media was flagged"""
+    if not job:
+        return
+    sha256 = job["payload"].get("sha256")
+    if sha256 and not (job.get("result") or {}).get("is_deepfake"):
+        await blob_store.release(sha256)
@@ -0,0 +1,445 @@
+"""
+Persistent job queue backends (Mongo and in-memory)
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import uuid
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.db.mongodb import get_database
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+def priority_for(source: str) -> str:
+    """Priority class of a job source (unknown sources get the middle class)"""
+    classes = settings.JOB_PRIORITY_CLASSES
+    return settings.JOB_SOURCE_CLASSES.get(source, classes[len(classes) // 2])
+
+
+def new_job(
+    queue: str,
+    kind: str,
+    payload: Dict[str, Any],
+    user_id: Optional[str],
+    max_attempts: Optional[int],
+    source: str = "upload",
+    priority: Optional[str] = None,
+    dedup_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "_id": uuid.uuid4().hex,
+        "queue": queue,
+        "kind": kind,
+        "payload": payload,
+        "user_id": user_id,
+        "source": source,
+        "priority": priority or priority_for(source),
+        "dedup_key": dedup_key,
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "result": None,
+        "error": None,
+        "worker_id": None,
+        "created_at": now,
+        "available_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "lease_expires_at": None,
+        "notified": False
+    }
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff before the next delivery of a failed job"""
+    return settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+
+
+def requeue_fields(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Reset a failed job for a fresh round of attempts (keeps its id)"""
+    return {
+        "payload": job["payload"],
+        "status": QUEUED,
+        "attempts": 0,
+        "result": None,
+        "error": None,
+        "worker_id": None,
+        "available_at": job["available_at"],
+        "started_at": None,
+        "finished_at": None,
+        "lease_expires_at": None,
+        "notified": False
+    }
+
+
+class MongoJobQueue:
+    """Jobs stored in the `jobs` collection.
+
+    A claim atomically moves one deliverable job to `running` and gives the
+    worker a lease of `visibility_timeout` seconds. A job whose lease runs out
+    (worker crashed or stalled) becomes deliverable again, until it has used
+    up `max_attempts`.
+    """
+    def __init__(self, collection_name: str = "jobs"):
+        self.collection_name = collection_name
+        self._dedup_index_ready = False
+
+    async def _collection(self):
+        db = await get_database()
+        collection = db[self.collection_name]
+        if not self._dedup_index_ready:
+            await collection.create_index(
+                "dedup_key", unique=True, partialFilterExpression={"dedup_key": {"$type": "string"}}
+            )
+            self._dedup_index_ready = True
+        return collection
+
+    @staticmethod
+    def _deliverable(queue: str, now: datetime) -> Dict[str, Any]:
+        return {
+            "queue": queue,
+            "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+            "$or": [
+                {"status": QUEUED, "available_at": {"$lte": now}},
+                {"status": RUNNING, "lease_expires_at": {"$lte": now}}
+            ]
+        }
+
+    async def enqueue(
+        self,
+        queue: str,
+        kind: str,
+        payload: Dict[str, Any],
+        user_id: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        source: str = "upload",
+        priority: Optional[str] = None,
+        dedup_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Add a job; with `dedup_key` an existing job with the same key is
+        returned instead (marked `duplicate`) unless it failed for good, in
+        which case it is requeued."""
+        job = new_job(queue, kind, payload, user_id, max_attempts, source, priority, dedup_key)
+        collection = await self._collection()
+        try:
+            await collection.insert_one(job)
+            return job
+        except DuplicateKeyError:
+            pass
+        requeued = await collection.find_one_and_update(
+            {"dedup_key": dedup_key, "status": FAILED},
+            {"$set": requeue_fields(job)},
+            return_document=ReturnDocument.AFTER
+        )
+        if requeued:
+            return requeued
+        existing = await collection.find_one({"dedup_key": dedup_key})
+        return {**existing, "duplicate": True}
+
+    @staticmethod
+    def _claim_update(worker_id: str, visibility_timeout: float, now: datetime) -> Dict[str, Any]:
+        return {
+            "$set": {
+                "status": RUNNING,
+                "worker_id": worker_id,
+                "started_at": now,
+                "lease_expires_at": now + timedelta(seconds=visibility_timeout)
+            },
+            "$inc": {"attempts": 1}
+        }
+
+    async def claim(self, queue: str, worker_id: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        """Claim the oldest deliverable job (FIFO)"""
+        now = datetime.utcnow()
+        collection = await self._collection()
+        return await collection.find_one_and_update(
+            self._deliverable(queue, now),
+            self._claim_update(worker_id, visibility_timeout, now),
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def claim_job(self, job_id: str, worker_id: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        """Claim a specific job if it is still deliverable"""
+        now = datetime.utcnow()
+        collection = await self._collection()
+        job = await collection.find_one({"_id": job_id}, {"queue": 1})
+        if not job:
+            return None
+        return await collection.find_one_and_update(
+            {"_id": job_id, **self._deliverable(job["queue"], now)},
+            self._claim_update(worker_id, visibility_timeout, now),
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def waiting_heads(self, queue: str, priority: str, exclude_sources: List[str], limit: int = 50) -> List[Dict[str, Any]]:
+        """Oldest deliverable job of each user in a priority class"""
+        collection = await self._collection()
+        match = {**self._deliverable(queue, datetime.utcnow()), "priority": priority}
+        if exclude_sources:
+            match["source"] = {"$nin": exclude_sources}
+        cursor = collection.aggregate([
+            {"$match": match},
+            {"$sort": {"available_at": 1}},
+            {"$group": {"_id": "$user_id", "job_id": {"$first": "$_id"}, "available_at": {"$first": "$available_at"}}},
+            {"$sort": {"available_at": 1}},
+            {"$limit": limit}
+        ])
+        return [
+            {"user_id": row["_id"], "job_id": row["job_id"], "available_at": row["available_at"]}
+            async for row in cursor
+        ]
+
+    async def running_counts(self, queue: str) -> Dict[str, Dict[str, int]]:
+        """Jobs holding a live lease, per source and per user"""
+        collection = await self._collection()
+        cursor = collection.aggregate([
+            {"$match": {"queue": queue, "status": RUNNING, "lease_expires_at": {"$gt": datetime.utcnow()}}},
+            {"$group": {"_id": {"source": "$source", "user_id": "$user_id"}, "count": {"$sum": 1}}}
+        ])
+        counts: Dict[str, Dict[str, int]] = {"sources": {}, "users": {}}
+        async for row in cursor:
+            for field, key in (("sources", "source"), ("users", "user_id")):
+                name = row["_id"].get(key)
+                counts[field][name] = counts[field].get(name, 0) + row["count"]
+        return counts
+
+    async def extend(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        """Renew the lease; False if the job was redelivered to another worker"""
+        collection = await self._collection()
+        result = await collection.update_one(
+            {"_id": job_id, "status": RUNNING, "worker_id": worker_id},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=visibility_timeout)}}
+        )
+        return result.matched_count == 1
+
+    async def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        collection = await self._collection()
+        update = await collection.update_one(
+            {"_id": job_id, "status": RUNNING, "worker_id": worker_id},
+            {"$set": {"status": SUCCEEDED, "result": result, "error": None, "finished_at": datetime.utcnow()}}
+        )
+        return update.matched_count == 1
+
+    async def fail(self, job_id: str, worker_id: str, error: str) -> Optional[str]:
+        """Requeue with backoff, or mark failed once attempts are exhausted; returns the new status"""
+        collection = await self._collection()
+        job = await collection.find_one({"_id": job_id, "status": RUNNING, "worker_id": worker_id})
+        if not job:
+            return None
+        now = datetime.utcnow()
+        if job["attempts"] < job["max_attempts"]:
+            update = {"status": QUEUED, "error": error, "available_at": now + timedelta(seconds=retry_delay(job["attempts"]))}
+        else:
+            update = {"status": FAILED, "error": error, "finished_at": now}
+        await collection.update_one({"_id": job_id, "worker_id": worker_id, "status": RUNNING}, {"$set": update})
+        return update["status"]
+
+    async def reap_expired(self, queue: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Fail running jobs whose lease expired on their last attempt and return them"""
+        now = datetime.utcnow()
+        collection = await self._collection()
+        jobs = []
+        for _ in range(limit):
+            job = await collection.find_one_and_update(
+                {
+                    "queue": queue,
+                    "status": RUNNING,
+                    "lease_expires_at": {"$lte": now},
+                    "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+                },
+                {"$set": {"status": FAILED, "error": "Visibility timeout expired", "finished_at": now}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            jobs.append(job)
+        return jobs
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        collection = await self._collection()
+        return await collection.find_one({"_id": job_id})
+
+    async def pop_unnotified(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Finished jobs whose completion has not been announced yet, marked as announced"""
+        collection = await self._collection()
+        jobs = []
+        for _ in range(limit):
+            job = await collection.find_one_and_update(
+                {"status": {"$in": list(FINISHED_STATES)}, "notified": False},
+                {"$set": {"notified": True}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            jobs.append(job)
+        return jobs
+
+    async def counts(self, queue: str) -> Dict[str, int]:
+        collection = await self._collection()
+        cursor = collection.aggregate([
+            {"$match": {"queue": queue}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])
+        return {row["_id"]: row["count"] async for row in cursor}
+
+
+class InMemoryJobQueue:
+    """Process-local queue with the same semantics, for tests"""
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def _is_deliverable(self, job: Dict[str, Any], queue: str, now: datetime) -> bool:
+        if job["queue"] != queue or job["attempts"] >= job["max_attempts"]:
+            return False
+        if job["status"] == QUEUED:
+            return job["available_at"] <= now
+        return job["status"] == RUNNING and job["lease_expires_at"] <= now
+
+    async def enqueue(
+        self,
+        queue: str,
+        kind: str,
+        payload: Dict[str, Any],
+        user_id: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        source: str = "upload",
+        priority: Optional[str] = None,
+        dedup_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        job = new_job(queue, kind, payload, user_id, max_attempts, source, priority, dedup_key)
+        if dedup_key is not None:
+            for existing in self.jobs.values():
+                if existing["dedup_key"] == dedup_key:
+                    if existing["status"] != FAILED:
+                        return {**existing, "duplicate": True}
+                    existing.update(requeue_fields(job))
+                    return dict(existing)
+        self.jobs[job["_id"]] = job
+        return dict(job)
+
+    async def claim(self, queue: str, worker_id: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        candidates = [job for job in self.jobs.values() if self._is_deliverable(job, queue, now)]
+        if not candidates:
+            return None
+        return self._claim(min(candidates, key=lambda job: job["available_at"]), worker_id, visibility_timeout, now)
+
+    @staticmethod
+    def _claim(job: Dict[str, Any], worker_id: str, visibility_timeout: float, now: datetime) -> Dict[str, Any]:
+        job.update({
+            "status": RUNNING,
+            "worker_id": worker_id,
+            "started_at": now,
+            "lease_expires_at": now + timedelta(seconds=visibility_timeout),
+            "attempts": job["attempts"] + 1
+        })
+        return dict(job)
+
+    async def claim_job(self, job_id: str, worker_id: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        job = self.jobs.get(job_id)
+        if not job or not self._is_deliverable(job, job["queue"], now):
+            return None
+        return self._claim(job, worker_id, visibility_timeout, now)
+
+    async def waiting_heads(self, queue: str, priority: str, exclude_sources: List[str], limit: int = 50) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        heads: Dict[Optional[str], Dict[str, Any]] = {}
+        for job in self.jobs.values():
+            if (job["priority"] != priority or job["source"] in exclude_sources
+                    or not self._is_deliverable(job, queue, now)):
+                continue
+            head = heads.get(job["user_id"])
+            if head is None or job["available_at"] < head["available_at"]:
+                heads[job["user_id"]] = {"user_id": job["user_id"], "job_id": job["_id"], "available_at": job["available_at"]}
+        return sorted(heads.values(), key=lambda head: head["available_at"])[:limit]
+
+    async def running_counts(self, queue: str) -> Dict[str, Dict[str, int]]:
+        now = datetime.utcnow()
+        counts: Dict[str, Dict[str, int]] = {"sources": {}, "users": {}}
+        for job in self.jobs.values():
+            if job["queue"] == queue and job["status"] == RUNNING and job["lease_expires_at"] > now:
+                counts["sources"][job["source"]] = counts["sources"].get(job["source"], 0) + 1
+                counts["users"][job["user_id"]] = counts["users"].get(job["user_id"], 0) + 1
+        return counts
+
+    def _owned(self, job_id: str, worker_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job and job["status"] == RUNNING and job["worker_id"] == worker_id:
+            return job
+        return None
+
+    async def extend(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        job = self._owned(job_id, worker_id)
+        if job:
+            job["lease_expires_at"] = datetime.utcnow() + timedelta(seconds=visibility_timeout)
+        return job is not None
+
+    async def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        job = self._owned(job_id, worker_id)
+        if job:
+            job.update({"status": SUCCEEDED, "result": result, "error": None, "finished_at": datetime.utcnow()})
+        return job is not None
+
+    async def fail(self, job_id: str, worker_id: str, error: str) -> Optional[str]:
+        job = self._owned(job_id, worker_id)
+        if not job:
+            return None
+        now = datetime.utcnow()
+        if job["attempts"] < job["max_attempts"]:
+            job.update({"status": QUEUED, "error": error, "available_at": now + timedelta(seconds=retry_delay(job["attempts"]))})
+        else:
+            job.update({"status": FAILED, "error": error, "finished_at": now})
+        return job["status"]
+
+    async def reap_expired(self, queue: str, limit: int = 100) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        reaped = []
+        for job in self.jobs.values():
+            if len(reaped) >= limit:
+                break
+            if (job["queue"] == queue and job["status"] == RUNNING and job["lease_expires_at"] <= now
+                    and job["attempts"] >= job["max_attempts"]):
+                job.update({"status": FAILED, "error": "Visibility timeout expired", "finished_at": now})
+                reaped.append(dict(job))
+        return reaped
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def pop_unnotified(self, limit: int = 100) -> List[Dict[str, Any]]:
+        jobs = []
+        for job in self.jobs.values():
+            if len(jobs) >= limit:
+                break
+            if job["status"] in FINISHED_STATES and not job["notified"]:
+                job["notified"] = True
+                jobs.append(dict(job))
+        return jobs
+
+    async def counts(self, queue: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            if job["queue"] == queue:
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+
+def create_job_queue(backend: Optional[str] = None):
+    """Queue backend selected by JOB_QUEUE_BACKEND ("mongo" or "memory")"""
+    backend = backend or settings.JOB_QUEUE_BACKEND
+    return InMemoryJobQueue() if backend == "memory" else MongoJobQueue()
+
+
+job_queue = create_job_queue()
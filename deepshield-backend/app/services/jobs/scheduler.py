@@ -0,0 +1,133 @@
+"""
+Priority, fair-share and per-source caps for claiming analysis jobs
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from datetime import datetime
+import bisect
+import time
+
+from app.config import settings
+
+# Upper bounds (seconds) of the queue wait-time histogram buckets
+WAIT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+CLAIM_ATTEMPTS = 3
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts, Prometheus style)"""
+    def __init__(self, buckets: Sequence[float] = WAIT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95)
+        }
+
+
+class JobScheduler:
+    """Chooses which deliverable job a worker claims next.
+
+    Classes are served in strict priority order, skipping sources that
+    already have their cap of running jobs (caps are global because running
+    counts come from the queue). Within a class the job goes to the user
+    with the fewest running jobs, then the least recent service (a decaying
+    count of claims, so a user with a thousand queued uploads alternates with
+    everyone else), then the oldest job.
+    """
+    def __init__(
+        self,
+        backend,
+        classes: Optional[Sequence[str]] = None,
+        source_caps: Optional[Dict[str, int]] = None,
+        half_life_seconds: Optional[float] = None,
+    ):
+        self.backend = backend
+        self.classes = list(classes or settings.JOB_PRIORITY_CLASSES)
+        self.source_caps = source_caps if source_caps is not None else settings.JOB_SOURCE_CONCURRENCY
+        self.half_life = half_life_seconds if half_life_seconds is not None else settings.JOB_FAIR_SHARE_HALF_LIFE_SECONDS
+        self._usage: Dict[Optional[str], Tuple[float, float]] = {}
+        self.wait_times: Dict[Tuple[str, str], Histogram] = {}
+        # Claim attempts made while each source was at its cap. This counts
+        # worker polls, not jobs held back, so it grows with poll frequency
+        # and is only meaningful as a rate
+        self.capped_polls: Dict[str, int] = {}
+
+    def usage(self, user_id: Optional[str]) -> float:
+        value, at = self._usage.get(user_id, (0.0, 0.0))
+        return value * 0.5 ** ((time.monotonic() - at) / self.half_life)
+
+    def _charge(self, user_id: Optional[str]) -> None:
+        self._usage[user_id] = (self.usage(user_id) + 1, time.monotonic())
+
+    def _observe_wait(self, queue: str, job: Dict[str, Any]) -> None:
+        key = (queue, job.get("priority") or "")
+        wait = max((datetime.utcnow() - job["available_at"]).total_seconds(), 0.0)
+        self.wait_times.setdefault(key, Histogram()).observe(wait)
+
+    async def claim(self, queue: str, worker_id: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        """Claim the next job for `queue`, or None if nothing is eligible"""
+        running = await self.backend.running_counts(queue)
+        capped: List[str] = [
+            source for source, cap in self.source_caps.items()
+            if running["sources"].get(source, 0) >= cap
+        ]
+        for source in capped:
+            self.capped_polls[source] = self.capped_polls.get(source, 0) + 1
+
+        for priority in self.classes:
+            for _ in range(CLAIM_ATTEMPTS):
+                heads = await self.backend.waiting_heads(queue, priority, capped)
+                if not heads:
+                    break
+                head = min(heads, key=lambda head: (
+                    running["users"].get(head["user_id"], 0),
+                    self.usage(head["user_id"]),
+                    head["available_at"]
+                ))
+                job = await self.backend.claim_job(head["job_id"], worker_id, visibility_timeout)
+                if job:
+                    self._charge(job.get("user_id"))
+                    self._observe_wait(queue, job)
+                    return job
+                # Another worker took it first; look again
+        return None
+
+    def stats(self, queue: str) -> Dict[str, Any]:
+        return {
+            "wait_seconds": {
+                priority: histogram.snapshot()
+                for (histogram_queue, priority), histogram in self.wait_times.items()
+                if histogram_queue == queue
+            },
+            "capped_polls": dict(self.capped_polls)
+        }
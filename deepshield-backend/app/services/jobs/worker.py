@@ -0,0 +1,232 @@
+"""
+Worker pool consuming the job queue, plus the completion notifier.
+
+Usage: python -m app.services.jobs.worker [--processes N] [--concurrency M]
+"""
+from typing import Dict, Any, List, Optional, Sequence, Callable, Awaitable
+from collections import deque
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+
+from app.config import settings
+from .queue import QUEUED, FAILED
+from .scheduler import JobScheduler
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+FinishedCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+class QueueMetrics:
+    """Counters and a sliding completion window for one queue"""
+    def __init__(self):
+        self.claimed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.lease_lost = 0
+        self.busy_seconds = 0.0
+        self._completions: deque = deque()
+
+    def record(self, outcome: str, elapsed: float) -> None:
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        self.busy_seconds += elapsed
+        now = time.monotonic()
+        self._completions.append(now)
+        while self._completions and now - self._completions[0] > THROUGHPUT_WINDOW_SECONDS:
+            self._completions.popleft()
+
+    def snapshot(self) -> Dict[str, Any]:
+        processed = self.succeeded + self.failed + self.retried + self.lease_lost
+        now = time.monotonic()
+        recent = sum(1 for at in self._completions if now - at <= THROUGHPUT_WINDOW_SECONDS)
+        return {
+            "claimed": self.claimed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "lease_lost": self.lease_lost,
+            "throughput_per_second": recent / THROUGHPUT_WINDOW_SECONDS,
+            "avg_processing_seconds": self.busy_seconds / processed if processed else 0.0
+        }
+
+
+class JobWorkerPool:
+    """`concurrency` asyncio workers claiming jobs from `queues` in order.
+
+    The JobScheduler picks which job of a queue is claimed next. While a
+    handler runs its lease is renewed every third of the visibility
+    timeout, so only crashed or wedged workers lose their jobs. Handler
+    exceptions requeue the job with exponential backoff until its attempts
+    are used up.
+    """
+    def __init__(
+        self,
+        backend,
+        handlers: Dict[str, Handler],
+        queues: Sequence[str] = ("analysis",),
+        concurrency: Optional[int] = None,
+        visibility_timeout: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        on_finished: Optional[FinishedCallback] = None,
+        scheduler: Optional[JobScheduler] = None,
+    ):
+        self.backend = backend
+        self.scheduler = scheduler or JobScheduler(backend)
+        self.handlers = handlers
+        self.queues = list(queues)
+        self.concurrency = concurrency if concurrency is not None else settings.JOB_WORKER_CONCURRENCY
+        self.visibility_timeout = visibility_timeout if visibility_timeout is not None else settings.JOB_VISIBILITY_TIMEOUT_SECONDS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_POLL_INTERVAL_SECONDS
+        self.on_finished = on_finished
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics: Dict[str, QueueMetrics] = {queue: QueueMetrics() for queue in self.queues}
+        self._tasks: List[asyncio.Task] = []
+        self._last_reap = 0.0
+
+    def start(self) -> None:
+        for i in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._worker_loop(f"{self.worker_prefix}:{i}")))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_once(self, worker_id: str) -> bool:
+        """Claim and process one job; False when every queue is empty"""
+        for queue in self.queues:
+            job = await self.scheduler.claim(queue, worker_id, self.visibility_timeout)
+            if job:
+                self.metrics[queue].claimed += 1
+                await self._process(queue, job, worker_id)
+                return True
+        return False
+
+    async def _worker_loop(self, worker_id: str) -> None:
+        while True:
+            try:
+                if not await self.run_once(worker_id):
+                    await self._reap()
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker {worker_id} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _reap(self) -> None:
+        if time.monotonic() - self._last_reap < self.visibility_timeout:
+            return
+        self._last_reap = time.monotonic()
+        for queue in self.queues:
+            reaped = await self.backend.reap_expired(queue)
+            if reaped:
+                self.metrics[queue].failed += len(reaped)
+                print(f"Failed {len(reaped)} job(s) in {queue} after their final lease expired")
+            for job in reaped:
+                await self._finished(job)
+
+    async def _heartbeat(self, job_id: str, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not await self.backend.extend(job_id, worker_id, self.visibility_timeout):
+                return
+
+    async def _process(self, queue: str, job: Dict[str, Any], worker_id: str) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job["_id"], worker_id))
+        started = time.monotonic()
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise ValueError(f"No handler for job kind {job['kind']}")
+            result = await handler(job["payload"])
+        except Exception as e:
+            status = await self.backend.fail(job["_id"], worker_id, str(e))
+            outcome = {QUEUED: "retried", FAILED: "failed"}.get(status, "lease_lost")
+        else:
+            outcome = "succeeded" if await self.backend.complete(job["_id"], worker_id, result) else "lease_lost"
+        finally:
+            heartbeat.cancel()
+        self.metrics[queue].record(outcome, time.monotonic() - started)
+
+        if outcome in ("succeeded", "failed"):
+            await self._finished(await self.backend.get(job["_id"]))
+
+    async def _finished(self, job: Dict[str, Any]) -> None:
+        """Run the finish hook (e.g. releasing the job's upload) for a job that will not run again"""
+        if not self.on_finished:
+            return
+        try:
+            await self.on_finished(job)
+        except Exception as e:
+            print(f"Job {job['_id']} finish hook failed: {e}")
+
+    async def stats(self) -> Dict[str, Any]:
+        """Per-queue depth (from the backend) and local throughput counters"""
+        stats = {}
+        for queue in self.queues:
+            counts = await self.backend.counts(queue)
+            stats[queue] = {
+                "depth": counts.get(QUEUED, 0),
+                "states": counts,
+                "workers": len(self._tasks),
+                **self.metrics[queue].snapshot(),
+                **self.scheduler.stats(queue)
+            }
+        return stats
+
+
+async def run_notifier(backend, notify: FinishedCallback, interval_seconds: Optional[float] = None) -> None:
+    """Announce finished jobs (from any worker process) until cancelled"""
+    interval = interval_seconds if interval_seconds is not None else settings.JOB_NOTIFY_INTERVAL_SECONDS
+    while True:
+        try:
+            for job in await backend.pop_unnotified():
+                await notify(job)
+        except Exception as e:
+            print(f"Job notifier failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _serve(concurrency: int) -> None:
+    from app.db.mongodb import connect_to_mongo
+    from .handlers import ANALYSIS_QUEUE, HANDLERS, release_job_upload
+    from .queue import job_queue
+
+    await connect_to_mongo()
+    pool = JobWorkerPool(job_queue, HANDLERS, queues=[ANALYSIS_QUEUE], concurrency=concurrency, on_finished=release_job_upload)
+    pool.start()
+    print(f"Job worker {pool.worker_prefix} started with {concurrency} worker(s)")
+    await asyncio.gather(*pool._tasks)
+
+
+def _process_main(concurrency: int) -> None:
+    asyncio.run(_serve(concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run analysis job workers")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=max(settings.JOB_WORKER_CONCURRENCY, 1), help="Workers per process")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        _process_main(args.concurrency)
+        return
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_process_main, args=(args.concurrency,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,13 @@ websocket_service = WebSocketNotificationService()
 
 async def notify_content_flagged(user_id: str, content: Dict[str, Any]) -> Dict[str, bool]:
     """Notify a user about flagged content."""
-    notification_type = "flagged_content"
-    
+    return await _notify_all_channels(user_id, "flagged_content", content)
+
+async def notify_media_misuse(user_id: str, content: Dict[str, Any]) -> Dict[str, bool]:
+    """Notify a user about potential misuse (e.g. a deepfake) of their media."""
+    return await _notify_all_channels(user_id, "media_misuse", content)
+
+async def _notify_all_channels(user_id: str, notification_type: str, content: Dict[str, Any]) -> Dict[str, bool]:
     # Send notifications through all channels
     email_sent = await email_service.send_notification(
         user_id=user_id,
@@ -37,3 +42,19 @@ async def notify_content_flagged(user_id: str, content: Dict[str, Any]) -> Dict[
         "sms": sms_sent,
         "websocket": websocket_sent
     }
+
+async def notify_job_finished(job: Dict[str, Any]) -> bool:
+    """Push the outcome of an analysis job to the submitting user's websocket."""
+    if not job.get("user_id"):
+        return False
+    return await websocket_service.send_notification(
+        user_id=job["user_id"],
+        notification_type="job_finished",
+        content={
+            "job_id": job["_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "result": job.get("result"),
+            "error": job.get("error")
+        }
+    )
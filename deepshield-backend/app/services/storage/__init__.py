@@ -0,0 +1,9 @@
+from .uploads import StoredUpload, save_upload_file, read_upload, max_upload_size
+from .blob_store import BlobStore, MongoBlobIndex, InMemoryBlobIndex, blob_store
+from .retention import UploadRetention, TieredStaticFiles, upload_retention
+
+__all__ = [
+    "StoredUpload", "save_upload_file", "read_upload", "max_upload_size",
+    "BlobStore", "MongoBlobIndex", "InMemoryBlobIndex", "blob_store",
+    "UploadRetention", "TieredStaticFiles", "upload_retention"
+]
@@ -0,0 +1,282 @@
+"""
+Content-addressed upload storage with reference counting and garbage collection
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import os
+import re
+import time
+from fastapi import UploadFile
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config import settings
+from app.db.mongodb import get_database
+from .uploads import UPLOAD_DIR, StoredUpload, save_upload_file
+
+_EXTENSION = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+
+
+class MongoBlobIndex:
+    """Blob metadata and reference counts stored in the `blobs` collection"""
+    def __init__(self, collection_name: str = "blobs"):
+        self.collection_name = collection_name
+
+    async def _collection(self):
+        db = await get_database()
+        return db[self.collection_name]
+
+    async def add_ref(self, sha256: str, delta: int, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Adjust the reference count; metadata creates the record if missing"""
+        collection = await self._collection()
+        now = datetime.utcnow()
+        update = {"$inc": {"refcount": delta}, "$set": {"updated_at": now}}
+        if metadata is not None:
+            update["$setOnInsert"] = {**metadata, "tier": "hot", "created_at": now, "last_accessed_at": now}
+        return await collection.find_one_and_update(
+            {"_id": sha256},
+            update,
+            upsert=metadata is not None,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        collection = await self._collection()
+        return await collection.find_one({"_id": sha256})
+
+    async def unreferenced(self, older_than: datetime, limit: int = 1000) -> List[Dict[str, Any]]:
+        collection = await self._collection()
+        cursor = collection.find({"refcount": {"$lte": 0}, "updated_at": {"$lt": older_than}})
+        return await cursor.to_list(length=limit)
+
+    async def delete_if_unreferenced(self, sha256: str, older_than: datetime) -> bool:
+        collection = await self._collection()
+        result = await collection.delete_one(
+            {"_id": sha256, "refcount": {"$lte": 0}, "updated_at": {"$lt": older_than}}
+        )
+        return result.deleted_count == 1
+
+    async def touch(self, accessed: Dict[str, datetime]) -> None:
+        """Record the latest access time of each blob"""
+        if not accessed:
+            return
+        collection = await self._collection()
+        await collection.bulk_write(
+            [UpdateOne({"_id": sha256}, {"$max": {"last_accessed_at": at}}) for sha256, at in accessed.items()],
+            ordered=False
+        )
+
+    async def least_recently_used(self, tier: str, accessed_before: Optional[datetime] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        collection = await self._collection()
+        query: Dict[str, Any] = {"tier": {"$in": [None, "hot"]} if tier == "hot" else tier}
+        if accessed_before is not None:
+            query["last_accessed_at"] = {"$lt": accessed_before}
+        cursor = collection.find(query).sort("last_accessed_at", 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def archived_before(self, cutoff: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        collection = await self._collection()
+        cursor = collection.find({"tier": "archive", "tiered_at": {"$lt": cutoff}}).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def set_tier(self, sha256: str, tier: str, archive_path: Optional[str] = None, archive_size: Optional[int] = None) -> None:
+        collection = await self._collection()
+        update: Dict[str, Any] = {"$set": {"tier": tier, "tiered_at": datetime.utcnow()}}
+        if archive_path is not None:
+            update["$set"].update({"archive_path": archive_path, "archive_size": archive_size})
+        else:
+            update["$unset"] = {"archive_path": "", "archive_size": ""}
+        await collection.update_one({"_id": sha256}, update)
+
+    async def tier_usage(self) -> Dict[str, Dict[str, int]]:
+        """Blob count and bytes on disk per tier"""
+        collection = await self._collection()
+        cursor = collection.aggregate([{"$group": {
+            "_id": {"$ifNull": ["$tier", "hot"]},
+            "count": {"$sum": 1},
+            "bytes": {"$sum": {"$ifNull": ["$archive_size", "$size"]}}
+        }}])
+        return {row["_id"]: {"count": row["count"], "bytes": row["bytes"]} async for row in cursor}
+
+
+class InMemoryBlobIndex:
+    """Process-local blob index for tests"""
+    def __init__(self):
+        self.blobs: Dict[str, Dict[str, Any]] = {}
+
+    async def add_ref(self, sha256: str, delta: int, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        if sha256 not in self.blobs:
+            if metadata is None:
+                return None
+            self.blobs[sha256] = {
+                "_id": sha256, "refcount": 0, "tier": "hot", "created_at": now, "last_accessed_at": now, **metadata
+            }
+        blob = self.blobs[sha256]
+        blob["refcount"] += delta
+        blob["updated_at"] = now
+        return dict(blob)
+
+    async def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        blob = self.blobs.get(sha256)
+        return dict(blob) if blob else None
+
+    async def unreferenced(self, older_than: datetime, limit: int = 1000) -> List[Dict[str, Any]]:
+        return [
+            dict(blob) for blob in self.blobs.values()
+            if blob["refcount"] <= 0 and blob["updated_at"] < older_than
+        ][:limit]
+
+    async def delete_if_unreferenced(self, sha256: str, older_than: datetime) -> bool:
+        blob = self.blobs.get(sha256)
+        if blob and blob["refcount"] <= 0 and blob["updated_at"] < older_than:
+            del self.blobs[sha256]
+            return True
+        return False
+
+    async def touch(self, accessed: Dict[str, datetime]) -> None:
+        for sha256, at in accessed.items():
+            blob = self.blobs.get(sha256)
+            if blob:
+                blob["last_accessed_at"] = max(blob["last_accessed_at"], at)
+
+    async def least_recently_used(self, tier: str, accessed_before: Optional[datetime] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        blobs = [
+            dict(blob) for blob in self.blobs.values()
+            if blob.get("tier", "hot") == tier
+            and (accessed_before is None or blob["last_accessed_at"] < accessed_before)
+        ]
+        return sorted(blobs, key=lambda blob: blob["last_accessed_at"])[:limit]
+
+    async def archived_before(self, cutoff: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        return [
+            dict(blob) for blob in self.blobs.values()
+            if blob.get("tier") == "archive" and blob["tiered_at"] < cutoff
+        ][:limit]
+
+    async def set_tier(self, sha256: str, tier: str, archive_path: Optional[str] = None, archive_size: Optional[int] = None) -> None:
+        blob = self.blobs.get(sha256)
+        if not blob:
+            return
+        blob.update({"tier": tier, "tiered_at": datetime.utcnow()})
+        if archive_path is not None:
+            blob.update({"archive_path": archive_path, "archive_size": archive_size})
+        else:
+            blob.pop("archive_path", None)
+            blob.pop("archive_size", None)
+
+    async def tier_usage(self) -> Dict[str, Dict[str, int]]:
+        usage: Dict[str, Dict[str, int]] = {}
+        for blob in self.blobs.values():
+            tier = usage.setdefault(blob.get("tier", "hot"), {"count": 0, "bytes": 0})
+            tier["count"] += 1
+            tier["bytes"] += blob.get("archive_size") or blob["size"]
+        return usage
+
+
+class BlobStore:
+    """Stores each distinct upload once under blobs/<aa>/<bb>/<sha256><ext>.
+
+    Uploads are streamed to a temporary file while hashing; when the digest
+    is already known the temporary copy is dropped and the existing path is
+    returned. Every put adds a reference; callers release references they no
+    longer need and the garbage collector removes blobs that have stayed
+    unreferenced for longer than the grace period.
+    """
+    def __init__(self, root: Optional[str] = None, index=None):
+        self.root = root or os.path.join(UPLOAD_DIR, "blobs")
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        self.index = index or MongoBlobIndex()
+        self.duplicates = 0
+        self.bytes_deduplicated = 0
+
+    def blob_path(self, sha256: str, extension: str = "") -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], f"{sha256}{extension}")
+
+    @staticmethod
+    def _extension(filename: Optional[str]) -> str:
+        extension = os.path.splitext(filename or "")[1].lower()
+        return extension if _EXTENSION.match(extension) else ""
+
+    async def put(self, upload_file: UploadFile, max_size: Optional[int] = None) -> StoredUpload:
+        """Store an upload (or reuse an identical one) and take a reference to it"""
+        staged = await save_upload_file(upload_file, self.tmp_dir, max_size=max_size)
+        return await self.put_staged(staged)
+
+    async def put_staged(self, staged: StoredUpload) -> StoredUpload:
+        """Move a file already written (and hashed) under tmp_dir into the store and take a reference to it"""
+        try:
+            blob = await self.index.add_ref(staged.sha256, 1, {
+                "path": self.blob_path(staged.sha256, self._extension(staged.filename)),
+                "size": staged.size,
+                "content_type": staged.content_type
+            })
+            path = blob["path"]
+            if os.path.exists(path):
+                self.duplicates += 1
+                self.bytes_deduplicated += staged.size
+                await self.index.touch({staged.sha256: datetime.utcnow()})
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(staged.path, path)
+                if blob.get("tier", "hot") != "hot":
+                    # Re-uploading archived content brings it back to the hot tier
+                    if blob.get("archive_path") and os.path.exists(blob["archive_path"]):
+                        os.remove(blob["archive_path"])
+                    await self.index.set_tier(staged.sha256, "hot")
+                    await self.index.touch({staged.sha256: datetime.utcnow()})
+        finally:
+            if os.path.exists(staged.path):
+                os.remove(staged.path)
+        return staged.model_copy(update={"path": path})
+
+    async def add_ref(self, sha256: str) -> bool:
+        """Take another reference to an existing blob"""
+        return await self.index.add_ref(sha256, 1) is not None
+
+    async def release(self, sha256: str) -> None:
+        """Drop one reference; the blob becomes collectable at zero"""
+        await self.index.add_ref(sha256, -1)
+
+    async def collect_garbage(self, grace_seconds: Optional[int] = None) -> Dict[str, int]:
+        """Delete blobs unreferenced for longer than the grace period"""
+        grace = grace_seconds if grace_seconds is not None else settings.BLOB_GC_GRACE_SECONDS
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        removed = 0
+        freed = 0
+        for blob in await self.index.unreferenced(cutoff):
+            if not await self.index.delete_if_unreferenced(blob["_id"], cutoff):
+                continue
+            for path in (blob["path"], blob.get("archive_path")):
+                if path and os.path.exists(path):
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+            removed += 1
+
+        # Staging files left behind by crashed requests
+        stale_tmp = 0
+        if os.path.isdir(self.tmp_dir):
+            for name in os.listdir(self.tmp_dir):
+                path = os.path.join(self.tmp_dir, name)
+                if time.time() - os.path.getmtime(path) > grace:
+                    os.remove(path)
+                    stale_tmp += 1
+        return {"blobs_removed": removed, "bytes_freed": freed, "stale_tmp_removed": stale_tmp}
+
+    async def run_garbage_collector(self, interval_seconds: Optional[int] = None) -> None:
+        """Background loop calling collect_garbage until cancelled"""
+        interval = interval_seconds if interval_seconds is not None else settings.BLOB_GC_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await self.collect_garbage()
+                if result["blobs_removed"] or result["stale_tmp_removed"]:
+                    print(f"Blob garbage collection: {result}")
+            except Exception as e:
+                print(f"Blob garbage collection failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"duplicates": self.duplicates, "bytes_deduplicated": self.bytes_deduplicated}
+
+
+blob_store = BlobStore()
@@ -0,0 +1,299 @@
+"""
+Retention and tiering for stored uploads
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+from contextlib import asynccontextmanager
+import gzip
+import os
+import re
+import shutil
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.types import Scope
+
+from app.config import settings
+from .blob_store import BlobStore, blob_store
+
+_BLOB_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})?$")
+
+BATCH_SIZE = 100
+
+
+def _copy_atomically(src: str, dst: str, open_src, open_dst) -> int:
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.tmp"
+    try:
+        with open_src(src) as fin, open_dst(tmp_path) as fout:
+            shutil.copyfileobj(fin, fout, settings.UPLOAD_CHUNK_SIZE)
+        os.replace(tmp_path, dst)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(dst)
+
+
+def compress_file(src: str, dst: str, level: int) -> int:
+    """gzip src into dst and return the compressed size"""
+    return _copy_atomically(
+        src, dst, lambda p: open(p, "rb"), lambda p: gzip.open(p, "wb", compresslevel=level)
+    )
+
+
+def decompress_file(src: str, dst: str) -> int:
+    """Inflate a gzip archive back into dst and return its size"""
+    return _copy_atomically(src, dst, lambda p: gzip.open(p, "rb"), lambda p: open(p, "wb"))
+
+
+class UploadRetention:
+    """Moves blobs between the hot tier (publicly served) and a gzip archive.
+
+    Each pass flushes the access times recorded by TieredStaticFiles into the
+    blob index, archives blobs not read for UPLOAD_ARCHIVE_AFTER_SECONDS and,
+    while usage of the hot-tier budget (UPLOAD_HOT_MAX_BYTES) is above the
+    high-water mark, archives least recently used blobs until it drops below
+    the low-water mark. Archived blobs are restored transparently on their
+    next request, and code reading a blob from disk wraps the read in hot(),
+    which restores it first and keeps it out of this process's passes. Archives are only ever deleted when
+    UPLOAD_ARCHIVE_TTL_SECONDS is set: that long after archiving, or LRU-first
+    if archiving alone cannot relieve disk pressure.
+    """
+    def __init__(
+        self,
+        store: Optional[BlobStore] = None,
+        archive_root: Optional[str] = None,
+        archive_after_seconds: Optional[int] = None,
+        archive_ttl_seconds: Optional[int] = None,
+        high_water: Optional[float] = None,
+        low_water: Optional[float] = None,
+        hot_max_bytes: Optional[int] = None,
+        compression_level: Optional[int] = None,
+    ):
+        self.store = store or blob_store
+        self.archive_root = archive_root or settings.UPLOAD_ARCHIVE_DIR
+        self.archive_after = archive_after_seconds if archive_after_seconds is not None else settings.UPLOAD_ARCHIVE_AFTER_SECONDS
+        self.archive_ttl = archive_ttl_seconds if archive_ttl_seconds is not None else settings.UPLOAD_ARCHIVE_TTL_SECONDS
+        self.high_water = high_water if high_water is not None else settings.UPLOAD_DISK_HIGH_WATER
+        self.low_water = low_water if low_water is not None else settings.UPLOAD_DISK_LOW_WATER
+        self.hot_max_bytes = hot_max_bytes if hot_max_bytes is not None else settings.UPLOAD_HOT_MAX_BYTES
+        self.compression_level = compression_level if compression_level is not None else settings.UPLOAD_ARCHIVE_COMPRESSION_LEVEL
+        self._accessed: Dict[str, datetime] = {}
+        self._restoring: Dict[str, asyncio.Future] = {}
+        self._pinned: Dict[str, int] = {}
+        self.archived = 0
+        self.restored = 0
+        self.expired = 0
+        self.bytes_archived = 0
+        self.last_usage: Optional[float] = None
+
+    @property
+    def index(self):
+        return self.store.index
+
+    def archive_path(self, blob: Dict[str, Any]) -> str:
+        sha256 = blob["_id"]
+        return os.path.join(self.archive_root, sha256[:2], sha256[2:4], f"{os.path.basename(blob['path'])}.gz")
+
+    @staticmethod
+    def _digest(path: str) -> Optional[str]:
+        match = _BLOB_NAME.match(os.path.basename(path))
+        return match.group(1) if match else None
+
+    def record_access(self, path: str) -> None:
+        """Note a read of a blob; written to the index on the next pass"""
+        sha256 = self._digest(path)
+        if sha256:
+            self._accessed[sha256] = datetime.utcnow()
+
+    async def flush_accesses(self) -> int:
+        accessed, self._accessed = self._accessed, {}
+        await self.index.touch(accessed)
+        return len(accessed)
+
+    async def usage(self) -> float:
+        """Fraction of the hot-tier budget (or of the filesystem) in use"""
+        if self.hot_max_bytes:
+            usage = await self.index.tier_usage()
+            return usage.get("hot", {}).get("bytes", 0) / self.hot_max_bytes
+        os.makedirs(self.store.root, exist_ok=True)
+        disk = shutil.disk_usage(self.store.root)
+        return disk.used / disk.total
+
+    async def archive(self, blob: Dict[str, Any]) -> bool:
+        """Compress a hot blob into the archive tier (pinned blobs are skipped)"""
+        if self._pinned.get(blob["_id"]):
+            return False
+        if not os.path.exists(blob["path"]):
+            print(f"Blob {blob['_id']} is missing from the hot tier; marking expired")
+            await self.index.set_tier(blob["_id"], "expired")
+            return True
+        archive_path = self.archive_path(blob)
+        try:
+            size = await asyncio.to_thread(compress_file, blob["path"], archive_path, self.compression_level)
+        except Exception as e:
+            print(f"Failed to archive blob {blob['_id']}: {e}")
+            return False
+        await self.index.set_tier(blob["_id"], "archive", archive_path, size)
+        os.remove(blob["path"])
+        self.archived += 1
+        self.bytes_archived += blob["size"]
+        return True
+
+    async def expire(self, blob: Dict[str, Any]) -> None:
+        """Delete an archived blob for good"""
+        if blob.get("archive_path") and os.path.exists(blob["archive_path"]):
+            os.remove(blob["archive_path"])
+        await self.index.set_tier(blob["_id"], "expired")
+        self.expired += 1
+
+    async def restore(self, path: str) -> bool:
+        """Bring an archived blob back to the hot tier; concurrent requests share one restore"""
+        sha256 = self._digest(path)
+        if not sha256:
+            return False
+        task = self._restoring.get(sha256)
+        if task is None:
+            task = asyncio.ensure_future(self._restore(sha256))
+            self._restoring[sha256] = task
+            task.add_done_callback(lambda _: self._restoring.pop(sha256, None))
+        return await asyncio.shield(task)
+
+    async def ensure_hot(self, path: str) -> bool:
+        """Make sure a blob is on disk, restoring it from the archive if needed"""
+        if os.path.exists(path):
+            return True
+        return await self.restore(path)
+
+    @asynccontextmanager
+    async def hot(self, path: str):
+        """Keep a blob in the hot tier while it is being read.
+
+        The blob is restored if it was archived and pinned until the block
+        exits. Pins only hold in this process; readers elsewhere (job worker
+        processes) rely on the restore.
+        """
+        sha256 = self._digest(path)
+        if sha256:
+            self._pinned[sha256] = self._pinned.get(sha256, 0) + 1
+        try:
+            await self.ensure_hot(path)
+            yield path
+        finally:
+            if sha256:
+                remaining = self._pinned.pop(sha256) - 1
+                if remaining:
+                    self._pinned[sha256] = remaining
+
+    async def _restore(self, sha256: str) -> bool:
+        try:
+            blob = await self.index.get(sha256)
+            if not blob or blob.get("tier") != "archive" or not os.path.exists(blob.get("archive_path") or ""):
+                return False
+            await asyncio.to_thread(decompress_file, blob["archive_path"], blob["path"])
+            await self.index.set_tier(sha256, "hot")
+            await self.index.touch({sha256: datetime.utcnow()})
+            os.remove(blob["archive_path"])
+            self.restored += 1
+            return True
+        except Exception as e:
+            print(f"Failed to restore blob {sha256}: {e}")
+            return False
+
+    async def _archive_until(self, accessed_before: Optional[datetime] = None, target: Optional[float] = None) -> int:
+        archived = 0
+        usage = await self.usage() if target is not None else None
+        while target is None or usage > target:
+            blobs: List[Dict[str, Any]] = await self.index.least_recently_used("hot", accessed_before, BATCH_SIZE)
+            progressed = False
+            for blob in blobs:
+                if await self.archive(blob):
+                    archived += 1
+                    progressed = True
+                    if usage is not None:
+                        usage = await self._usage_without(usage, blob)
+                if target is not None and usage <= target:
+                    break
+            if not progressed:
+                break
+        return archived
+
+    async def _usage_without(self, usage: float, blob: Dict[str, Any]) -> float:
+        """Usage once a blob has left the hot tier, without re-aggregating the index"""
+        if self.hot_max_bytes:
+            return usage - blob["size"] / self.hot_max_bytes
+        # Filesystem usage is a statvfs call, and the archive copy lands on disk too
+        return await self.usage()
+
+    async def run_once(self) -> Dict[str, Any]:
+        """One retention pass: flush accesses, archive cold blobs, relieve pressure, expire archives"""
+        result = {"accesses": await self.flush_accesses(), "archived_cold": 0, "archived_pressure": 0, "expired": 0}
+
+        if self.archive_after:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.archive_after)
+            result["archived_cold"] = await self._archive_until(accessed_before=cutoff)
+
+        if await self.usage() >= self.high_water:
+            result["archived_pressure"] = await self._archive_until(target=self.low_water)
+
+        if self.archive_ttl:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.archive_ttl)
+            for blob in await self.index.archived_before(cutoff, BATCH_SIZE):
+                await self.expire(blob)
+                result["expired"] += 1
+            # Still over the mark with nothing left to archive: drop the oldest archives
+            while not self.hot_max_bytes and await self.usage() > self.low_water:
+                blobs = await self.index.least_recently_used("archive", limit=BATCH_SIZE)
+                if not blobs:
+                    break
+                for blob in blobs:
+                    await self.expire(blob)
+                    result["expired"] += 1
+
+        self.last_usage = await self.usage()
+        return result
+
+    async def run(self, interval_seconds: Optional[int] = None) -> None:
+        """Background loop calling run_once until cancelled"""
+        interval = interval_seconds if interval_seconds is not None else settings.UPLOAD_RETENTION_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await self.run_once()
+                if result["archived_cold"] or result["archived_pressure"] or result["expired"]:
+                    print(f"Upload retention: {result}")
+            except Exception as e:
+                print(f"Upload retention failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "archived": self.archived,
+            "restored": self.restored,
+            "expired": self.expired,
+            "bytes_archived": self.bytes_archived,
+            "usage": self.last_usage,
+            "pinned": len(self._pinned),
+            "high_water": self.high_water,
+            "low_water": self.low_water
+        }
+
+
+class TieredStaticFiles(StaticFiles):
+    """StaticFiles for uploads/ that records blob reads and restores archived blobs on demand"""
+    def __init__(self, *args, retention: Optional[UploadRetention] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retention = retention or upload_retention
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            response = await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404 or not await self.retention.restore(path):
+                raise
+            response = await super().get_response(path, scope)
+        self.retention.record_access(path)
+        return response
+
+
+upload_retention = UploadRetention()
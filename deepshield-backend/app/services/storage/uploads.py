@@ -0,0 +1,111 @@
+"""
+Streaming upload writer with incremental hashing and size limits
+"""
+from typing import Optional
+from datetime import datetime
+import hashlib
+import os
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from pydantic import BaseModel
+
+from app.config import settings
+
+UPLOAD_DIR = "uploads"
+
+
+class StoredUpload(BaseModel):
+    """Result of persisting an upload"""
+    path: str
+    sha256: str
+    size: int
+    content_type: Optional[str] = None
+    filename: Optional[str] = None
+
+
+def max_upload_size(content_type: Optional[str]) -> int:
+    """Size limit in bytes for an upload of the given MIME type"""
+    content_type = content_type or ""
+    if content_type.startswith("video/"):
+        return settings.UPLOAD_MAX_VIDEO_BYTES
+    if content_type.startswith("image/"):
+        return settings.UPLOAD_MAX_IMAGE_BYTES
+    return settings.UPLOAD_MAX_OTHER_BYTES
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds maximum size of {limit} bytes")
+
+
+def _upload_limit(upload_file: UploadFile, max_size: Optional[int]) -> int:
+    """Resolve the size limit and reject uploads whose declared size exceeds it"""
+    limit = max_size if max_size is not None else max_upload_size(upload_file.content_type)
+    if upload_file.size is not None and upload_file.size > limit:
+        raise _too_large(limit)
+    return limit
+
+
+async def read_upload(
+    upload_file: UploadFile,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> bytes:
+    """Read an upload into memory in chunks, enforcing the size limit as it goes"""
+    limit = _upload_limit(upload_file, max_size)
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload_file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise _too_large(limit)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def save_upload_file(
+    upload_file: UploadFile,
+    directory: str = UPLOAD_DIR,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """Copy an upload to disk in fixed-size chunks.
+
+    SHA-256 and size are computed while copying, and the write is aborted
+    (and the partial file removed) as soon as the size limit is exceeded.
+    """
+    # Rejects early when the client declared the size up front
+    limit = _upload_limit(upload_file, max_size)
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.basename(upload_file.filename or "upload")
+    file_path = os.path.join(directory, f"{datetime.utcnow().timestamp()}_{filename}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(file_path, 'wb') as out_file:
+            while True:
+                chunk = await upload_file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise _too_large(limit)
+                digest.update(chunk)
+                await out_file.write(chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return StoredUpload(
+        path=file_path,
+        sha256=digest.hexdigest(),
+        size=size,
+        content_type=upload_file.content_type,
+        filename=filename
+    )
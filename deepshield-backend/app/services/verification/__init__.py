@@ -0,0 +1,9 @@
+from .orchestrator import (
+    VERIFICATION_STEPS, COMPLETED, FAILED, SKIPPED,
+    StepResultCache, VerificationOrchestrator, topological_order, verification_orchestrator
+)
+
+__all__ = [
+    "VERIFICATION_STEPS", "COMPLETED", "FAILED", "SKIPPED",
+    "StepResultCache", "VerificationOrchestrator", "topological_order", "verification_orchestrator"
+]
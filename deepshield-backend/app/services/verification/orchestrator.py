@@ -0,0 +1,188 @@
+"""
+Dependency-ordered, concurrent execution of account verification steps
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import asyncio
+import time
+
+from app.config import settings
+
+# Step -> steps that must have completed before it runs. Behavior and
+# metadata analysis need a verified Instagram profile; the image check
+# compares the profile picture against the KYC selfie.
+VERIFICATION_STEPS: Dict[str, Tuple[str, ...]] = {
+    "kyc_verification": (),
+    "profile_verification": (),
+    "behavioral_analysis": ("profile_verification",),
+    "metadata_analysis": ("profile_verification",),
+    "image_verification": ("kyc_verification", "profile_verification"),
+}
+
+# Step outcomes
+COMPLETED = "completed"
+FAILED = "failed"
+SKIPPED = "skipped"  # a dependency did not complete
+
+
+def topological_order(dependencies: Dict[str, Sequence[str]]) -> List[str]:
+    """Steps ordered so each comes after its dependencies (ValueError on
+    unknown dependencies or cycles)"""
+    order: List[str] = []
+    state: Dict[str, str] = {}
+
+    def visit(step: str, path: Tuple[str, ...]) -> None:
+        if state.get(step) == "done":
+            return
+        if state.get(step) == "visiting":
+            raise ValueError(f"Verification steps form a cycle: {' -> '.join(path + (step,))}")
+        if step not in dependencies:
+            raise ValueError(f"Unknown verification step: {step}")
+        state[step] = "visiting"
+        for dependency in dependencies[step]:
+            visit(dependency, path + (step,))
+        state[step] = "done"
+        order.append(step)
+
+    for step in dependencies:
+        visit(step, ())
+    return order
+
+
+class StepResultCache:
+    """Results of completed steps per (user, step), kept for `ttl` seconds.
+
+    At most `max_entries` results are kept (least recently used evicted
+    first). Only completed steps are cached, so failures are retried on the
+    next run.
+    """
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else settings.VERIFICATION_CACHE_TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else settings.VERIFICATION_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, step: str) -> Optional[Dict[str, Any]]:
+        key = (user_id, step)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id: str, step: str, result: Dict[str, Any]) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[(user_id, step)] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end((user_id, step))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str, steps: Optional[Sequence[str]] = None) -> None:
+        """Forget a user's results (or only those of some steps)"""
+        for key in [key for key in self._entries if key[0] == user_id and (steps is None or key[1] in steps)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+class VerificationOrchestrator:
+    """Runs a user's verification steps as a dependency graph.
+
+    Every step starts as soon as its dependencies have completed, so
+    independent steps run concurrently; a step whose dependency failed or
+    was skipped is skipped. Each step is bounded by `step_timeout` and
+    results of completed steps are reused from the cache until they expire.
+    Steps are executed through `user.verify_step(step)`.
+    """
+    def __init__(
+        self,
+        dependencies: Optional[Dict[str, Sequence[str]]] = None,
+        cache: Optional[StepResultCache] = None,
+        step_timeout: Optional[float] = None,
+    ):
+        self.dependencies = {step: tuple(deps) for step, deps in (dependencies or VERIFICATION_STEPS).items()}
+        self.order = topological_order(self.dependencies)
+        self.cache = cache or StepResultCache()
+        self.step_timeout = step_timeout if step_timeout is not None else settings.VERIFICATION_STEP_TIMEOUT_SECONDS
+
+    def plan(self, steps: Optional[Sequence[str]] = None) -> List[str]:
+        """Requested steps plus everything they depend on, in execution order"""
+        if steps is None:
+            return list(self.order)
+        needed = set()
+        pending = list(steps)
+        while pending:
+            step = pending.pop()
+            if step not in self.dependencies:
+                raise ValueError(f"Unknown verification step: {step}")
+            if step not in needed:
+                needed.add(step)
+                pending.extend(self.dependencies[step])
+        return [step for step in self.order if step in needed]
+
+    async def _run_step(self, user, step: str, tasks: Dict[str, asyncio.Task], started: float, refresh: bool) -> Dict[str, Any]:
+        dependencies = self.dependencies[step]
+        record: Dict[str, Any] = {"depends_on": list(dependencies), "cached": False, "result": None, "error": None}
+        outcomes = await asyncio.gather(*(tasks[dependency] for dependency in dependencies))
+        blocked = [dependency for dependency, outcome in zip(dependencies, outcomes) if outcome["status"] != COMPLETED]
+        record["started_ms"] = (time.perf_counter() - started) * 1000
+        if blocked:
+            return {**record, "status": SKIPPED, "error": f"Dependencies not completed: {', '.join(blocked)}", "duration_ms": 0.0}
+
+        cached = None if refresh else self.cache.get(str(user.id), step)
+        if cached is not None:
+            return {**record, "status": COMPLETED, "cached": True, "result": cached, "duration_ms": 0.0}
+
+        step_started = time.perf_counter()
+        try:
+            outcome = await asyncio.wait_for(user.verify_step(step), self.step_timeout or None)
+        except asyncio.TimeoutError:
+            record.update(status=FAILED, error=f"Timed out after {self.step_timeout} s")
+        except Exception as e:
+            record.update(status=FAILED, error=str(e) or type(e).__name__)
+        else:
+            if outcome.get("success"):
+                record.update(status=COMPLETED, result=outcome.get("result"))
+                self.cache.put(str(user.id), step, record["result"])
+            else:
+                record.update(status=FAILED, result=outcome.get("result"), error=outcome.get("error") or "Step reported failure")
+        record["duration_ms"] = (time.perf_counter() - step_started) * 1000
+        return record
+
+    async def run(self, user, steps: Optional[Sequence[str]] = None, refresh: bool = False) -> Dict[str, Any]:
+        """Run the requested steps (default: all) for a user; returns the combined report"""
+        plan = self.plan(steps)
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+        # Tasks only start running at the next await, so every dependency's task exists by then
+        for step in plan:
+            tasks[step] = asyncio.create_task(self._run_step(user, step, tasks, started, refresh))
+        try:
+            records = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        report = dict(zip(plan, records))
+        statuses = [record["status"] for record in records]
+        return {
+            "user_id": str(user.id),
+            "success": all(status == COMPLETED for status in statuses),
+            "completed": statuses.count(COMPLETED),
+            "failed": statuses.count(FAILED),
+            "skipped": statuses.count(SKIPPED),
+            "steps": report,
+            "total_ms": (time.perf_counter() - started) * 1000,
+            # What running the executed steps one after another would have cost
+            "sequential_ms": sum(record["duration_ms"] for record in records)
+        }
+
+
+verification_orchestrator = VerificationOrchestrator()
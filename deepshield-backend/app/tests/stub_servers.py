@@ -0,0 +1,263 @@
+"""
+Local stub servers for external APIs, plus in-process stand-ins for MongoDB
+collections and uploaded files, used in tests and benchmarks
+"""
+from typing import Dict, Any, List, Optional
+import asyncio
+import hashlib
+import io
+import re
+from aiohttp import web
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+
+def make_upload(data: bytes, filename: str = "photo.jpg", content_type: str = "image/jpeg", size=None) -> UploadFile:
+    """An UploadFile as FastAPI hands it to an endpoint"""
+    return UploadFile(
+        file=io.BytesIO(data),
+        filename=filename,
+        size=size,
+        headers=Headers({"content-type": content_type})
+    )
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Whether a document satisfies a query of equality, $in and $gte conditions"""
+    for field, condition in query.items():
+        value = document.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$gte" and (value is None or value < operand):
+                return False
+    return True
+
+
+class StubCollection:
+    """Collection that records inserted documents"""
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+    async def distinct(self, key, query=None):
+        values = []
+        for document in self.documents:
+            if matches(document, query or {}) and document.get(key) not in values:
+                values.append(document.get(key))
+        return values
+
+
+class StubDatabase:
+    """Database with the media_analysis collection InstagramAPI writes to"""
+    def __init__(self):
+        self.media_analysis = StubCollection()
+
+
+class TranslationStubServer:
+    """Minimal Google Translate v2 lookalike served on localhost.
+
+    Translations are the uppercased input so results are easy to assert on.
+    `fail_next` makes the next N requests return 503 to exercise retries and
+    `peers` collects client sockets so tests can check connection reuse.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.fail_next = 0
+        self.requests: List[Dict[str, Any]] = []
+        self.peers = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def _translate(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        self.requests.append({"path": request.path, "form": form})
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            return web.json_response({"error": "unavailable"}, status=503)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({
+            "data": {
+                "translations": [
+                    {"translatedText": text.upper(), "detectedSourceLanguage": form.get("source", "xx")}
+                    for text in form.getall("q")
+                ]
+            }
+        })
+
+    async def _detect(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        self.requests.append({"path": request.path, "form": form})
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({
+            "data": {
+                "detections": [[{"language": "en", "confidence": 0.99}] for _ in form.getall("q")]
+            }
+        })
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/v2", self._translate)
+        app.router.add_post("/v2/detect", self._detect)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v2"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class GraphAPIStubServer:
+    """Minimal Instagram Graph API lookalike served on localhost.
+
+    Any node id resolves to a profile/media object derived from the id;
+    `/{id}/insights` and `/ig_hashtag_search` return canned data. Entries in
+    `media` override the media object of an id and `files` are served from
+    `/files/{name}` (e.g. as media_url targets); `account_media` lists the
+    media ids paged through by `/{id}/media`. `timelines` maps usernames to
+the object returned for a `business_discovery.username(...)` field
+(unknown usernames get a Graph API error). `fail_next` answers the next
+    N requests with `fail_status` and, when `retry_after` is set, a
+    Retry-After header. `headers` (e.g. X-App-Usage) are added to every
+    response. Successful responses carry an ETag and a matching
+    If-None-Match is answered with 304.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.fail_next = 0
+        self.fail_status = 429
+        self.retry_after: Optional[str] = None
+        self.media: Dict[str, Dict[str, Any]] = {}
+        self.files: Dict[str, bytes] = {}
+        self.account_media: Dict[str, List[str]] = {}
+        self.timelines: Dict[str, Dict[str, Any]] = {}
+        self.headers: Dict[str, str] = {}
+        self.etags = True
+        self.requests: List[Dict[str, Any]] = []
+        self.peers = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+        self.root_url = ""
+
+    async def _record(self, request: web.Request) -> Optional[web.Response]:
+        """Log the request; returns the injected failure response, if any"""
+        self.requests.append({
+            "path": request.path,
+            "query": dict(request.query),
+            "if_none_match": request.headers.get("If-None-Match")
+        })
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            headers = {"Retry-After": self.retry_after} if self.retry_after is not None else None
+            return web.json_response({"error": {"message": "Application request limit reached"}}, status=self.fail_status, headers=headers)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return None
+
+    async def _node(self, request: web.Request) -> web.Response:
+        failure = await self._record(request)
+        if failure is not None:
+            return failure
+        node_id = request.match_info["node_id"]
+        discovery = re.match(r"business_discovery\.username\(([^)]*)\)", request.query.get("fields", ""))
+        if discovery:
+            timeline = self.timelines.get(discovery.group(1))
+            if timeline is None:
+                return web.json_response({"error": {"message": "Invalid user id", "code": 110}}, status=400)
+            return web.json_response({"id": node_id, "business_discovery": timeline})
+        if node_id in self.media:
+            return web.json_response({"id": node_id, **self.media[node_id]})
+        return web.json_response({
+            "id": node_id,
+            "username": f"user_{node_id}",
+            "media_count": 42,
+            "followers_count": 1000,
+            "media_type": "IMAGE",
+            "media_url": f"{self.root_url}/files/{node_id}.jpg",
+            "caption": f"caption {node_id}"
+        })
+
+    async def _insights(self, request: web.Request) -> web.Response:
+        failure = await self._record(request)
+        if failure is not None:
+            return failure
+        metrics = request.query.get("metric", "").split(",")
+        return web.json_response({
+            "data": [{"name": metric, "period": "lifetime", "values": [{"value": 10}]} for metric in metrics if metric]
+        })
+
+    async def _account_media(self, request: web.Request) -> web.Response:
+        failure = await self._record(request)
+        if failure is not None:
+            return failure
+        media_ids = self.account_media.get(request.match_info["node_id"], [])
+        start = int(request.query.get("after", 0))
+        end = start + int(request.query.get("limit", 25))
+        page = {"data": [{"id": media_id} for media_id in media_ids[start:end]], "paging": {"cursors": {"after": str(end)}}}
+        if end < len(media_ids):
+            page["paging"]["next"] = f"{self.base_url}{request.path}?after={end}"
+        return web.json_response(page)
+
+    async def _hashtag_search(self, request: web.Request) -> web.Response:
+        failure = await self._record(request)
+        if failure is not None:
+            return failure
+        return web.json_response({"data": [{"id": f"tag_{request.query.get('q', '')}"}]})
+
+    async def _file(self, request: web.Request) -> web.Response:
+        failure = await self._record(request)
+        if failure is not None:
+            return failure
+        body = self.files.get(request.match_info["name"])
+        if body is None:
+            return web.Response(status=404)
+        return web.Response(body=body, content_type="application/octet-stream")
+
+    @web.middleware
+    async def _add_headers(self, request: web.Request, handler) -> web.Response:
+        response = await handler(request)
+        if self.etags and response.status == 200 and isinstance(response.body, bytes):
+            etag = '"' + hashlib.sha1(response.body).hexdigest()[:16] + '"'
+            if request.headers.get("If-None-Match") == etag:
+                response = web.Response(status=304)
+            response.headers["ETag"] = etag
+        response.headers.update(self.headers)
+        return response
+
+    async def start(self) -> str:
+        app = web.Application(middlewares=[self._add_headers])
+        app.router.add_get("/files/{name}", self._file)
+        app.router.add_get("/v12.0/ig_hashtag_search", self._hashtag_search)
+        app.router.add_get("/v12.0/{node_id}/insights", self._insights)
+        app.router.add_get("/v12.0/{node_id}/media", self._account_media)
+        app.router.add_get("/v12.0/{node_id}", self._node)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.root_url = f"http://127.0.0.1:{port}"
+        self.base_url = f"{self.root_url}/v12.0"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,169 @@
+"""
+Tests for the vectorized account-behavior features and InstagramAPI account analysis
+"""
+import numpy as np
+import pytest
+from ..services.ai import account_features
+from ..services.ai.account_features import TimelineBatch, compute_features, score_features, analyze_timelines
+from ..services.api import instagram as instagram_module
+from ..services.api.http_client import PooledHTTPClient
+from ..services.api.instagram import InstagramAPI
+from ..services.api.graph_cache import GraphResponseCache
+from ..services.api.graph_rate_limiter import GraphRateLimiter
+from .stub_servers import GraphAPIStubServer
+
+NOW = 1_700_000_000.0
+DAY = 86400.0
+
+
+def clockwork_timeline(posts=40, followers=5000):
+    """A bot posting every 6 hours on the dot with no engagement"""
+    return {
+        "followers": followers,
+        "media": [{"timestamp": NOW - i * 6 * 3600, "like_count": 0, "comments_count": 0} for i in range(posts)]
+    }
+
+
+def organic_timeline(seed, posts=40, followers=5000):
+    rng = np.random.default_rng(seed)
+    times = NOW - np.cumsum(rng.exponential(1.5 * DAY, posts)) - 200 * DAY
+    return {
+        "followers": followers,
+        "media": [
+            {"timestamp": float(t), "like_count": int(rng.poisson(250)), "comments_count": int(rng.poisson(12))}
+            for t in times
+        ]
+    }
+
+
+def test_clockwork_account_is_flagged():
+    bot, organic = analyze_timelines([clockwork_timeline(), organic_timeline(1)], now=NOW)
+    assert bot["interval_entropy"] == 0.0
+    assert "clockwork_posting" in bot["behavioral_flags"]
+    assert "low_engagement" in bot["behavioral_flags"]
+    assert bot["is_suspicious"]
+    assert bot["post_frequency"] == "multiple_daily"
+
+    assert organic["interval_entropy"] > 0.5
+    assert organic["behavioral_flags"] == []
+    assert not organic["is_suspicious"]
+    assert organic["risk_score"] == 0.0
+
+
+def test_batch_matches_single_account_features():
+    timelines = [organic_timeline(seed, posts=seed % 7 * 5) for seed in range(12)] + [clockwork_timeline()]
+    batch = compute_features(TimelineBatch.from_timelines(timelines), now=NOW)
+    for i, timeline in enumerate(timelines):
+        single = compute_features(TimelineBatch.from_timelines([timeline]), now=NOW)
+        for name, column in batch.items():
+            np.testing.assert_allclose(column[i], single[name][0], equal_nan=True, err_msg=name)
+
+
+def test_engagement_quantiles_and_cadence():
+    timeline = organic_timeline(3, posts=21, followers=1000)
+    features = compute_features(TimelineBatch.from_timelines([timeline]), now=NOW)
+    rates = np.array([(m["like_count"] + m["comments_count"]) / 1000 for m in timeline["media"]])
+    assert features["engagement_rate_median"][0] == pytest.approx(np.median(rates))
+    assert features["engagement_rate_p90"][0] == pytest.approx(np.quantile(rates, 0.9, method="lower"))
+    assert features["engagement_rate_mean"][0] == pytest.approx(rates.mean())
+
+    times = np.sort([m["timestamp"] for m in timeline["media"]])
+    assert features["interval_mean_hours"][0] == pytest.approx(np.diff(times).mean() / 3600)
+    assert features["account_age_days"][0] == pytest.approx((NOW - times[0]) / DAY)
+
+
+def test_follower_growth_slope():
+    steady = {"followers": 2000, "media": [], "follower_history": [(NOW + d * DAY, 1000 + 50 * d) for d in range(10)]}
+    bought = {"followers": 9000, "media": [], "follower_history": [(NOW, 1000), (NOW + DAY, 9000)]}
+    unknown = {"followers": 500, "media": [], "follower_history": [(NOW, 500)]}
+    features = compute_features(TimelineBatch.from_timelines([steady, bought, unknown]), now=NOW)
+    assert features["follower_growth_slope"][0] == pytest.approx(50.0)
+    assert features["follower_growth_slope"][1] == pytest.approx(8000.0)
+    assert np.isnan(features["follower_growth_slope"][2])
+    flags = score_features(features)["flags"]
+    spike = [name for name, _ in account_features.FLAG_WEIGHTS].index("follower_spike")
+    assert not flags[0, spike] and flags[1, spike] and not flags[2, spike]
+
+
+def test_new_account_needs_the_whole_timeline():
+    # Active for years, but the fetched page only reaches back 10 days
+    active = {**clockwork_timeline(posts=40), "media_complete": False}
+    young = clockwork_timeline(posts=40)
+    seen_long_ago = {**clockwork_timeline(posts=40), "follower_history": [(NOW - 400 * DAY, 10), (NOW, 5000)]}
+    features = compute_features(TimelineBatch.from_timelines([active, young, seen_long_ago]), now=NOW)
+    assert features["account_age_days"][0] == pytest.approx(39 * 0.25)
+    assert features["account_age_days"][2] == pytest.approx(400.0)
+    new_account = [name for name, _ in account_features.FLAG_WEIGHTS].index("new_account")
+    assert score_features(features)["flags"][:, new_account].tolist() == [False, True, False]
+
+
+def test_empty_accounts_and_batches():
+    report, = analyze_timelines([{"followers": 10, "media": []}], now=NOW)
+    assert report["post_count"] == 0
+    assert report["behavioral_flags"] == ["no_posts"]
+    assert report["post_frequency"] == "none"
+    assert report["interval_entropy"] is None
+    assert analyze_timelines([], now=NOW) == []
+
+
+def graph_timeline(timeline):
+    """A timeline in business discovery's response shape"""
+    return {
+        "followers_count": timeline["followers"],
+        "media": {"data": [
+            {**media, "timestamp": f"{np.datetime64(int(media['timestamp']), 's')}+0000"} for media in timeline["media"]
+        ]}
+    }
+
+
+@pytest.fixture
+async def graph_server():
+    server = GraphAPIStubServer()
+    server.timelines = {"bot": graph_timeline(clockwork_timeline()), "person": graph_timeline(organic_timeline(2))}
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def instagram_api(graph_server, monkeypatch):
+    async def no_database():
+        return None
+
+    monkeypatch.setattr(instagram_module, "get_database", no_database)
+    client = PooledHTTPClient(max_retries=0)
+    api = InstagramAPI(http_client=client, rate_limiter=GraphRateLimiter(calls_per_hour=36000, burst=100),
+                       cache=GraphResponseCache())
+    api.base_url = graph_server.base_url
+    yield api
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_analyze_accounts_in_one_batch(instagram_api, graph_server):
+    bot, person, missing = await instagram_api.analyze_accounts(["bot", "person", "nobody"])
+    assert bot["is_suspicious"] and bot["error"] is None
+    assert not person["is_suspicious"] and person["post_count"] == 40
+    assert missing["error"] and "is_suspicious" not in missing
+    assert "business_discovery.username(bot)" in graph_server.requests[0]["query"]["fields"]
+    assert bot["timeline_complete"]
+
+    # A next page means older posts exist, so the account is not judged new
+    graph_server.timelines["bot"]["media"]["paging"] = {"next": f"{graph_server.base_url}/next"}
+    instagram_api.cache = GraphResponseCache()
+    truncated, = await instagram_api.analyze_accounts(["bot"])
+    assert not truncated["timeline_complete"]
+
+
+@pytest.mark.asyncio
+async def test_behavior_and_metadata_share_one_lookup(instagram_api, graph_server):
+    behavior = await instagram_api.analyze_account_behavior("person")
+    metadata = await instagram_api.analyze_account_metadata("person")
+    assert len(graph_server.requests) == 1
+    assert behavior["is_suspicious"] is False
+    assert behavior["engagement_rate"] == pytest.approx(metadata["engagement_metrics"]["engagement_rate"])
+    assert metadata["account_age"] > 200
+    assert metadata["follower_growth_rate"] is None  # a single follower snapshot
+
+    failed = await instagram_api.analyze_account_behavior("nobody")
+    assert failed["error"] and failed["is_suspicious"] is None and failed["behavioral_flags"] == []
@@ -0,0 +1,74 @@
+"""
+Tests for content-addressed upload storage
+"""
+import hashlib
+import os
+import pytest
+from ..services.storage import BlobStore, InMemoryBlobIndex
+from .stub_servers import make_upload
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(root=str(tmp_path / "blobs"), index=InMemoryBlobIndex())
+
+def blob_files(store):
+    return [
+        os.path.join(dirpath, name)
+        for dirpath, _, names in os.walk(store.root)
+        if os.path.abspath(dirpath) != os.path.abspath(store.tmp_dir)
+        for name in names
+    ]
+
+@pytest.mark.asyncio
+async def test_path_is_sharded_by_digest(store):
+    data = b"image bytes"
+    sha256 = hashlib.sha256(data).hexdigest()
+    stored = await store.put(make_upload(data))
+    assert stored.sha256 == sha256
+    assert stored.path == os.path.join(store.root, sha256[:2], sha256[2:4], f"{sha256}.jpg")
+    with open(stored.path, "rb") as f:
+        assert f.read() == data
+
+@pytest.mark.asyncio
+async def test_duplicates_share_one_blob(store):
+    first = await store.put(make_upload(b"same", "a.jpg"))
+    second = await store.put(make_upload(b"same", "b.png"))
+    assert first.path == second.path
+    assert len(blob_files(store)) == 1
+    assert os.listdir(store.tmp_dir) == []
+    assert (await store.index.get(first.sha256))["refcount"] == 2
+    assert store.stats()["duplicates"] == 1
+
+@pytest.mark.asyncio
+async def test_gc_removes_only_unreferenced_blobs(store):
+    kept = await store.put(make_upload(b"kept"))
+    dropped = await store.put(make_upload(b"dropped"))
+    await store.release(dropped.sha256)
+
+    result = await store.collect_garbage(grace_seconds=0)
+    assert result["blobs_removed"] == 1
+    assert os.path.exists(kept.path)
+    assert not os.path.exists(dropped.path)
+    assert await store.index.get(dropped.sha256) is None
+
+@pytest.mark.asyncio
+async def test_gc_respects_grace_period(store):
+    stored = await store.put(make_upload(b"recent"))
+    await store.release(stored.sha256)
+    result = await store.collect_garbage(grace_seconds=3600)
+    assert result["blobs_removed"] == 0
+    assert os.path.exists(stored.path)
+
+@pytest.mark.asyncio
+async def test_reupload_after_gc_restores_blob(store):
+    stored = await store.put(make_upload(b"again"))
+    await store.release(stored.sha256)
+    await store.collect_garbage(grace_seconds=0)
+    restored = await store.put(make_upload(b"again"))
+    assert os.path.exists(restored.path)
+
+@pytest.mark.asyncio
+async def test_release_of_unknown_blob_is_ignored(store):
+    await store.release("0" * 64)
+    assert await store.index.get("0" * 64) is None
+    assert not await store.add_ref("0" * 64)
@@ -0,0 +1,65 @@
+"""
+Tests for precomputed calibration artifacts
+"""
+import json
+import pytest
+from ..services.ai.calibration import (
+    CALIBRATION_VERSION,
+    DEFAULT_CALIBRATION,
+    best_threshold,
+    load_calibration,
+    save_calibration,
+    score_statistics,
+)
+from ..services.ai.deepfake_detection import DeepfakeDetector
+from ..services.ai.face_verification import FaceVerifier
+
+def test_best_threshold_separates_classes():
+    threshold = best_threshold([0.8, 0.9, 0.95], [0.1, 0.2, 0.4])
+    assert 0.4 < threshold < 0.8
+
+def test_best_threshold_with_overlap():
+    threshold = best_threshold([0.5, 0.7, 0.9, 0.3], [0.1, 0.2, 0.6])
+    assert 0.2 < threshold < 0.7
+
+def test_score_statistics():
+    stats = score_statistics([0.2, 0.4, 0.6])
+    assert stats["mean"] == pytest.approx(0.4)
+    assert stats["std"] > 0
+    assert score_statistics([0.5, 0.5])["std"] > 0
+
+def test_missing_artifact_uses_defaults(tmp_path):
+    assert load_calibration(str(tmp_path / "missing.json")) == DEFAULT_CALIBRATION
+
+def test_artifact_round_trip(tmp_path):
+    path = str(tmp_path / "calibration.json")
+    calibration = load_calibration(path)
+    calibration["deepfake"]["threshold"] = 0.62
+    calibration["face_verification"]["similarity_threshold"] = 0.55
+    save_calibration(calibration, path)
+
+    loaded = load_calibration(path)
+    assert loaded["version"] == CALIBRATION_VERSION
+    assert loaded["deepfake"]["threshold"] == 0.62
+    assert loaded["face_verification"]["similarity_threshold"] == 0.55
+    assert loaded["created_at"]
+
+def test_version_mismatch_is_ignored(tmp_path):
+    path = tmp_path / "calibration.json"
+    path.write_text(json.dumps({"version": CALIBRATION_VERSION + 1, "deepfake": {"threshold": 0.1}}))
+    assert load_calibration(str(path))["deepfake"]["threshold"] == DEFAULT_CALIBRATION["deepfake"]["threshold"]
+
+def test_services_load_artifact(tmp_path):
+    path = str(tmp_path / "calibration.json")
+    save_calibration({
+        "deepfake": {"mean_manipulation_score": 0.4, "std_manipulation_score": 0.1, "threshold": 0.65},
+        "face_verification": {"similarity_threshold": 0.6, "confidence_threshold": 0.8}
+    }, path)
+
+    detector = DeepfakeDetector(test_mode=True, calibration_path=path)
+    assert detector.threshold == 0.65
+    assert detector.ff_stats == {"mean_manipulation_score": 0.4, "std_manipulation_score": 0.1}
+
+    verifier = FaceVerifier(test_mode=True, calibration_path=path)
+    assert verifier.similarity_threshold == 0.6
+    assert verifier.confidence_threshold == 0.8
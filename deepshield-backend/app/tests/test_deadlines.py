@@ -0,0 +1,74 @@
+"""
+Tests for request deadlines and truncated video analysis
+"""
+import time
+import cv2
+import numpy as np
+import pytest
+from ..services.ai.deadline import Deadline
+from ..services.ai.deepfake_detection import DeepfakeDetector
+from ..config import settings
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 32))
+    for i in range(40):
+        writer.write(np.full((32, 32, 3), i, dtype=np.uint8))
+    writer.release()
+    return path
+
+@pytest.fixture
+def detector():
+    detector = DeepfakeDetector()
+
+    def slow_score(image):
+        time.sleep(0.02)
+        return 0.9
+
+    detector._score_image = slow_score
+    return detector
+
+def test_deadline_from_header(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_DEADLINE_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "ANALYSIS_MAX_DEADLINE_SECONDS", 60.0)
+    assert 29 < Deadline.from_header(None).remaining() <= 30
+    assert 4 < Deadline.from_header("5").remaining() <= 5
+    assert 59 < Deadline.from_header("3600").remaining() <= 60
+    assert 29 < Deadline.from_header("soon").remaining() <= 30
+    monkeypatch.setattr(settings, "ANALYSIS_DEADLINE_SECONDS", 0.0)
+    assert Deadline.from_header(None).remaining() is None
+
+def test_deadline_expiry_and_cancel():
+    deadline = Deadline(0)
+    assert deadline.expired() and deadline.reason() == "deadline"
+    deadline = Deadline()
+    assert not deadline.expired() and deadline.reason() is None
+    deadline.cancel()
+    assert deadline.reason() == "cancelled"
+
+@pytest.mark.asyncio
+async def test_video_analysis_runs_to_completion(detector, video_path):
+    result = await detector.analyze_video(video_path, deadline=Deadline(30))
+    assert result["error"] is None
+    assert not result["truncated"]
+    assert result["frames_analyzed"] == 40
+    assert [frame["frame"] for frame in result["frame_analysis"]] == list(range(0, 40, 5))
+
+@pytest.mark.asyncio
+async def test_video_analysis_returns_partial_results_at_deadline(detector, video_path):
+    result = await detector.analyze_video(video_path, deadline=Deadline(0.05))
+    assert result["truncated"]
+    assert result["truncation_reason"] == "deadline"
+    assert 0 < len(result["frame_analysis"]) < 8
+    assert result["frames_analyzed"] < 40
+    assert result["is_deepfake"]
+
+@pytest.mark.asyncio
+async def test_cancelled_video_analysis_stops_immediately(detector, video_path):
+    deadline = Deadline()
+    deadline.cancel()
+    result = await detector.analyze_video(video_path, deadline=deadline)
+    assert result["truncated"]
+    assert result["truncation_reason"] == "cancelled"
+    assert result["frame_analysis"] == []
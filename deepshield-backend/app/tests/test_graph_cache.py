@@ -0,0 +1,103 @@
+"""
+Tests for the Graph API response cache (TTL, ETag revalidation, in-flight dedup)
+"""
+import asyncio
+import pytest
+from ..services.api.graph_cache import GraphResponseCache
+from ..services.api.graph_rate_limiter import GraphRateLimiter
+from ..services.api.http_client import PooledHTTPClient, HTTPResponse
+from ..services.api.instagram import InstagramAPI
+from .stub_servers import GraphAPIStubServer
+
+@pytest.fixture
+async def graph_server():
+    server = GraphAPIStubServer(latency=0.05)
+    await server.start()
+    yield server
+    await server.stop()
+
+@pytest.fixture
+async def make_api(graph_server):
+    clients = []
+
+    def make(ttls=None):
+        client = PooledHTTPClient(max_retries=0)
+        clients.append(client)
+        api = InstagramAPI(
+            http_client=client,
+            rate_limiter=GraphRateLimiter(calls_per_hour=36000, burst=100),
+            cache=GraphResponseCache(ttls=ttls if ttls is not None else {"profile": 60, "insights": 60})
+        )
+        api.base_url = graph_server.base_url
+        return api
+
+    yield make
+    for client in clients:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_repeated_lookups_hit_the_cache(make_api, graph_server):
+    api = make_api()
+    first = await api.verify_profile("a")
+    second = await api.verify_profile("b")
+    assert first == second and first["verified"]
+    await api.get_media_insights("m1")
+    await api.get_media_insights("m1")
+    await api.get_media_insights("m2")
+    assert len(graph_server.requests) == 3
+    assert api.cache.stats()["hits"] == 2
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_request(make_api, graph_server):
+    api = make_api()
+    results = await asyncio.gather(*(api.get_media_insights("m1") for _ in range(20)))
+    assert all(result["success"] for result in results)
+    assert len(graph_server.requests) == 1
+    assert api.cache.stats()["coalesced"] == 19
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_revalidated_with_etag(make_api, graph_server):
+    api = make_api(ttls={"insights": 0.01})
+    first = await api.get_media_insights("m1")
+    await asyncio.sleep(0.02)
+    second = await api.get_media_insights("m1")
+    assert second == first
+    assert graph_server.requests[1]["if_none_match"]
+    assert api.cache.stats()["revalidated"] == 1
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached(make_api, graph_server):
+    api = make_api()
+    graph_server.fail_next = 1
+    graph_server.fail_status = 500
+    assert not (await api.get_media_insights("m1"))["success"]
+    assert (await api.get_media_insights("m1"))["success"]
+    assert len(graph_server.requests) == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_fetch_hands_over_to_waiters():
+    cache = GraphResponseCache(ttls={"profile": 60})
+    calls = []
+
+    async def fetch(etag):
+        calls.append(etag)
+        await asyncio.sleep(0.05)
+        return HTTPResponse(200, {}, b'{"id": "1"}', "http://graph.test/1")
+
+    owner = asyncio.create_task(cache.get("profile", ("profile", "1"), fetch))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get("profile", ("profile", "1"), fetch))
+    await asyncio.sleep(0.01)
+    owner.cancel()
+    response = await waiter
+    assert response.json() == {"id": "1"}
+    assert len(calls) == 2
+
+def test_lru_eviction_and_key():
+    cache = GraphResponseCache(ttls={"profile": 60}, max_entries=2)
+    for i in range(3):
+        cache._store(("profile", str(i)), HTTPResponse(200, {}, b"{}", "u"), 60)
+    assert list(cache._entries) == [("profile", "1"), ("profile", "2")]
+    assert cache.evictions == 1
+    key = GraphResponseCache.make_key("profile", "u", {"fields": "id", "access_token": "secret"})
+    assert key == ("profile", "u", "fields=id")
@@ -0,0 +1,94 @@
+"""
+Tests for Graph API call pacing and prioritization
+"""
+import asyncio
+import json
+import pytest
+from ..services.api.graph_rate_limiter import GraphRateLimiter, parse_usage, URGENT, NORMAL, BULK
+from ..services.api.http_client import HTTPResponse, PooledHTTPClient
+from ..services.api.instagram import InstagramAPI
+from ..services.api.graph_cache import GraphResponseCache
+from .stub_servers import GraphAPIStubServer
+
+def response(status=200, headers=None, body=b"{}"):
+    return HTTPResponse(status, headers or {}, body, "http://graph.test")
+
+@pytest.mark.asyncio
+async def test_burst_then_paced():
+    limiter = GraphRateLimiter(calls_per_hour=3600 * 50, burst=3, cooldown=1)
+    start = asyncio.get_running_loop().time()
+    for _ in range(6):
+        await limiter.acquire(NORMAL)
+    elapsed = asyncio.get_running_loop().time() - start
+    # three calls from the burst, three more at 50/s
+    assert 0.04 <= elapsed < 0.5
+    assert limiter.granted[NORMAL] == 6
+
+@pytest.mark.asyncio
+async def test_urgent_calls_go_first():
+    limiter = GraphRateLimiter(calls_per_hour=3600 * 20, burst=1, cooldown=1)
+    await limiter.acquire(NORMAL)  # drain the bucket
+    order = []
+
+    async def call(priority, name):
+        await limiter.acquire(priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(call(BULK, "insights")), asyncio.create_task(call(BULK, "search"))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call(URGENT, "webhook")))
+    await asyncio.sleep(0)
+    assert limiter.stats()["waiting"] == {URGENT: 1, NORMAL: 0, BULK: 2}
+    await asyncio.gather(*tasks)
+    assert order == ["webhook", "insights", "search"]
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_consume_a_token():
+    limiter = GraphRateLimiter(calls_per_hour=3600 * 20, burst=1, cooldown=1)
+    await limiter.acquire(NORMAL)
+    waiting = asyncio.create_task(limiter.acquire(BULK))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    await asyncio.wait_for(limiter.acquire(URGENT), 1)
+    assert limiter.granted == {URGENT: 1, NORMAL: 1, BULK: 0}
+
+def test_usage_headers_slow_and_block():
+    limiter = GraphRateLimiter(calls_per_hour=3600, burst=10, slowdown_percent=80, cooldown=30)
+    limiter.observe(response(headers={"X-App-Usage": json.dumps({"call_count": 90, "total_cputime": 10, "total_time": 20})}))
+    assert limiter.usage_percent == 90
+    assert limiter.rate() == pytest.approx(0.5)
+    assert limiter.stats()["remaining_budget_percent"] == 10
+    assert limiter.stats()["blocked_seconds"] == 0
+
+    business = {"123": [{"type": "instagram", "call_count": 100, "total_cputime": 5, "total_time": 5,
+                         "estimated_time_to_regain_access": 2}]}
+    limiter.observe(response(status=403, headers={"X-Business-Use-Case-Usage": json.dumps(business)}))
+    assert limiter.throttled == 1
+    assert 100 < limiter.stats()["blocked_seconds"] <= 120
+
+def test_throttle_error_without_headers_uses_retry_after_or_cooldown():
+    limiter = GraphRateLimiter(calls_per_hour=3600, burst=10, cooldown=30)
+    limiter.observe(response(status=400, body=json.dumps({"error": {"code": 4}}).encode()))
+    assert 25 < limiter.stats()["blocked_seconds"] <= 30
+    assert parse_usage(response(headers={"X-App-Usage": "not json"})) == (None, None)
+
+@pytest.mark.asyncio
+async def test_instagram_api_reports_usage_from_responses():
+    server = GraphAPIStubServer()
+    await server.start()
+    server.headers = {"X-App-Usage": json.dumps({"call_count": 42, "total_cputime": 1, "total_time": 1})}
+    client = PooledHTTPClient(max_retries=0)
+    limiter = GraphRateLimiter(calls_per_hour=36000, burst=5)
+    api = InstagramAPI(http_client=client, rate_limiter=limiter, cache=GraphResponseCache())
+    api.base_url = server.base_url
+    try:
+        assert (await api.get_media_insights("m1"))["success"]
+        assert (await api.verify_profile("someone"))["verified"]
+    finally:
+        await client.close()
+        await server.stop()
+    stats = limiter.stats()
+    assert stats["usage_percent"] == 42
+    assert stats["granted"] == {URGENT: 0, NORMAL: 1, BULK: 1}
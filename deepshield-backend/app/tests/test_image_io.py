@@ -0,0 +1,58 @@
+"""
+Tests for in-memory image decoding and byte-based analysis
+"""
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from fastapi import HTTPException, UploadFile
+from ..services.ai.image_io import load_image, to_bgr_array
+from ..services.ai.face_verification import FaceVerifier
+from ..services.ai.content_moderation import ContentModerator
+from ..services.storage import read_upload
+
+def png_bytes(color=(255, 0, 0), size=(8, 8), mode="RGB") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_load_image_from_bytes():
+    image = load_image(png_bytes())
+    assert image.mode == "RGB"
+    assert image.size == (8, 8)
+    assert image.getpixel((0, 0)) == (255, 0, 0)
+
+def test_load_image_from_file_like_and_path(tmp_path):
+    data = png_bytes(color=(0, 255, 0))
+    path = tmp_path / "image.png"
+    path.write_bytes(data)
+    assert load_image(io.BytesIO(data)).getpixel((0, 0)) == (0, 255, 0)
+    assert load_image(str(path)).getpixel((0, 0)) == (0, 255, 0)
+
+def test_load_image_converts_modes():
+    assert load_image(png_bytes(color=128, mode="L")).mode == "RGB"
+    assert load_image(np.zeros((4, 6), dtype=np.uint8)).size == (6, 4)
+    assert load_image(Image.new("RGBA", (2, 2))).mode == "RGB"
+
+def test_to_bgr_array():
+    array = to_bgr_array(png_bytes(color=(255, 0, 0)))
+    assert array.shape == (8, 8, 3)
+    assert tuple(array[0, 0]) == (0, 0, 255)
+    assert to_bgr_array("photo.jpg") == "photo.jpg"
+
+@pytest.mark.asyncio
+async def test_read_upload_limits_size():
+    data = png_bytes()
+    assert await read_upload(UploadFile(file=io.BytesIO(data), filename="a.png"), chunk_size=16) == data
+    with pytest.raises(HTTPException) as exc:
+        await read_upload(UploadFile(file=io.BytesIO(data), filename="a.png"), max_size=len(data) - 1, chunk_size=16)
+    assert exc.value.status_code == 413
+
+@pytest.mark.asyncio
+async def test_services_accept_bytes():
+    data = png_bytes()
+    verifier = FaceVerifier(test_mode=True)
+    assert (await verifier.verify_face(data, data))["verified"]
+    assert (await verifier.extract_face_data(data))["success"]
+    moderation = await ContentModerator(test_mode=True).analyze_image(data)
+    assert moderation["error"] is None
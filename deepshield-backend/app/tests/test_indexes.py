@@ -0,0 +1,167 @@
+"""
+Tests for startup index management and the unindexed-query checks
+"""
+import os
+from datetime import datetime
+import pytest
+from pymongo.errors import OperationFailure
+from ..db.indexes import declared_indexes, ensure_indexes, unindexed_query_shapes, supporting_index, query_shape
+
+# Query shapes the app issues: (collection, filter fields, sort fields)
+APP_QUERY_SHAPES = [
+    ("users", ("email",), ()),  # register_user, login
+    ("users", ("username",), ()),  # register_user
+    ("users", (), ("created_at",)),  # admin user list
+    ("content", ("user_id",), ("created_at",)),  # get_user_content
+    ("content_flags", ("status",), ()),  # admin stats
+    ("content_flags", ("status",), ("created_at",)),  # admin flag list by status
+    ("content_flags", (), ("created_at",)),  # admin flag list
+    ("media_analysis", ("media_id",), ()),
+    ("jobs", ("queue", "status", "available_at"), ()),  # claims
+    ("blobs", ("refcount", "updated_at"), ()),  # garbage collection
+    ("blobs", ("tier", "last_accessed_at"), ("last_accessed_at",)),  # retention
+    ("instagram_follower_snapshots", ("username",), ("taken_at",)),
+]
+
+
+class FakeCollection:
+    def __init__(self, indexes=None, fail_create=None):
+        self.indexes = {"_id_": {"key": [("_id", 1)], "v": 2}, **(indexes or {})}
+        self.fail_create = fail_create
+        self.created = []
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+    async def create_indexes(self, models):
+        for model in models:
+            document = model.document
+            if document["name"] == self.fail_create:
+                raise OperationFailure("E11000 duplicate key error", code=11000)
+            self.indexes[document["name"]] = {
+                "key": list(document["key"].items()), "v": 2,
+                **{option: value for option, value in document.items() if option not in ("key", "name")}
+            }
+            self.created.append(document["name"])
+
+
+class FakeDatabase:
+    def __init__(self, collections=None):
+        self.collections = collections or {}
+        self.commands = []
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    async def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+        options = kwargs["index"]
+        self.collections[args[1]].indexes[options["name"]]["expireAfterSeconds"] = options["expireAfterSeconds"]
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_is_idempotent():
+    db = FakeDatabase()
+    indexes = declared_indexes({"jobs": 3600, "instagram_follower_snapshots": 0})
+    first = await ensure_indexes(db, indexes)
+    assert first["users"]["created"] == ["email_unique", "username_unique", "created_at"]
+    assert "finished_at_ttl" in first["jobs"]["created"]
+    assert db["users"].indexes["email_unique"]["unique"] is True
+    assert db["jobs"].indexes["finished_at_ttl"]["expireAfterSeconds"] == 3600
+    assert "taken_at_ttl" not in db["instagram_follower_snapshots"].indexes
+
+    second = await ensure_indexes(db, indexes)
+    for collection, result in second.items():
+        assert result["created"] == [] and result["conflicts"] == [] and result["updated"] == []
+        assert len(result["existing"]) == len(indexes[collection])
+    assert db.commands == []
+
+
+@pytest.mark.asyncio
+async def test_ttl_change_and_conflicts():
+    db = FakeDatabase({
+        "jobs": FakeCollection({"finished_at_ttl": {"key": [("finished_at", 1)], "expireAfterSeconds": 60}}),
+        # Same keys as email_unique under another name, but not unique
+        "users": FakeCollection({"email_1": {"key": [("email", 1)]}}, fail_create="username_unique"),
+    })
+    summary = await ensure_indexes(db, declared_indexes({"jobs": 7200}))
+    assert summary["jobs"]["updated"] == ["finished_at_ttl"]
+    assert db["jobs"].indexes["finished_at_ttl"]["expireAfterSeconds"] == 7200
+    assert db.commands[0][0] == ("collMod", "jobs")
+    # Neither problem stops startup; both are reported
+    assert summary["users"]["conflicts"] == ["email_1", "username_unique"]
+    assert summary["content"]["created"] == ["user_id_created_at"]
+
+
+def test_app_queries_have_supporting_indexes():
+    indexes = declared_indexes()
+    unsupported = [shape for shape in APP_QUERY_SHAPES if supporting_index(*shape, indexes=indexes) is None]
+    assert unsupported == []
+    assert supporting_index("content", ("user_id",), ("created_at",), indexes) == "user_id_created_at"
+    assert supporting_index("content", ("moderation_status",), (), indexes) is None
+    assert supporting_index("content", ("user_id",), ("size_bytes",), indexes) is None
+
+
+class ProfileCollection:
+    def __init__(self, entries):
+        self.entries = entries
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query)
+
+        async def iterate():
+            for entry in self.entries:
+                yield entry
+        return iterate()
+
+
+@pytest.mark.asyncio
+async def test_unindexed_query_shapes_from_profiler():
+    profile = ProfileCollection([
+        {"ns": "deepshield.content", "op": "query", "planSummary": "COLLSCAN",
+         "command": {"find": "content", "filter": {"moderation_status": "flagged"}, "sort": {"created_at": -1}}},
+        {"ns": "deepshield.content", "op": "query", "planSummary": "COLLSCAN",
+         "command": {"find": "content", "filter": {"moderation_status": "pending"}, "sort": {"created_at": -1}}},
+        {"ns": "deepshield.users", "op": "command", "planSummary": "COLLSCAN",
+         "command": {"count": "users", "query": {}}},
+        {"ns": "deepshield.jobs", "op": "command", "planSummary": "COLLSCAN",
+         "command": {"aggregate": "jobs", "pipeline": [{"$match": {"queue": "analysis", "status": {"$in": ["a"]}}}]}},
+        {"ns": "deepshield.system.js", "op": "query", "planSummary": "COLLSCAN", "command": {"filter": {"x": 1}}},
+    ])
+    db = FakeDatabase()
+    db.collections["system.profile"] = profile
+    since = datetime(2024, 1, 1)
+    shapes = await unindexed_query_shapes(db, since=since)
+    assert profile.queries[0]["ts"] == {"$gte": since}
+    assert shapes == [
+        {"ns": "deepshield.content", "op": "query", "filter": {"moderation_status": "?"}, "sort": {"created_at": -1}, "count": 2},
+        {"ns": "deepshield.jobs", "op": "command", "filter": {"queue": "?", "status": {"$in": "?"}}, "sort": {}, "count": 1},
+    ]
+    assert query_shape({"$or": [{"email": "a"}, {"username": "b"}]}) == {"$or": [{"email": "?"}, {"username": "?"}]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.environ.get("MONGODB_TEST_URL"), reason="set MONGODB_TEST_URL to run against MongoDB")
+async def test_app_queries_use_indexes_on_mongodb():
+    """Runs the app's hot queries with the profiler on and fails on any collection scan"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ["MONGODB_TEST_URL"])
+    db = client[f"deepshield_index_test_{os.getpid()}"]
+    try:
+        await ensure_indexes(db)
+        for collection in ("users", "content", "content_flags", "media_analysis"):
+            await db[collection].insert_one({"seed": True})
+        await db.command("profile", 2)
+        started = datetime.utcnow()
+        await db.users.find_one({"$or": [{"email": "a@example.com"}, {"username": "a"}]})
+        await db.users.find_one({"email": "a@example.com"})
+        await db.content.find({"user_id": "u1"}).sort("created_at", -1).to_list(100)
+        await db.content_flags.count_documents({"status": "pending"})
+        await db.media_analysis.find_one({"media_id": "m1"})
+        await db.command("profile", 0)
+        assert await unindexed_query_shapes(db, since=started) == []
+    finally:
+        await client.drop_database(db.name)
+        client.close()
@@ -0,0 +1,156 @@
+"""
+Tests for the resumable Instagram account backfill
+"""
+import asyncio
+import os
+import pytest
+from ..services.api import instagram
+from ..services.api.graph_cache import GraphResponseCache
+from ..services.api.graph_rate_limiter import GraphRateLimiter
+from ..services.api.http_client import PooledHTTPClient
+from ..services.api.instagram import InstagramAPI
+from ..services.api.instagram_backfill import InstagramBackfill, InMemoryBackfillCheckpoints
+from ..services.api.media_downloader import MediaDownloader
+from ..services.storage import BlobStore, InMemoryBlobIndex
+from .stub_servers import GraphAPIStubServer, StubDatabase
+
+ACCOUNT = "1784"
+MEDIA = [f"m{i}" for i in range(7)]
+
+class FakeDetector:
+    def __init__(self):
+        self.analyzed = []
+        self.delay = 0.0
+
+    async def analyze_image(self, path, **kwargs):
+        self.analyzed.append(os.path.basename(path))
+        await asyncio.sleep(self.delay)
+        return {"is_deepfake": False, "error": None}
+
+class FakeModerator:
+    async def analyze_image(self, path, **kwargs):
+        return {"is_explicit": False, "error": None}
+
+    async def analyze_text(self, text, **kwargs):
+        return {"is_toxic": False, "error": None}
+
+@pytest.fixture
+async def graph_server():
+    server = GraphAPIStubServer()
+    await server.start()
+    server.account_media[ACCOUNT] = MEDIA
+    for media_id in MEDIA:
+        server.files[f"{media_id}.jpg"] = media_id.encode() * 10
+    yield server
+    await server.stop()
+
+@pytest.fixture
+def database(monkeypatch):
+    database = StubDatabase()
+
+    async def get_database():
+        return database
+    monkeypatch.setattr(instagram, "get_database", get_database)
+    return database
+
+@pytest.fixture
+async def api(graph_server, database, tmp_path):
+    client = PooledHTTPClient(max_retries=0)
+    api = InstagramAPI(
+        http_client=client,
+        rate_limiter=GraphRateLimiter(calls_per_hour=360000, burst=1000),
+        cache=GraphResponseCache(),
+        downloader=MediaDownloader(http_client=client, store=BlobStore(root=str(tmp_path / "blobs"), index=InMemoryBlobIndex()))
+    )
+    api.base_url = graph_server.base_url
+    api.deepfake_detector = FakeDetector()
+    api.content_moderator = FakeModerator()
+    yield api
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_backfill_pages_through_the_media_edge(api, database):
+    checkpoints = InMemoryBackfillCheckpoints()
+    result = await InstagramBackfill(api, checkpoints, page_size=3).run(ACCOUNT)
+    assert result["status"] == "completed"
+    assert result["processed"] == 7 and result["failed"] == 0
+    assert result["items_per_second"] > 0
+    assert [document["media_id"] for document in database.media_analysis.documents] == MEDIA
+
+@pytest.mark.asyncio
+async def test_interrupted_backfill_resumes_from_checkpoint(api, database):
+    checkpoints = InMemoryBackfillCheckpoints()
+    list_media = api.list_media
+    calls = []
+
+    async def failing_list_media(account_id, after=None, **kwargs):
+        calls.append(after)
+        if len(calls) == 3:
+            raise RuntimeError("Graph API unavailable")
+        return await list_media(account_id, after=after, **kwargs)
+
+    api.list_media = failing_list_media
+    with pytest.raises(RuntimeError):
+        await InstagramBackfill(api, checkpoints, page_size=3, page_buffer=1).run(ACCOUNT)
+    checkpoint = await checkpoints.get(ACCOUNT)
+    assert checkpoint["status"] == "failed"
+    assert checkpoint["cursor"] == "6" and checkpoint["processed"] == 6
+
+    api.list_media = list_media
+    result = await InstagramBackfill(api, checkpoints, page_size=3).run(ACCOUNT)
+    assert result["status"] == "completed"
+    assert result["processed"] == 7
+    assert [document["media_id"] for document in database.media_analysis.documents] == MEDIA
+
+@pytest.mark.asyncio
+async def test_resume_mid_page_skips_stored_items(api, database):
+    checkpoints = InMemoryBackfillCheckpoints()
+    insert_one = database.media_analysis.insert_one
+
+    async def interrupted_insert_one(document):
+        await insert_one(document)
+        if document["media_id"] == "m4":
+            raise asyncio.CancelledError()
+
+    database.media_analysis.insert_one = interrupted_insert_one
+    with pytest.raises(asyncio.CancelledError):
+        await InstagramBackfill(api, checkpoints, page_size=3).run(ACCOUNT)
+    checkpoint = await checkpoints.get(ACCOUNT)
+    assert checkpoint["cursor"] == "3" and checkpoint["processed"] == 3
+
+    database.media_analysis.insert_one = insert_one
+    api.deepfake_detector.analyzed.clear()
+    result = await InstagramBackfill(api, checkpoints, page_size=3).run(ACCOUNT)
+    assert result["status"] == "completed"
+    assert result["processed"] == 7
+    # m3 and m4 were stored before the interruption; only m5 and m6 are analyzed
+    assert len(api.deepfake_detector.analyzed) == 2
+    assert [document["media_id"] for document in database.media_analysis.documents] == MEDIA
+
+@pytest.mark.asyncio
+async def test_pager_is_held_back_by_analysis(api, graph_server):
+    media_ids = [f"x{i}" for i in range(20)]
+    graph_server.account_media[ACCOUNT] = media_ids
+    for media_id in media_ids:
+        graph_server.files[f"{media_id}.jpg"] = media_id.encode()
+    listed = []
+    list_media = api.list_media
+
+    async def counting_list_media(account_id, **kwargs):
+        listed.append(kwargs.get("after"))
+        return await list_media(account_id, **kwargs)
+
+    api.list_media = counting_list_media
+    pages_listed_at_analysis = []
+
+    async def analyze_image(path, **kwargs):
+        pages_listed_at_analysis.append(len(listed))
+        await asyncio.sleep(0.01)
+        return {"is_deepfake": False, "error": None}
+    api.deepfake_detector.analyze_image = analyze_image
+
+    result = await InstagramBackfill(api, InMemoryBackfillCheckpoints(), page_size=2, page_buffer=1).run(ACCOUNT)
+    assert result["processed"] == 20
+    assert len(listed) == 10
+    # one page being processed, one queued and one waiting to be queued
+    assert max(count - index // 2 for index, count in enumerate(pages_listed_at_analysis)) <= 3
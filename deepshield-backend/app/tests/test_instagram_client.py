@@ -0,0 +1,95 @@
+"""
+Tests for the pooled Graph API client used by InstagramAPI (against a local stub server)
+"""
+import asyncio
+import time
+import pytest
+from ..services.api.http_client import PooledHTTPClient, HTTPResponse
+from ..services.api.instagram import InstagramAPI
+from ..services.api.graph_cache import GraphResponseCache
+from ..services.api.graph_rate_limiter import GraphRateLimiter
+from .stub_servers import GraphAPIStubServer
+
+@pytest.fixture
+async def graph_server():
+    server = GraphAPIStubServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+@pytest.fixture
+async def instagram_api(graph_server):
+    client = PooledHTTPClient(max_retries=2, backoff=0.01, max_retry_after=1.0, retry_statuses=())
+    api = InstagramAPI(http_client=client, rate_limiter=GraphRateLimiter(calls_per_hour=36000, burst=100),
+                       cache=GraphResponseCache())
+    api.base_url = graph_server.base_url
+    yield api
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_verify_profile(instagram_api, graph_server):
+    result = await instagram_api.verify_profile("someone")
+    assert result["verified"]
+    assert result["profile_data"]["id"] == instagram_api.account_id
+    assert graph_server.requests[0]["query"]["access_token"] == instagram_api.access_token
+
+@pytest.mark.asyncio
+async def test_media_insights_and_search(instagram_api):
+    insights = await instagram_api.get_media_insights("m1")
+    assert insights["success"]
+    assert [metric["name"] for metric in insights["insights"]["data"]] == ["engagement", "impressions", "reach"]
+    search = await instagram_api.search_media("deepfake")
+    assert search["success"]
+    assert search["media"]["data"][0]["id"] == "tag_deepfake"
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(instagram_api, graph_server):
+    for i in range(5):
+        assert (await instagram_api.get_media_insights(f"m{i}"))["success"]
+    assert len(graph_server.peers) == 1
+    await asyncio.gather(*(instagram_api.get_media_insights(f"c{i}") for i in range(10)))
+    assert len(graph_server.peers) <= 10
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honored(instagram_api, graph_server):
+    graph_server.fail_next = 1
+    graph_server.retry_after = "0.2"
+    start = time.monotonic()
+    result = await instagram_api.get_media_insights("m1")
+    assert result["success"]
+    assert time.monotonic() - start >= 0.2
+    assert len(graph_server.requests) == 2
+    # The retry went back through the limiter, which was blocked by the 429
+    assert sum(instagram_api.rate_limiter.granted.values()) == 2
+    assert instagram_api.rate_limiter.throttled == 1
+
+def test_shared_graph_client_leaves_retries_to_the_limiter():
+    assert InstagramAPI().http_client.retry_statuses == set()
+
+@pytest.mark.asyncio
+async def test_long_retry_after_is_returned_to_caller(instagram_api, graph_server):
+    graph_server.fail_next = 1
+    graph_server.retry_after = "3600"
+    start = time.monotonic()
+    result = await instagram_api.get_media_insights("m1")
+    assert not result["success"]
+    assert "429" in result["error"]
+    assert time.monotonic() - start < 1.0
+    assert len(graph_server.requests) == 1
+
+@pytest.mark.asyncio
+async def test_process_media_fetches_through_pooled_client(instagram_api, graph_server):
+    graph_server.fail_next = 5
+    graph_server.fail_status = 503
+    with pytest.raises(Exception) as error:
+        await instagram_api.process_media("m1")
+    assert "503" in str(error.value)
+    assert len(graph_server.requests) == 3
+
+def test_retry_after_parsing():
+    def response(value):
+        return HTTPResponse(429, {"retry-after": value}, b"", "http://example")
+    assert response("7").retry_after() == 7.0
+    assert response("Wed, 21 Oct 2015 07:28:00 GMT").retry_after() == 0.0
+    assert response("soon").retry_after() is None
+    assert HTTPResponse(429, {}, b"", "http://example").retry_after() is None
@@ -0,0 +1,120 @@
+"""
+Tests for acknowledged-first Instagram webhook processing
+"""
+import hashlib
+import hmac
+import json
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from ..services.api import instagram
+from ..services.jobs import InMemoryJobQueue, JobWorkerPool, HANDLERS
+from ..config import settings
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 0.0)
+
+@pytest.fixture
+def backend(monkeypatch):
+    queue = InMemoryJobQueue()
+    monkeypatch.setattr(instagram, "job_queue", queue)
+    return queue
+
+@pytest.fixture
+def client(backend):
+    app = FastAPI()
+    app.include_router(instagram.router, prefix="/api/v1/instagram")
+    return TestClient(app)
+
+def delivery(*media_ids):
+    return json.dumps({
+        "object": "instagram",
+        "entry": [{
+            "id": "1784",
+            "time": 1700000000,
+            "changes": [{"field": "media", "value": {"media_id": media_id}} for media_id in media_ids]
+        }]
+    }).encode()
+
+def post(client, body, secret=None):
+    signature = hmac.new((secret or settings.INSTAGRAM_APP_SECRET).encode(), body, hashlib.sha256).hexdigest()
+    return client.post(
+        "/api/v1/instagram/webhook",
+        content=body,
+        headers={"X-Hub-Signature-256": f"sha256={signature}", "Content-Type": "application/json"}
+    )
+
+def test_webhook_acknowledges_and_queues_media(client, backend, monkeypatch):
+    async def never_called(media_id):
+        raise AssertionError("webhook must not process media inline")
+    monkeypatch.setattr(instagram.instagram_api, "process_media", never_called)
+
+    response = post(client, delivery("m1", "m2", "m1"))
+    assert response.status_code == 200
+    assert response.json()["queued_media"] == 2
+    jobs = list(backend.jobs.values())
+    assert sorted(job["payload"]["media_id"] for job in jobs) == ["m1", "m2"]
+    assert all(job["source"] == "webhook" and job["kind"] == "instagram_media" for job in jobs)
+    assert jobs[0]["payload"]["account_id"] == "1784"
+
+def test_redelivery_is_not_requeued(client, backend):
+    first = post(client, delivery("m1", "m2")).json()
+    second = post(client, delivery("m2", "m3")).json()
+    assert second["queued_media"] == 1
+    assert second["duplicate_media"] == 1
+    assert second["job_ids"][0] == first["job_ids"][1]
+    assert len(backend.jobs) == 3
+
+def test_invalid_signature_is_rejected(client, backend):
+    response = post(client, delivery("m1"), secret="wrong")
+    assert response.status_code == 400
+    assert not backend.jobs
+
+@pytest.mark.asyncio
+async def test_queued_media_is_processed_by_workers(backend, monkeypatch):
+    processed = []
+    async def process_media(media_id):
+        processed.append(media_id)
+        if media_id == "bad":
+            raise HTTPException(status_code=500, detail="Error processing media")
+        return {"media_id": media_id, "media_type": "IMAGE", "violations": [], "violations_found": False}
+    monkeypatch.setattr(instagram.instagram_api, "process_media", process_media)
+
+    for media_id in ("m1", "bad"):
+        await backend.enqueue("analysis", "instagram_media", {"media_id": media_id}, source="webhook",
+                              dedup_key=f"instagram_media:{media_id}", max_attempts=1)
+    pool = JobWorkerPool(backend, HANDLERS, queues=["analysis"], concurrency=1, visibility_timeout=30, poll_interval=0.01)
+    while await pool.run_once("w1"):
+        pass
+    assert sorted(processed) == ["bad", "m1"]
+    states = {job["payload"]["media_id"]: job["status"] for job in backend.jobs.values()}
+    assert states == {"m1": "succeeded", "bad": "failed"}
+
+    # A redelivery of media that failed for good gets another round of attempts
+    job = await backend.enqueue("analysis", "instagram_media", {"media_id": "bad"}, source="webhook",
+                                dedup_key="instagram_media:bad", max_attempts=1)
+    assert not job.get("duplicate") and job["status"] == "queued"
+    assert len(backend.jobs) == 2
+
+def test_introspection_routes_require_authentication(client):
+    from ..api.deps import get_current_user
+    for path in ("/api/v1/instagram/rate-limit", "/api/v1/instagram/cache"):
+        assert client.get(path).status_code == 401
+    client.app.dependency_overrides[get_current_user] = lambda: {"_id": "user"}
+    assert "remaining_budget_percent" in client.get("/api/v1/instagram/rate-limit").json()
+    assert client.get("/api/v1/instagram/cache").status_code == 200
+
+def test_backfill_routes_are_admin_only(client, backend, monkeypatch):
+    from ..api.deps import get_current_user
+    client.app.dependency_overrides[get_current_user] = lambda: {"_id": "user"}
+    assert client.post("/api/v1/instagram/backfill", params={"account_id": "someone"}).status_code == 403
+    assert client.get("/api/v1/instagram/backfill/someone").status_code == 403
+
+    async def no_checkpoint(account_id):
+        return None
+    monkeypatch.setattr(instagram.backfill_checkpoints, "get", no_checkpoint)
+    client.app.dependency_overrides[get_current_user] = lambda: {"_id": "admin", "is_admin": True}
+    response = client.post("/api/v1/instagram/backfill", params={"account_id": "someone"})
+    assert response.status_code == 202 and response.json()["account_id"] == "someone"
+    assert client.get("/api/v1/instagram/backfill/someone").status_code == 404
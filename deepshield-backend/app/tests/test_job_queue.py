@@ -0,0 +1,151 @@
+"""
+Tests for the analysis job queue and worker pool (in-memory backend)
+"""
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from ..services.jobs import InMemoryJobQueue, JobWorkerPool
+from ..api.endpoints import jobs as jobs_endpoint
+from ..api.deps import get_current_user
+from ..config import settings
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 0.0)
+
+@pytest.fixture
+def backend():
+    return InMemoryJobQueue()
+
+async def echo(payload):
+    return {"echo": payload["value"]}
+
+def make_pool(backend, handlers=None, **kwargs):
+    options = {"concurrency": 1, "visibility_timeout": 30, "poll_interval": 0.01}
+    options.update(kwargs)
+    return JobWorkerPool(backend, handlers or {"echo": echo}, queues=["analysis"], **options)
+
+@pytest.mark.asyncio
+async def test_job_runs_to_completion(backend):
+    job = await backend.enqueue("analysis", "echo", {"value": 1}, user_id="u1")
+    pool = make_pool(backend)
+    assert await pool.run_once("w1")
+    assert not await pool.run_once("w1")
+    stored = await backend.get(job["_id"])
+    assert stored["status"] == "succeeded"
+    assert stored["result"] == {"echo": 1}
+    assert stored["attempts"] == 1
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried(backend):
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return {"ok": True}
+
+    job = await backend.enqueue("analysis", "flaky", {})
+    pool = make_pool(backend, {"flaky": flaky})
+    await pool.run_once("w1")
+    assert (await backend.get(job["_id"]))["status"] == "queued"
+    await pool.run_once("w1")
+    stored = await backend.get(job["_id"])
+    assert stored["status"] == "succeeded"
+    assert stored["attempts"] == 2
+    stats = (await pool.stats())["analysis"]
+    assert stats["retried"] == 1 and stats["succeeded"] == 1
+
+@pytest.mark.asyncio
+async def test_job_fails_after_max_attempts(backend):
+    finished = []
+
+    async def broken(payload):
+        raise RuntimeError("boom")
+
+    async def on_finished(job):
+        finished.append(job)
+
+    job = await backend.enqueue("analysis", "broken", {}, max_attempts=2)
+    pool = make_pool(backend, {"broken": broken}, on_finished=on_finished)
+    while await pool.run_once("w1"):
+        pass
+    stored = await backend.get(job["_id"])
+    assert stored["status"] == "failed"
+    assert stored["error"] == "boom"
+    assert stored["attempts"] == 2
+    assert [j["_id"] for j in finished] == [job["_id"]]
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_redelivered(backend):
+    job = await backend.enqueue("analysis", "echo", {"value": 2})
+    first = await backend.claim("analysis", "w1", visibility_timeout=0.01)
+    assert first["_id"] == job["_id"]
+    assert await backend.claim("analysis", "w2", visibility_timeout=30) is None
+    await asyncio.sleep(0.02)
+    second = await backend.claim("analysis", "w2", visibility_timeout=30)
+    assert second["_id"] == job["_id"] and second["attempts"] == 2
+    assert not await backend.complete(job["_id"], "w1", {"late": True})
+    assert await backend.complete(job["_id"], "w2", {"echo": 2})
+
+@pytest.mark.asyncio
+async def test_expired_final_attempt_is_reaped(backend):
+    job = await backend.enqueue("analysis", "echo", {"value": 3}, max_attempts=1)
+    await backend.claim("analysis", "w1", visibility_timeout=0.01)
+    await asyncio.sleep(0.02)
+    assert [reaped["_id"] for reaped in await backend.reap_expired("analysis")] == [job["_id"]]
+    assert (await backend.get(job["_id"]))["status"] == "failed"
+
+@pytest.mark.asyncio
+async def test_reaped_jobs_run_the_finish_hook(backend):
+    finished = []
+
+    async def on_finished(job):
+        finished.append(job)
+
+    job = await backend.enqueue("analysis", "echo", {"value": 4, "sha256": "abc"}, max_attempts=1)
+    await backend.claim("analysis", "crashed", visibility_timeout=0.01)
+    await asyncio.sleep(0.02)
+    pool = make_pool(backend, on_finished=on_finished, visibility_timeout=0.01)
+    await pool._reap()
+    # The finish hook is what releases the job's upload reference
+    assert [(j["_id"], j["status"], j["payload"]["sha256"]) for j in finished] == [(job["_id"], "failed", "abc")]
+    assert (await pool.stats())["analysis"]["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_worker_pool_and_notifications(backend):
+    ids = [(await backend.enqueue("analysis", "echo", {"value": i}))["_id"] for i in range(6)]
+    pool = make_pool(backend, concurrency=3)
+    pool.start()
+    try:
+        for _ in range(200):
+            if all(backend.jobs[job_id]["status"] == "succeeded" for job_id in ids):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await pool.stop()
+    stats = (await pool.stats())["analysis"]
+    assert stats["succeeded"] == 6
+    assert stats["depth"] == 0
+    assert stats["throughput_per_second"] > 0
+    assert len(await backend.pop_unnotified()) == 6
+    assert await backend.pop_unnotified() == []
+
+def test_job_endpoint_is_scoped_to_owner(backend, monkeypatch):
+    monkeypatch.setattr(jobs_endpoint, "job_queue", backend)
+    job = asyncio.run(backend.enqueue("analysis", "echo", {"value": 1}, user_id="owner"))
+    app = FastAPI()
+    app.include_router(jobs_endpoint.router, prefix="/api/v1/jobs")
+
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "owner"}
+    with TestClient(app) as client:
+        response = client.get(f"/api/v1/jobs/{job['_id']}")
+        assert response.status_code == 200
+        assert response.json()["status"] == "queued"
+        assert client.get("/api/v1/jobs/metrics").json()["analysis"]["depth"] == 1
+
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "someone-else"}
+    with TestClient(app) as client:
+        assert client.get(f"/api/v1/jobs/{job['_id']}").status_code == 404
@@ -0,0 +1,82 @@
+"""
+Tests for priority classes, fair share and source caps in job scheduling
+"""
+import pytest
+from ..services.jobs import InMemoryJobQueue, JobScheduler, Histogram
+
+CLASSES = ["interactive", "normal", "bulk"]
+
+@pytest.fixture
+def backend():
+    return InMemoryJobQueue()
+
+def make_scheduler(backend, caps=None):
+    return JobScheduler(backend, classes=CLASSES, source_caps=caps or {}, half_life_seconds=3600)
+
+async def drain(scheduler, backend, n):
+    order = []
+    for i in range(n):
+        job = await scheduler.claim("analysis", f"w{i}", 30)
+        if job is None:
+            break
+        await backend.complete(job["_id"], f"w{i}", {})
+        order.append(job)
+    return order
+
+@pytest.mark.asyncio
+async def test_higher_class_is_served_first(backend):
+    await backend.enqueue("analysis", "deepfake", {}, user_id="a", source="backfill")
+    await backend.enqueue("analysis", "deepfake", {}, user_id="b", source="webhook")
+    await backend.enqueue("analysis", "deepfake", {}, user_id="c", source="upload")
+    order = await drain(make_scheduler(backend), backend, 3)
+    assert [job["priority"] for job in order] == ["interactive", "normal", "bulk"]
+
+@pytest.mark.asyncio
+async def test_fair_share_between_users(backend):
+    for _ in range(10):
+        await backend.enqueue("analysis", "deepfake", {}, user_id="heavy")
+    await backend.enqueue("analysis", "deepfake", {}, user_id="light")
+    order = await drain(make_scheduler(backend), backend, 3)
+    assert [job["user_id"] for job in order][:2] == ["heavy", "light"]
+
+@pytest.mark.asyncio
+async def test_running_jobs_count_against_user(backend):
+    await backend.enqueue("analysis", "deepfake", {}, user_id="a")
+    await backend.enqueue("analysis", "deepfake", {}, user_id="a")
+    await backend.enqueue("analysis", "deepfake", {}, user_id="b")
+    scheduler = make_scheduler(backend)
+    first = await scheduler.claim("analysis", "w1", 30)
+    second = await scheduler.claim("analysis", "w2", 30)
+    assert {first["user_id"], second["user_id"]} == {"a", "b"}
+
+@pytest.mark.asyncio
+async def test_source_cap_limits_running_jobs(backend):
+    for _ in range(3):
+        await backend.enqueue("analysis", "deepfake", {}, user_id="bulk", source="backfill")
+    scheduler = make_scheduler(backend, caps={"backfill": 1})
+    first = await scheduler.claim("analysis", "w1", 30)
+    assert first["source"] == "backfill"
+    assert await scheduler.claim("analysis", "w2", 30) is None
+    await backend.complete(first["_id"], "w1", {})
+    assert await scheduler.claim("analysis", "w2", 30) is not None
+    assert scheduler.stats("analysis")["capped_polls"]["backfill"] >= 1
+
+@pytest.mark.asyncio
+async def test_wait_times_are_recorded_per_class(backend):
+    await backend.enqueue("analysis", "deepfake", {}, source="upload")
+    await backend.enqueue("analysis", "deepfake", {}, source="backfill")
+    scheduler = make_scheduler(backend)
+    await drain(scheduler, backend, 2)
+    waits = scheduler.stats("analysis")["wait_seconds"]
+    assert set(waits) == {"interactive", "bulk"}
+    assert waits["interactive"]["count"] == 1
+    assert waits["interactive"]["buckets"]["+Inf"] == 1
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=[1, 5, 10])
+    for value in [0.5, 0.5, 3, 7, 20]:
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"1": 2, "5": 3, "10": 4, "+Inf": 5}
+    assert histogram.quantile(0.5) == 5
+    assert histogram.quantile(1.0) == float("inf")
@@ -0,0 +1,164 @@
+"""
+Tests for streaming Instagram media downloads and the prefetching analysis pipeline
+"""
+import asyncio
+import hashlib
+import os
+import pytest
+from fastapi import HTTPException
+from ..config import settings
+from ..services.api import instagram
+from ..services.api.graph_cache import GraphResponseCache
+from ..services.api.graph_rate_limiter import GraphRateLimiter
+from ..services.api.http_client import PooledHTTPClient
+from ..services.api.instagram import InstagramAPI
+from ..services.api.media_downloader import MediaDownloader
+from ..services.storage import BlobStore, InMemoryBlobIndex
+from .stub_servers import GraphAPIStubServer, StubDatabase
+
+@pytest.fixture
+async def graph_server():
+    server = GraphAPIStubServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+@pytest.fixture
+async def client():
+    client = PooledHTTPClient(max_retries=1, backoff=0.01)
+    yield client
+    await client.close()
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(root=str(tmp_path / "blobs"), index=InMemoryBlobIndex())
+
+@pytest.mark.asyncio
+async def test_download_is_streamed_into_the_blob_store(graph_server, client, store):
+    body = os.urandom(50_000)
+    graph_server.files["m1.jpg"] = body
+    downloader = MediaDownloader(http_client=client, store=store, chunk_size=4096)
+    stored = await downloader.download("m1", f"{graph_server.root_url}/files/m1.jpg", "IMAGE")
+    assert stored.sha256 == hashlib.sha256(body).hexdigest()
+    assert stored.size == len(body)
+    assert stored.content_type == "image/jpeg"
+    assert stored.path.endswith(".jpg")
+    with open(stored.path, "rb") as f:
+        assert f.read() == body
+    assert (await store.index.get(stored.sha256))["refcount"] == 1
+    assert os.listdir(store.tmp_dir) == []
+
+@pytest.mark.asyncio
+async def test_downloads_are_cached_and_shared(graph_server, client, store):
+    graph_server.files["m1.jpg"] = b"x" * 1000
+    graph_server.latency = 0.05
+    downloader = MediaDownloader(http_client=client, store=store)
+    url = f"{graph_server.root_url}/files/m1.jpg"
+    first, second = await asyncio.gather(downloader.download("m1", url, "IMAGE"), downloader.download("m1", url, "IMAGE"))
+    third = await downloader.download("m1", url, "IMAGE")
+    assert first == second == third
+    assert len(graph_server.requests) == 1
+    assert downloader.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_oversized_media_is_rejected(graph_server, client, store, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_IMAGE_BYTES", 10_000)
+    graph_server.files["big.jpg"] = b"x" * 20_000
+    downloader = MediaDownloader(http_client=client, store=store, chunk_size=1024)
+    with pytest.raises(HTTPException) as error:
+        await downloader.download("big", f"{graph_server.root_url}/files/big.jpg", "IMAGE")
+    assert error.value.status_code == 413
+    assert os.listdir(store.tmp_dir) == []
+    assert downloader.stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_eviction_releases_the_blob(graph_server, client, store):
+    for name in ("a", "b"):
+        graph_server.files[f"{name}.jpg"] = name.encode() * 100
+    downloader = MediaDownloader(http_client=client, store=store, max_entries=1)
+    first = await downloader.download("a", f"{graph_server.root_url}/files/a.jpg", "IMAGE")
+    await downloader.download("b", f"{graph_server.root_url}/files/b.jpg", "IMAGE")
+    assert (await store.index.get(first.sha256))["refcount"] == 0
+
+class FakeDetector:
+    def __init__(self, flagged=()):
+        self.flagged = set(flagged)
+        self.seen = []
+        self.hook = None
+
+    async def analyze_image(self, path, **kwargs):
+        self.seen.append(path)
+        if self.hook:
+            await self.hook(len(self.seen))
+        return {"is_deepfake": os.path.basename(path).split(".")[0] in self.flagged, "error": None}
+
+    async def analyze_video(self, path, **kwargs):
+        return await self.analyze_image(path)
+
+class FakeModerator:
+    async def analyze_image(self, path, **kwargs):
+        return {"is_explicit": False, "error": None}
+
+    async def analyze_text(self, text, **kwargs):
+        return {"is_toxic": "hate" in text, "error": None}
+
+@pytest.fixture
+def make_api(graph_server, client, store, monkeypatch):
+    database = StubDatabase()
+
+    async def get_database():
+        return database
+    monkeypatch.setattr(instagram, "get_database", get_database)
+
+    def make():
+        api = InstagramAPI(
+            http_client=client,
+            rate_limiter=GraphRateLimiter(calls_per_hour=36000, burst=100),
+            cache=GraphResponseCache(),
+            downloader=MediaDownloader(http_client=client, store=store)
+        )
+        api.base_url = graph_server.base_url
+        api.deepfake_detector = FakeDetector()
+        api.content_moderator = FakeModerator()
+        api.database = database
+        return api
+    return make
+
+@pytest.mark.asyncio
+async def test_process_media_analyzes_the_local_copy(make_api, graph_server, store):
+    graph_server.files["m1.jpg"] = b"image-bytes"
+    graph_server.media["m1"] = {"media_type": "IMAGE", "media_url": f"{graph_server.root_url}/files/m1.jpg", "caption": "full of hate"}
+    api = make_api()
+    api.deepfake_detector.flagged = {hashlib.sha256(b"image-bytes").hexdigest()}
+    result = await api.process_media("m1")
+    assert api.deepfake_detector.seen[0].startswith(store.root)
+    assert result["violations"] == ["deepfake_detected", "abusive_text"]
+    assert result["media_sha256"] == hashlib.sha256(b"image-bytes").hexdigest()
+    # flagged media keeps a reference beyond the download cache
+    assert (await store.index.get(result["media_sha256"]))["refcount"] == 2
+    assert api.database.media_analysis.documents[0]["media_id"] == "m1"
+
+@pytest.mark.asyncio
+async def test_pipeline_prefetches_the_next_item(make_api, graph_server):
+    ids = ["p0", "p1", "p2", "p3"]
+    for media_id in ids:
+        graph_server.files[f"{media_id}.jpg"] = media_id.encode() * 10
+    api = make_api()
+    observed = {}
+
+    async def during_analysis(count):
+        if count == 1:
+            for _ in range(100):
+                if "p1" in api.media_downloader._cache:
+                    break
+                await asyncio.sleep(0.01)
+            observed["p1_ready"] = "p1" in api.media_downloader._cache
+            observed["p2_requested"] = any("p2" in request["path"] for request in graph_server.requests)
+    api.deepfake_detector.hook = during_analysis
+
+    graph_server.media["p2"] = {"media_type": "IMAGE", "media_url": f"{graph_server.root_url}/files/missing.jpg"}
+    results = [result async for result in api.process_media_many(ids, prefetch=1)]
+    assert [result["media_id"] for result in results] == ids
+    assert observed == {"p1_ready": True, "p2_requested": False}
+    assert "404" in results[2]["error"]
+    assert "error" not in results[3]
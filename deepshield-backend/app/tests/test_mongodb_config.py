@@ -0,0 +1,87 @@
+"""
+Tests for the settings-driven MongoDB client: pool options, compression,
+reporting read preference, per-collection write concern and pool metrics
+"""
+import importlib.util
+import pytest
+from pymongo.monitoring import (
+    ConnectionCreatedEvent, ConnectionCheckOutStartedEvent, ConnectionCheckedOutEvent,
+    ConnectionCheckedInEvent, ConnectionClosedEvent, ConnectionCheckOutFailedEvent, PoolClearedEvent
+)
+from ..db import mongodb
+from ..db.mongodb import PoolMetrics, available_compressors, client_options
+
+ADDRESS = ("db1.example", 27017)
+
+
+def test_client_options_from_settings(monkeypatch):
+    monkeypatch.setattr(mongodb.settings, "MONGO_MAX_POOL_SIZE", 7)
+    monkeypatch.setattr(mongodb.settings, "MONGO_MIN_POOL_SIZE", 2)
+    monkeypatch.setattr(mongodb.settings, "MONGO_WAIT_QUEUE_TIMEOUT_SECONDS", 1.5)
+    monkeypatch.setattr(mongodb.settings, "MONGO_SOCKET_TIMEOUT_SECONDS", 0.0)
+    monkeypatch.setattr(mongodb.settings, "MONGO_COMPRESSORS", ["zlib"])
+    options = client_options()
+    assert options["maxPoolSize"] == 7 and options["minPoolSize"] == 2
+    assert options["waitQueueTimeoutMS"] == 1500
+    assert "socketTimeoutMS" not in options  # 0 leaves the driver default (no timeout)
+    assert options["compressors"] == ["zlib"]
+    assert options["event_listeners"] == [mongodb.pool_metrics]
+
+
+def test_compressors_need_their_libraries():
+    expected = [name for name, module in (("zstd", "zstandard"), ("snappy", "snappy"))
+                if importlib.util.find_spec(module) is not None] + ["zlib"]
+    assert available_compressors(["zstd", "snappy", "lz4", "zlib"]) == expected
+
+
+@pytest.mark.asyncio
+async def test_connect_applies_write_concern_and_read_preference(monkeypatch):
+    state = mongodb.MongoDB()
+    monkeypatch.setattr(mongodb, "db", state)
+    monkeypatch.setattr(mongodb.settings, "MONGODB_URL", "mongodb://127.0.0.1:1")
+    monkeypatch.setattr(mongodb.settings, "MONGO_MAX_POOL_SIZE", 9)
+    monkeypatch.setattr(mongodb.settings, "MONGO_WRITE_CONCERNS", {"users": {"w": "majority", "j": True}, "media_analysis": {"w": 1}})
+    monkeypatch.setattr(mongodb.settings, "MONGO_REPORTING_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(mongodb.settings, "MONGO_REPORTING_MAX_STALENESS_SECONDS", 120)
+
+    await mongodb.connect_to_mongo()  # motor connects lazily, so no server is needed
+    try:
+        db = await mongodb.get_database()
+        assert state.client.options.pool_options.max_pool_size == 9
+        assert db.users.write_concern.document == {"w": "majority", "j": True}
+        assert db["users"].write_concern.document == {"w": "majority", "j": True}
+        assert db.media_analysis.write_concern.document == {"w": 1}
+        assert db.content.write_concern.document == {}
+        assert db.name == mongodb.settings.MONGODB_DB
+
+        reporting = await mongodb.get_reporting_database()
+        assert reporting.read_preference.mongos_mode == "secondaryPreferred"
+        assert reporting.read_preference.max_staleness == 120
+        assert db.users.read_preference.mongos_mode == "primary"
+        assert mongodb.pool_metrics.max_pool_size == 9
+    finally:
+        await mongodb.close_mongo_connection()
+
+
+def test_pool_metrics_from_events():
+    metrics = PoolMetrics()
+    metrics.max_pool_size = 4
+    for connection_id in (1, 2):
+        metrics.connection_created(ConnectionCreatedEvent(ADDRESS, connection_id))
+        metrics.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+        metrics.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, connection_id, 0.01 * connection_id))
+    metrics.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+
+    server = metrics.snapshot()["servers"]["db1.example:27017"]
+    assert (server["open"], server["in_use"], server["waiting"], server["checkouts"]) == (2, 2, 1, 2)
+    assert server["utilization"] == 0.5
+    assert server["max_wait_seconds"] == pytest.approx(0.02)
+    assert server["mean_wait_seconds"] == pytest.approx(0.015)
+
+    metrics.connection_check_out_failed(ConnectionCheckOutFailedEvent(ADDRESS, "timeout", 1.0))
+    metrics.connection_checked_in(ConnectionCheckedInEvent(ADDRESS, 1))
+    metrics.connection_closed(ConnectionClosedEvent(ADDRESS, 1, "idle"))
+    metrics.pool_cleared(PoolClearedEvent(ADDRESS))
+    server = metrics.snapshot()["servers"]["db1.example:27017"]
+    assert (server["open"], server["in_use"], server["waiting"]) == (1, 1, 0)
+    assert server["checkout_failures"] == 1 and server["pool_cleared"] == 1
@@ -0,0 +1,224 @@
+"""
+Tests for keyset pagination of content and admin listings
+"""
+import base64
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from ..api.deps import get_current_user
+from ..api.endpoints import content as content_endpoint, admin as admin_endpoint
+from ..db import pagination
+from ..db.mongodb import get_reporting_database
+from ..db.pagination import paginate, encode_token
+
+START = datetime(2024, 1, 1)
+
+
+def matches(document, query):
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif field == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            if "$lt" in condition and (value is None or not value < condition["$lt"]):
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            # Descending order puts missing values last, as MongoDB does
+            self.documents.sort(key=lambda d: (d.get(field) is not None, d.get(field) or 0), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+
+class FakeCollection:
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+        self.queries = []
+
+    def find(self, query, fields=None):
+        self.queries.append((query, fields))
+        found = [d for d in self.documents if matches(d, query)]
+        if fields is not None:
+            found = [{k: v for k, v in d.items() if k == "_id" or k in fields} for d in found]
+        return FakeCursor(found)
+
+
+class FakeDatabase:
+    def __init__(self, **collections):
+        self.collections = collections
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        return self.collections[name]
+
+
+def content_documents(count, user_id="u1", ties=3):
+    """Documents with `ties` sharing each created_at, to exercise the _id tie-break"""
+    return [
+        {
+            "_id": ObjectId(), "user_id": user_id, "content_type": "image/png", "created_at": START + timedelta(minutes=i // ties),
+            "moderation_status": "pending", "analysis_results": {"scores": list(range(100))}, "blockchain_hash": "h"
+        }
+        for i in range(count)
+    ]
+
+
+async def collect(collection, query, limit, **kwargs):
+    pages, token = [], None
+    while True:
+        page = await paginate(collection, query, limit=limit, token=token, **kwargs)
+        pages.append(page["items"])
+        token = page["next_token"]
+        if token is None:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_document_once_in_order():
+    documents = content_documents(23)
+    collection = FakeCollection(documents)
+    pages = await collect(collection, {"user_id": "u1"}, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    seen = [d["_id"] for page in pages for d in page]
+    expected = sorted(documents, key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+    assert seen == [d["_id"] for d in expected]
+    # Every page after the first is an index range on (user_id, created_at, _id), not an offset
+    assert "$and" in collection.queries[1][0]
+
+
+@pytest.mark.asyncio
+async def test_inserts_between_pages_do_not_shift_results():
+    collection = FakeCollection(content_documents(10))
+    page = await paginate(collection, {}, limit=4)
+    seen = [d["_id"] for d in page["items"]]
+    # A newer document lands before the cursor: an offset would repeat an item, a keyset does not
+    collection.documents.append({"_id": ObjectId(), "created_at": START + timedelta(days=1)})
+    while page["next_token"]:
+        page = await paginate(collection, {}, limit=4, token=page["next_token"])
+        seen.extend(d["_id"] for d in page["items"])
+    assert len(seen) == len(set(seen)) == 10
+
+
+@pytest.mark.asyncio
+async def test_documents_without_sort_field_come_last():
+    documents = content_documents(4) + [{"_id": ObjectId(), "user_id": "u1"} for _ in range(3)]
+    pages = await collect(FakeCollection(documents), {"user_id": "u1"}, limit=2)
+    seen = [d for page in pages for d in page]
+    assert len(seen) == 7 and len({d["_id"] for d in seen}) == 7
+    assert all("created_at" not in d for d in seen[4:])
+
+
+@pytest.mark.asyncio
+async def test_tokens_and_limits(monkeypatch):
+    monkeypatch.setattr(pagination.settings, "PAGE_SIZE_MAX", 3)
+    collection = FakeCollection(content_documents(5))
+    page = await paginate(collection, {}, limit=100)
+    assert len(page["items"]) == 3
+    assert "created_at" not in page["next_token"]  # opaque (base64)
+
+    with pytest.raises(HTTPException) as error:
+        await paginate(collection, {}, token="not-a-token")
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        await paginate(collection, {}, token=encode_token("updated_at", collection.documents[0]))
+
+    # Invalid ObjectIds and operator documents are rejected, not queried
+    for payload in (
+        '{"v": 1, "f": "created_at", "k": null, "id": {"$oid": "zz"}}',
+        '{"v": 1, "f": "created_at", "k": {"$ne": null}, "id": {"$oid": "%s"}}' % ObjectId(),
+        '{"v": 1, "f": "created_at", "k": null, "id": "not-an-objectid"}',
+        '[1, 2]',
+    ):
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        with pytest.raises(HTTPException) as error:
+            await paginate(collection, {}, token=token)
+        assert error.value.status_code == 400
+
+    await paginate(collection, {}, fields={"content_type": 1})
+    assert collection.queries[-1][1] == {"content_type": 1, "created_at": 1}
+
+
+def make_app(database, user):
+    async def fake_database():
+        return database
+
+    app = FastAPI()
+    app.include_router(content_endpoint.router, prefix="/api/v1/content")
+    app.include_router(admin_endpoint.router, prefix="/api/v1/admin")
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_reporting_database] = fake_database
+    return app
+
+
+def test_content_listing_projection_and_paging(monkeypatch):
+    database = FakeDatabase(content=FakeCollection(content_documents(7) + content_documents(2, user_id="u2")))
+
+    async def fake_get_database():
+        return database
+    monkeypatch.setattr(content_endpoint, "get_database", fake_get_database)
+
+    with TestClient(make_app(database, {"_id": "u1"})) as client:
+        first = client.get("/api/v1/content/user/u1", params={"limit": 4}).json()
+        assert len(first["items"]) == 4
+        assert first["items"][0]["analysis_results"] is None and first["items"][0]["blockchain_hash"] is None
+        second = client.get("/api/v1/content/user/u1", params={"limit": 4, "cursor": first["next_token"]}).json()
+        assert len(second["items"]) == 3 and second["next_token"] is None
+        assert {item["id"] for item in first["items"]}.isdisjoint(item["id"] for item in second["items"])
+
+        full = client.get("/api/v1/content/user/u1", params={"include": "analysis_results"}).json()
+        assert full["items"][0]["analysis_results"]["scores"][:3] == [0, 1, 2]
+
+        assert client.get("/api/v1/content/user/u1", params={"include": "hashed_password"}).status_code == 400
+        assert client.get("/api/v1/content/user/u1", params={"cursor": "garbage"}).status_code == 400
+        assert client.get("/api/v1/content/user/u2").status_code == 403
+
+
+def test_admin_listings_are_paginated():
+    users = [
+        {"_id": ObjectId(), "email": f"user{i}@example.com", "username": f"user{i}", "full_name": "User",
+         "hashed_password": "secret", "is_verified": False, "verification_status": "pending",
+         "created_at": START + timedelta(hours=i)}
+        for i in range(5)
+    ]
+    flags = [
+        {"_id": ObjectId(), "content_id": f"c{i}", "reason": "nsfw", "status": "pending" if i % 2 else "resolved",
+         "created_at": START + timedelta(hours=i)}
+        for i in range(6)
+    ]
+    database = FakeDatabase(users=FakeCollection(users), content_flags=FakeCollection(flags))
+
+    with TestClient(make_app(database, {"_id": "admin", "is_admin": True})) as client:
+        page = client.get("/api/v1/admin/users", params={"limit": 3}).json()
+        assert [user["username"] for user in page["items"]] == ["user4", "user3", "user2"]
+        assert "hashed_password" not in database.users.queries[-1][1]
+        page = client.get("/api/v1/admin/users", params={"limit": 3, "cursor": page["next_token"]}).json()
+        assert [user["username"] for user in page["items"]] == ["user1", "user0"] and page["next_token"] is None
+
+        pending = client.get("/api/v1/admin/flags", params={"status": "pending"}).json()
+        assert [flag["content_id"] for flag in pending["items"]] == ["c5", "c3", "c1"]
+
+    with TestClient(make_app(database, {"_id": "someone"})) as client:
+        assert client.get("/api/v1/admin/users").status_code == 403
@@ -0,0 +1,86 @@
+"""
+Tests that importing the API does not pull in the heavy ML stack
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+HEAVY_MODULES = ("torch", "transformers", "deepface", "tensorflow", "facenet_pytorch", "hatesonar", "nudenet")
+
+def imported_heavy_modules(statement: str) -> list:
+    code = f"import sys, json\n{statement}\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    completed = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def test_app_main_import_is_light():
+    assert imported_heavy_modules("import app.main") == []
+
+def test_constructing_ai_services_is_light():
+    statement = (
+        "from app.services.ai import DeepfakeDetector, ContentModerator, FaceVerifier\n"
+        "DeepfakeDetector(); ContentModerator(); FaceVerifier()"
+    )
+    assert imported_heavy_modules(statement) == []
+
+def test_concurrent_first_loads_wait_for_models(monkeypatch):
+    import threading
+    import time
+    import types
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.ai import FaceVerifier
+
+    constructed = []
+
+    class SlowModel:
+        def __init__(self, *args, **kwargs):
+            constructed.append(type(self).__name__)
+            time.sleep(0.05)
+
+        def eval(self):
+            return self
+
+    fake = types.ModuleType("facenet_pytorch")
+    fake.MTCNN = type("MTCNN", (SlowModel,), {})
+    fake.InceptionResnetV1 = type("InceptionResnetV1", (SlowModel,), {})
+    monkeypatch.setitem(sys.modules, "facenet_pytorch", fake)
+
+    verifier = FaceVerifier()
+    start = threading.Barrier(4)
+
+    def first_use():
+        start.wait()
+        verifier._load_models()
+        return verifier.mtcnn is not None and verifier.facenet is not None
+
+    with ThreadPoolExecutor(4) as pool:
+        assert all(pool.map(lambda _: first_use(), range(4)))
+    assert constructed == ["MTCNN", "InceptionResnetV1"]
+
+def test_failed_load_is_not_retried(monkeypatch):
+    import types
+    import pytest
+    from app.services.ai import FaceVerifier
+
+    attempts = []
+
+    class MissingWeights:
+        def __init__(self, *args, **kwargs):
+            attempts.append(type(self).__name__)
+            raise OSError("weights not found")
+
+    fake = types.ModuleType("facenet_pytorch")
+    fake.MTCNN = type("MTCNN", (MissingWeights,), {})
+    fake.InceptionResnetV1 = type("InceptionResnetV1", (MissingWeights,), {})
+    monkeypatch.setitem(sys.modules, "facenet_pytorch", fake)
+
+    verifier = FaceVerifier()
+    with pytest.raises(OSError):
+        verifier._load_models()
+    with pytest.raises(RuntimeError) as exc:
+        verifier._load_models()
+    assert isinstance(exc.value.__cause__, OSError)
+    assert attempts == ["MTCNN"]
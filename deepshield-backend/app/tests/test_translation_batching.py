@@ -0,0 +1,89 @@
+"""
+Tests for coalescing concurrent translations into batched requests
+"""
+import asyncio
+import pytest
+from ..services.api.http_client import PooledHTTPClient
+from ..services.api.translation import TranslationAPI
+from ..services.api.translation_batcher import TranslationBatcher
+from ..services.api.translation_cache import TranslationCache
+from .stub_servers import TranslationStubServer
+
+@pytest.fixture
+async def stub_server():
+    server = TranslationStubServer(latency=0.01)
+    await server.start()
+    yield server
+    await server.stop()
+
+@pytest.fixture
+async def translation_api(stub_server):
+    client = PooledHTTPClient(max_retries=0)
+    api = TranslationAPI(http_client=client, cache=TranslationCache(use_mongo=False))
+    api.api_key = "test-key"
+    api.base_url = stub_server.base_url
+    yield api
+    await api.close()
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_request(translation_api, stub_server):
+    texts = [f"comentario {i}" for i in range(20)]
+    results = await asyncio.gather(*(translation_api.translate_text(t, "en", "es") for t in texts))
+    assert [r["translated_text"] for r in results] == [t.upper() for t in texts]
+    assert len(stub_server.requests) == 1
+    assert stub_server.requests[0]["form"].getall("q") == texts
+
+@pytest.mark.asyncio
+async def test_identical_texts_are_deduplicated(translation_api, stub_server):
+    results = await asyncio.gather(*(translation_api.translate_text("first!", "en", "es") for _ in range(10)))
+    assert all(r["translated_text"] == "FIRST!" for r in results)
+    assert stub_server.requests[0]["form"].getall("q") == ["first!"]
+    assert translation_api.batcher.stats()["coalesced"] == 9
+
+@pytest.mark.asyncio
+async def test_groups_by_language_pair(translation_api, stub_server):
+    await asyncio.gather(
+        translation_api.translate_text("uno", "en", "es"),
+        translation_api.translate_text("dos", "en", "es"),
+        translation_api.translate_text("un", "en", "fr"),
+    )
+    sources = sorted(r["form"]["source"] for r in stub_server.requests)
+    assert sources == ["es", "fr"]
+
+@pytest.mark.asyncio
+async def test_batches_respect_quota_limits(translation_api, stub_server):
+    translation_api.batcher = TranslationBatcher(translation_api.batch_translate, max_texts=4, max_chars=1000)
+    results = await asyncio.gather(*(translation_api.translate_text(f"t{i}", "en", "es") for i in range(10)))
+    assert all(r["success"] for r in results)
+    assert sorted(len(r["form"].getall("q")) for r in stub_server.requests) == [2, 4, 4]
+
+@pytest.mark.asyncio
+async def test_batch_failure_reaches_every_caller(translation_api, stub_server):
+    stub_server.fail_next = 1
+    results = await asyncio.gather(*(translation_api.translate_text(f"t{i}", "en", "es") for i in range(3)))
+    assert all(not r["success"] and "503" in r["error"] for r in results)
+
+@pytest.mark.asyncio
+async def test_close_cancels_in_flight_batches():
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def send_batch(texts, target_lang, source_lang):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    batcher = TranslationBatcher(send_batch, window_ms=0)
+    call = asyncio.ensure_future(batcher.translate("hola", "en", "es"))
+    await started.wait()
+    assert len(batcher._tasks) == 1
+
+    await batcher.close()
+    result = await call
+    assert cancelled.is_set()
+    assert not result["success"] and result["error"] == "Translation batcher closed"
+    assert not batcher._tasks
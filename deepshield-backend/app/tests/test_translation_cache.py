@@ -0,0 +1,67 @@
+"""
+Tests for the two-tier translation cache
+"""
+import pytest
+from ..services.api.http_client import PooledHTTPClient
+from ..services.api.translation import TranslationAPI
+from ..services.api.translation_cache import TranslationCache
+from .stub_servers import TranslationStubServer
+
+@pytest.fixture
+async def stub_server():
+    server = TranslationStubServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+@pytest.fixture
+def cache():
+    return TranslationCache(use_mongo=False)
+
+@pytest.fixture
+async def translation_api(stub_server, cache):
+    client = PooledHTTPClient(max_retries=0)
+    api = TranslationAPI(http_client=client, cache=cache)
+    api.api_key = "test-key"
+    api.base_url = stub_server.base_url
+    yield api
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_repeated_translation_hits_cache(translation_api, stub_server, cache):
+    first = await translation_api.translate_text("first!", "en", "es")
+    second = await translation_api.translate_text("  first!  ", "en", "es")
+    assert first == second
+    assert len(stub_server.requests) == 1
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+@pytest.mark.asyncio
+async def test_key_includes_languages(translation_api, stub_server):
+    await translation_api.translate_text("first!", "en", "es")
+    await translation_api.translate_text("first!", "fr", "es")
+    await translation_api.detect_language("first!")
+    await translation_api.detect_language("first!")
+    assert len(stub_server.requests) == 3
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached(translation_api, stub_server, cache):
+    stub_server.fail_next = 1
+    failed = await translation_api.translate_text("hola", "en", "es")
+    assert not failed["success"]
+    retried = await translation_api.translate_text("hola", "en", "es")
+    assert retried["success"]
+    assert cache.stats()["entries"] == 1
+
+@pytest.mark.asyncio
+async def test_size_cap_evicts_least_recently_used():
+    cache = TranslationCache(max_bytes=300, use_mongo=False)
+    for i in range(10):
+        await cache.set(TranslationCache.make_key("translate", f"text {i}", "es", "en"), {"translated_text": "x" * 40})
+    stats = cache.stats()
+    assert stats["size_bytes"] <= 300
+    assert stats["evictions"] > 0
+    assert await cache.get(TranslationCache.make_key("translate", "text 9", "es", "en")) is not None
+    assert await cache.get(TranslationCache.make_key("translate", "text 0", "es", "en")) is None
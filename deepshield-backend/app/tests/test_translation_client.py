@@ -0,0 +1,110 @@
+"""
+Tests for the pooled async translation client against a local stub server
+"""
+import asyncio
+import pytest
+from ..services.api.http_client import PooledHTTPClient
+from ..services.api.translation import TranslationAPI
+from ..services.api.translation_cache import TranslationCache
+from .stub_servers import TranslationStubServer
+
+@pytest.fixture
+async def stub_server():
+    server = TranslationStubServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+@pytest.fixture
+async def translation_api(stub_server):
+    client = PooledHTTPClient(max_retries=2, backoff=0.01)
+    api = TranslationAPI(http_client=client, cache=TranslationCache(use_mongo=False))
+    api.api_key = "test-key"
+    api.base_url = stub_server.base_url
+    yield api
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_translate_text(translation_api):
+    result = await translation_api.translate_text("hola", "en", "es")
+    assert result["success"]
+    assert result["translated_text"] == "HOLA"
+    assert result["detected_language"] == "es"
+
+@pytest.mark.asyncio
+async def test_detect_language(translation_api):
+    result = await translation_api.detect_language("hello")
+    assert result["success"]
+    assert result["language"] == "en"
+    assert result["confidence"] == 0.99
+
+@pytest.mark.asyncio
+async def test_batch_translate_single_request(translation_api, stub_server):
+    result = await translation_api.batch_translate(["a", "b", "c"], "fr")
+    assert result["success"]
+    assert [t["translated_text"] for t in result["translations"]] == ["A", "B", "C"]
+    assert len(stub_server.requests) == 1
+
+@pytest.mark.asyncio
+async def test_retries_on_unavailable(translation_api, stub_server):
+    stub_server.fail_next = 2
+    result = await translation_api.translate_text("hola", "en", "es")
+    assert result["success"]
+    assert len(stub_server.requests) == 3
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(translation_api, stub_server):
+    stub_server.fail_next = 5
+    result = await translation_api.translate_text("hola", "en", "es")
+    assert not result["success"]
+    assert "503" in result["error"]
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(translation_api, stub_server):
+    for i in range(5):
+        await translation_api.translate_text(f"hola {i}", "en", "es")
+    await asyncio.gather(*(translation_api.detect_language(f"hi {i}") for i in range(5)))
+    assert len(stub_server.peers) < len(stub_server.requests)
+
+def test_sessions_of_closed_loops_are_discarded():
+    import gc
+    import warnings
+    client = PooledHTTPClient()
+
+    async def session():
+        return client._get_session()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        first = asyncio.run(session())  # asyncio.run closes its loop afterwards
+        second = asyncio.run(session())
+        assert first.closed and first.connector is None
+        assert second is not first and not second.closed
+        asyncio.run(client.close())
+        assert second.closed
+        del first, second
+        gc.collect()
+    assert not [w for w in caught if "Unclosed" in str(w.message)]
+
+def test_each_thread_loop_gets_its_own_session():
+    import threading
+    client = PooledHTTPClient()
+    started = threading.Barrier(2)
+    sessions = []
+
+    async def use():
+        sessions.append(client._get_session())
+        await asyncio.sleep(0.05)
+        await client.close()
+
+    def run():
+        started.wait()
+        asyncio.run(use())
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(session) for session in sessions}) == 2
+    assert all(session.closed for session in sessions)
@@ -0,0 +1,148 @@
+"""
+Tests for upload retention and the archive tier
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from ..services.storage import BlobStore, InMemoryBlobIndex, UploadRetention, TieredStaticFiles
+from .stub_servers import make_upload
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(root=str(tmp_path / "uploads" / "blobs"), index=InMemoryBlobIndex())
+
+def make_retention(store, tmp_path, **kwargs):
+    options = {"archive_after_seconds": 3600, "archive_ttl_seconds": 0, "hot_max_bytes": 10_000}
+    options.update(kwargs)
+    return UploadRetention(store=store, archive_root=str(tmp_path / "archive"), **options)
+
+def age(store, sha256, seconds):
+    store.index.blobs[sha256]["last_accessed_at"] = datetime.utcnow() - timedelta(seconds=seconds)
+
+@pytest.mark.asyncio
+async def test_cold_blobs_are_archived(store, tmp_path):
+    retention = make_retention(store, tmp_path)
+    cold = await store.put(make_upload(b"cold " * 100))
+    warm = await store.put(make_upload(b"warm " * 100))
+    age(store, cold.sha256, 7200)
+
+    result = await retention.run_once()
+    assert result["archived_cold"] == 1
+    assert not os.path.exists(cold.path)
+    assert os.path.exists(warm.path)
+    blob = await store.index.get(cold.sha256)
+    assert blob["tier"] == "archive"
+    assert blob["archive_size"] < blob["size"]
+
+@pytest.mark.asyncio
+async def test_pressure_archives_least_recently_used(store, tmp_path):
+    retention = make_retention(store, tmp_path, archive_after_seconds=0, high_water=0.8, low_water=0.5)
+    stored = [await store.put(make_upload(bytes([i]) * 2000)) for i in range(4)]
+    for i, upload in enumerate(stored):
+        age(store, upload.sha256, 100 - i)
+    aggregations = 0
+    tier_usage = store.index.tier_usage
+
+    async def counting_tier_usage():
+        nonlocal aggregations
+        aggregations += 1
+        return await tier_usage()
+    store.index.tier_usage = counting_tier_usage
+
+    result = await retention.run_once()
+    assert result["archived_pressure"] == 2
+    # Pressure check, start of the sweep and the final reading; archived blobs are subtracted locally
+    assert aggregations == 3
+    tiers = [(await store.index.get(upload.sha256))["tier"] for upload in stored]
+    assert tiers == ["archive", "archive", "hot", "hot"]
+    assert retention.stats()["usage"] <= 0.5
+
+@pytest.mark.asyncio
+async def test_restore_and_reupload(store, tmp_path):
+    retention = make_retention(store, tmp_path)
+    data = b"archived bytes" * 50
+    stored = await store.put(make_upload(data))
+    age(store, stored.sha256, 7200)
+    await retention.run_once()
+
+    results = await asyncio.gather(*(retention.restore(stored.path) for _ in range(3)))
+    assert all(results)
+    assert retention.restored == 1
+    with open(stored.path, "rb") as f:
+        assert f.read() == data
+    blob = await store.index.get(stored.sha256)
+    assert blob["tier"] == "hot"
+    assert "archive_path" not in blob
+
+    age(store, stored.sha256, 7200)
+    await retention.run_once()
+    again = await store.put(make_upload(data))
+    assert again.path == stored.path and os.path.exists(stored.path)
+    assert (await store.index.get(stored.sha256))["tier"] == "hot"
+
+@pytest.mark.asyncio
+async def test_archive_ttl_expires(store, tmp_path):
+    retention = make_retention(store, tmp_path, archive_ttl_seconds=60)
+    stored = await store.put(make_upload(b"old"))
+    age(store, stored.sha256, 7200)
+    await retention.run_once()
+    archive_path = (await store.index.get(stored.sha256))["archive_path"]
+    assert os.path.exists(archive_path)
+
+    store.index.blobs[stored.sha256]["tiered_at"] -= timedelta(seconds=120)
+    result = await retention.run_once()
+    assert result["expired"] == 1
+    assert not os.path.exists(archive_path)
+    assert (await store.index.get(stored.sha256))["tier"] == "expired"
+
+@pytest.mark.asyncio
+async def test_accesses_keep_blobs_hot(store, tmp_path):
+    retention = make_retention(store, tmp_path)
+    stored = await store.put(make_upload(b"popular"))
+    age(store, stored.sha256, 7200)
+    retention.record_access(stored.path)
+    result = await retention.run_once()
+    assert result["accesses"] == 1
+    assert result["archived_cold"] == 0
+
+def test_static_files_restore_archived_blob(store, tmp_path):
+    retention = make_retention(store, tmp_path)
+    data = b"served bytes" * 20
+    stored = asyncio.run(store.put(make_upload(data)))
+    age(store, stored.sha256, 7200)
+    asyncio.run(retention.run_once())
+    assert not os.path.exists(stored.path)
+
+    app = FastAPI()
+    uploads_dir = tmp_path / "uploads"
+    app.mount("/uploads", TieredStaticFiles(directory=str(uploads_dir), retention=retention))
+    url = "/uploads/" + os.path.relpath(stored.path, uploads_dir).replace(os.sep, "/")
+    with TestClient(app) as client:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.content == data
+        assert client.get("/uploads/blobs/missing.jpg").status_code == 404
+    assert stored.sha256 in retention._accessed
+
+@pytest.mark.asyncio
+async def test_readers_restore_and_pin_blobs(store, tmp_path):
+    retention = make_retention(store, tmp_path, archive_after_seconds=0, high_water=0.1, low_water=0.05)
+    data = b"queued video" * 100
+    stored = await store.put(make_upload(data))
+    age(store, stored.sha256, 7200)
+    await retention.run_once()
+    assert not os.path.exists(stored.path)
+
+    # A job or stream reading the blob brings it back and keeps it hot meanwhile
+    async with retention.hot(stored.path) as path:
+        with open(path, "rb") as f:
+            assert f.read() == data
+        result = await retention.run_once()
+        assert result["archived_pressure"] == 0 and os.path.exists(stored.path)
+        assert retention.stats()["pinned"] == 1
+
+    assert retention.stats()["pinned"] == 0
+    assert (await retention.run_once())["archived_pressure"] == 1
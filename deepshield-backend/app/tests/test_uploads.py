@@ -0,0 +1,58 @@
+"""
+Tests for the streaming upload writer
+"""
+import hashlib
+import os
+import pytest
+from fastapi import HTTPException
+from ..services.storage import save_upload_file, max_upload_size
+from ..config import settings
+from .stub_servers import make_upload
+
+@pytest.mark.asyncio
+async def test_streams_and_hashes(tmp_path):
+    data = os.urandom(300_000)
+    stored = await save_upload_file(make_upload(data), str(tmp_path), chunk_size=64 * 1024)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.size == len(data)
+    assert stored.content_type == "image/jpeg"
+    with open(stored.path, "rb") as f:
+        assert f.read() == data
+
+@pytest.mark.asyncio
+async def test_reads_in_fixed_size_chunks(tmp_path):
+    upload = make_upload(b"x" * 10_000)
+    reads = []
+    original_read = upload.read
+
+    async def tracking_read(size: int = -1):
+        reads.append(size)
+        return await original_read(size)
+
+    upload.read = tracking_read
+    await save_upload_file(upload, str(tmp_path), chunk_size=4096)
+    assert reads and all(size == 4096 for size in reads)
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_rejected_and_removed(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        await save_upload_file(make_upload(b"x" * 5000), str(tmp_path), max_size=4096, chunk_size=1024)
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.asyncio
+async def test_declared_size_is_rejected_before_reading(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        await save_upload_file(make_upload(b"", size=10_000), str(tmp_path), max_size=4096)
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.asyncio
+async def test_filename_cannot_escape_directory(tmp_path):
+    stored = await save_upload_file(make_upload(b"data", filename="../../etc/passwd"), str(tmp_path))
+    assert os.path.dirname(stored.path) == str(tmp_path)
+
+def test_limits_by_content_type():
+    assert max_upload_size("video/mp4") == settings.UPLOAD_MAX_VIDEO_BYTES
+    assert max_upload_size("image/png") == settings.UPLOAD_MAX_IMAGE_BYTES
+    assert max_upload_size(None) == settings.UPLOAD_MAX_OTHER_BYTES
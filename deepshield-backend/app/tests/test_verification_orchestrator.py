@@ -0,0 +1,129 @@
+"""
+Tests for the dependency-graph executor of account verification steps
+"""
+import asyncio
+import time
+from datetime import datetime
+import pytest
+from ..models.user import User
+from ..services.verification import (
+    VerificationOrchestrator, StepResultCache, topological_order, COMPLETED, FAILED, SKIPPED
+)
+
+
+class FakeUser:
+    """verify_step sleeps per step and records start/finish times"""
+    def __init__(self, delay=0.05, fail=(), hang=()):
+        self.id = "user1"
+        self.delay = delay
+        self.fail = set(fail)
+        self.hang = set(hang)
+        self.calls = []
+        self.events = {}
+
+    async def verify_step(self, step):
+        self.calls.append(step)
+        self.events[step] = [time.perf_counter(), None]
+        if step in self.hang:
+            await asyncio.sleep(10)
+        await asyncio.sleep(self.delay)
+        self.events[step][1] = time.perf_counter()
+        if step in self.fail:
+            raise RuntimeError(f"{step} broke")
+        return {"success": True, "step": step, "result": {"step": step}}
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    user = FakeUser()
+    report = await VerificationOrchestrator(cache=StepResultCache(ttl=60)).run(user)
+    assert report["success"] and report["completed"] == 5
+    # kyc and profile start together; the other three wait for their dependencies
+    events = user.events
+    assert abs(events["kyc_verification"][0] - events["profile_verification"][0]) < 0.03
+    for step in ("behavioral_analysis", "metadata_analysis"):
+        assert events[step][0] >= events["profile_verification"][1]
+    assert events["image_verification"][0] >= max(events["kyc_verification"][1], events["profile_verification"][1])
+    # Two levels of 50 ms steps instead of five in a row
+    assert report["total_ms"] < 0.7 * report["sequential_ms"]
+    assert all(step["duration_ms"] >= 45 for step in report["steps"].values())
+    assert report["steps"]["image_verification"]["depends_on"] == ["kyc_verification", "profile_verification"]
+
+
+@pytest.mark.asyncio
+async def test_failures_skip_dependents_and_are_not_cached():
+    user = FakeUser(delay=0.0, fail={"profile_verification"})
+    orchestrator = VerificationOrchestrator(cache=StepResultCache(ttl=60))
+    report = await orchestrator.run(user)
+    steps = report["steps"]
+    assert not report["success"]
+    assert steps["kyc_verification"]["status"] == COMPLETED
+    assert steps["profile_verification"]["status"] == FAILED
+    assert steps["profile_verification"]["error"] == "profile_verification broke"
+    for step in ("behavioral_analysis", "metadata_analysis", "image_verification"):
+        assert steps[step]["status"] == SKIPPED
+        assert step not in user.calls
+    assert (report["completed"], report["failed"], report["skipped"]) == (1, 1, 3)
+
+    user.fail.clear()
+    user.calls.clear()
+    report = await orchestrator.run(user)
+    assert report["success"]
+    assert report["steps"]["kyc_verification"]["cached"]
+    assert "kyc_verification" not in user.calls and "profile_verification" in user.calls
+
+
+@pytest.mark.asyncio
+async def test_step_timeout():
+    user = FakeUser(delay=0.0, hang={"kyc_verification"})
+    report = await VerificationOrchestrator(cache=StepResultCache(ttl=0), step_timeout=0.05).run(user)
+    assert report["steps"]["kyc_verification"]["status"] == FAILED
+    assert "Timed out" in report["steps"]["kyc_verification"]["error"]
+    assert report["steps"]["image_verification"]["status"] == SKIPPED
+    assert report["steps"]["behavioral_analysis"]["status"] == COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl_refresh_and_selected_steps():
+    user = FakeUser(delay=0.0)
+    cache = StepResultCache(ttl=0.05)
+    orchestrator = VerificationOrchestrator(cache=cache)
+
+    report = await orchestrator.run(user, ["behavioral_analysis"])
+    assert list(report["steps"]) == ["profile_verification", "behavioral_analysis"]
+    assert user.calls == ["profile_verification", "behavioral_analysis"]
+
+    await orchestrator.run(user, ["behavioral_analysis"])
+    assert len(user.calls) == 2
+    await orchestrator.run(user, ["behavioral_analysis"], refresh=True)
+    assert len(user.calls) == 4
+    await asyncio.sleep(0.06)
+    await orchestrator.run(user, ["behavioral_analysis"])
+    assert len(user.calls) == 6
+
+    cache.invalidate("user1")
+    assert cache.stats()["entries"] == 0
+    with pytest.raises(ValueError):
+        orchestrator.plan(["unknown_step"])
+
+
+def test_dependency_validation():
+    assert topological_order({"b": ("a",), "a": ()}) == ["a", "b"]
+    with pytest.raises(ValueError, match="cycle"):
+        VerificationOrchestrator({"a": ("b",), "b": ("a",)})
+    with pytest.raises(ValueError, match="Unknown"):
+        VerificationOrchestrator({"a": ("missing",)})
+
+
+@pytest.mark.asyncio
+async def test_user_verify_runs_all_steps():
+    user = User(
+        username="test_user", email="test@example.com", full_name="Test User", id="verify-all",
+        is_verified=False, verification_status="pending", created_at=datetime.utcnow()
+    )
+    report = await user.verify(refresh=True)
+    assert report["success"]
+    assert report["steps"]["behavioral_analysis"]["result"] == {"risk_score": 0.1}
+    assert set(report["steps"]) == {
+        "kyc_verification", "profile_verification", "behavioral_analysis", "metadata_analysis", "image_verification"
+    }
@@ -0,0 +1,143 @@
+"""
+Tests for incremental video analysis and the SSE progress stream
+"""
+import asyncio
+import json
+import cv2
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from ..services.ai.admission import AdmissionController
+from ..services.ai.deepfake_detection import DeepfakeDetector
+from ..services.storage import BlobStore, InMemoryBlobIndex
+from ..api.endpoints import ai
+from ..api.deps import get_current_user
+
+def write_video(path, frames):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 32))
+    for i in range(frames):
+        writer.write(np.full((32, 32, 3), i % 256, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+def make_detector(score):
+    detector = DeepfakeDetector()
+    detector._score_image = lambda image: score
+    return detector
+
+@pytest.mark.asyncio
+async def test_iter_video_yields_frames_then_result(tmp_path):
+    detector = make_detector(0.2)
+    events = [event async for event in detector.iter_video(write_video(tmp_path / "a.avi", 23))]
+    frames = [event for event in events if event["type"] == "frame"]
+    assert [event["frame"] for event in frames] == [0, 5, 10, 15, 20]
+    assert frames[-1]["frames_read"] == 23
+    assert frames[0]["total_frames"] == 23
+    result = events[-1]
+    assert result["type"] == "result"
+    assert result["frames_analyzed"] == 23
+    assert result["is_deepfake"] is False
+    assert result["temporal_consistency"] == pytest.approx(1.0)
+    assert "frame_analysis" not in result
+
+@pytest.mark.asyncio
+async def test_early_stop_on_conclusive_verdict(tmp_path):
+    detector = make_detector(0.95)
+    path = write_video(tmp_path / "b.avi", 200)
+    events = [event async for event in detector.iter_video(path, early_stop=True)]
+    result = events[-1]
+    assert result["truncated"] and result["truncation_reason"] == "conclusive"
+    assert result["is_deepfake"]
+    assert result["frames_analyzed"] < 200
+
+    full = await detector.analyze_video(path)
+    assert not full["truncated"]
+    assert full["frames_analyzed"] == 200
+    assert len(full["frame_analysis"]) == 40
+
+@pytest.mark.asyncio
+async def test_sse_endpoint_streams_events(tmp_path, monkeypatch):
+    store = BlobStore(root=str(tmp_path / "blobs"), index=InMemoryBlobIndex())
+    monkeypatch.setattr(ai, "deepfake_detector", make_detector(0.1))
+    monkeypatch.setattr(ai, "blob_store", store)
+    monkeypatch.setattr(ai, "admission_controller", AdmissionController(max_in_flight=1, max_queue=0))
+    app = FastAPI()
+    app.include_router(ai.router, prefix="/api/v1/ai")
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "user"}
+
+    with open(write_video(tmp_path / "c.avi", 12), "rb") as f:
+        video = f.read()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/ai/analyze/video/stream",
+            files={"file": ("c.avi", video, "video/x-msvideo")}
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    names = [block.split("\n")[0].removeprefix("event: ") for block in blocks]
+    assert names == ["frame", "frame", "frame", "result"]
+    result = json.loads(blocks[-1].split("\n")[1].removeprefix("data: "))
+    assert result["frames_analyzed"] == 12 and result["is_deepfake"] is False
+
+    # The unflagged upload is released and the inference slot freed
+    assert all(blob["refcount"] == 0 for blob in store.index.blobs.values())
+    assert ai.admission_controller.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_sse_endpoint_requires_video(monkeypatch):
+    app = FastAPI()
+    app.include_router(ai.router, prefix="/api/v1/ai")
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "user"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/ai/analyze/video/stream",
+            files={"file": ("a.png", b"png", "image/png")}
+        )
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_sse_stream_released_when_client_leaves_before_body(tmp_path, monkeypatch):
+    store = BlobStore(root=str(tmp_path / "blobs"), index=InMemoryBlobIndex())
+    monkeypatch.setattr(ai, "deepfake_detector", make_detector(0.1))
+    monkeypatch.setattr(ai, "blob_store", store)
+    monkeypatch.setattr(ai, "admission_controller", AdmissionController(max_in_flight=1, max_queue=0))
+    monkeypatch.setattr(ai, "DISCONNECT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(ai, "STREAM_RELEASE_GRACE_SECONDS", 0.05)
+    app = FastAPI()
+    app.include_router(ai.router, prefix="/api/v1/ai")
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "user"}
+
+    with open(write_video(tmp_path / "d.avi", 12), "rb") as f:
+        video = f.read()
+    request = httpx.Request(
+        "POST", "http://test/api/v1/ai/analyze/video/stream", files={"file": ("d.avi", video, "video/x-msvideo")}
+    )
+    body = request.read()
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        # The connection is gone by the time the response starts
+        raise OSError("connection reset")
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/v1/ai/analyze/video/stream", "raw_path": b"",
+        "root_path": "", "query_string": b"", "server": ("test", 80), "client": ("client", 1),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in request.headers.items()],
+    }
+    with pytest.raises(Exception):
+        await app(scope, receive, send)
+
+    for _ in range(100):
+        if ai.admission_controller.in_flight == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert ai.admission_controller.in_flight == 0
+    assert all(blob["refcount"] == 0 for blob in store.index.blobs.values())
@@ -0,0 +1,71 @@
+"""
+Benchmark concurrent InstagramAPI Graph API calls against the local stub server
+
+Usage: python -m benchmarks.bench_instagram [--requests N] [--concurrency C] [--latency S] [--calls-per-hour R] [--cache]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.api.http_client import PooledHTTPClient
+from app.services.api.instagram import InstagramAPI
+from app.services.api.graph_cache import GraphResponseCache
+from app.services.api.graph_rate_limiter import GraphRateLimiter
+from app.tests.stub_servers import GraphAPIStubServer
+
+
+async def run(total: int, concurrency: int, latency: float, calls_per_hour: float, cache: bool) -> None:
+    server = GraphAPIStubServer(latency=latency)
+    base_url = await server.start()
+    client = PooledHTTPClient(pool_size=concurrency)
+    limiter = GraphRateLimiter(calls_per_hour=calls_per_hour, burst=concurrency)
+    api = InstagramAPI(http_client=client, rate_limiter=limiter, cache=GraphResponseCache(ttls=None if cache else {}))
+    api.base_url = base_url
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> bool:
+        async with semaphore:
+            start = time.perf_counter()
+            if i % 2:
+                result = await api.get_media_insights(f"media_{i}")
+            else:
+                result = await api.verify_profile(f"user_{i}")
+            latencies.append(time.perf_counter() - start)
+            return result.get("success", result.get("verified"))
+
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+        await server.stop()
+
+    latencies.sort()
+    print(f"requests:     {total} (concurrency {concurrency}, stub latency {latency * 1000:.0f} ms)")
+    print(f"succeeded:    {sum(bool(result) for result in results)}")
+    print(f"elapsed:      {elapsed:.3f} s")
+    print(f"throughput:   {total / elapsed:.1f} req/s")
+    print(f"latency p50:  {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"latency p95:  {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms")
+    print(f"connections:  {len(server.peers)}")
+    print(f"graph calls:  {len(server.requests)} (cache {api.cache.stats()})")
+    print(f"rate limit:   {calls_per_hour:.0f} calls/h, waited {sum(limiter.waited_seconds.values()):.2f} s in total")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--calls-per-hour", type=float, default=3600 * 10000)
+    parser.add_argument("--cache", action="store_true", help="Enable the response cache (per-endpoint TTLs from settings)")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency, args.calls_per_hour, args.cache))
+
+
+if __name__ == "__main__":
+    main()
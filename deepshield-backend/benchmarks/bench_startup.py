@@ -0,0 +1,108 @@
+"""
+Benchmark API startup: import time of app.main and peak RSS after import
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters and
+reports the cumulative import time, import self-time per top-level package
+and the peak resident set size. Use --output to append a JSON line per run so the
+numbers can be tracked over time.
+
+Usage: python -m benchmarks.bench_startup [--runs N] [--top K] [--output FILE]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported just to serve non-AI routes
+HEAVY_MODULES = ("torch", "transformers", "deepface", "tensorflow", "facenet_pytorch", "hatesonar", "nudenet")
+
+PROBE = (
+    "import resource, sys, json\n"
+    "import app.main\n"
+    "print(json.dumps({\n"
+    "    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,\n"
+    f"    'heavy_modules': [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+    "}))\n"
+)
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_once() -> dict:
+    """Import app.main in a fresh interpreter and parse -X importtime output"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)},
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr[-2000:])
+
+    cumulative = {}
+    top_level = {}
+    by_package = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, total_us, indent, module = match.groups()
+        cumulative[module] = int(total_us)
+        package = module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us)
+        # Nesting depth is encoded as two spaces per level after the bar
+        if len(indent) == 1:
+            top_level[module] = int(total_us)
+
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        "app_main_ms": cumulative.get("app.main", 0) / 1000,
+        "total_ms": sum(top_level.values()) / 1000,
+        "max_rss_mb": probe["max_rss_kb"] / 1024,
+        "heavy_modules": probe["heavy_modules"],
+        "package_ms": {package: us / 1000 for package, us in by_package.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="Append a JSON summary line to this file")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    summary = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "app_main_ms_median": statistics.median(r["app_main_ms"] for r in runs),
+        "total_import_ms_median": statistics.median(r["total_ms"] for r in runs),
+        "max_rss_mb_median": statistics.median(r["max_rss_mb"] for r in runs),
+        "heavy_modules": runs[-1]["heavy_modules"],
+    }
+
+    print(f"import app.main:   {summary['app_main_ms_median']:.1f} ms (median of {args.runs})")
+    print(f"all imports:       {summary['total_import_ms_median']:.1f} ms")
+    print(f"peak RSS:          {summary['max_rss_mb_median']:.1f} MB")
+    print(f"heavy ML modules:  {', '.join(summary['heavy_modules']) or 'none'}")
+    print("slowest packages (import self-time):")
+    slowest = sorted(runs[-1]["package_ms"].items(), key=lambda item: item[1], reverse=True)
+    for module, ms in slowest[:args.top]:
+        print(f"  {ms:9.1f} ms  {module}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    main()
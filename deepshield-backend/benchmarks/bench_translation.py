@@ -0,0 +1,62 @@
+"""
+Benchmark concurrent TranslationAPI calls against the local stub server
+
+Usage: python -m benchmarks.bench_translation [--requests N] [--concurrency C] [--latency S]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.api.http_client import PooledHTTPClient
+from app.services.api.translation import TranslationAPI
+from app.tests.stub_servers import TranslationStubServer
+
+
+async def run(total: int, concurrency: int, latency: float) -> None:
+    server = TranslationStubServer(latency=latency)
+    base_url = await server.start()
+    client = PooledHTTPClient(pool_size=concurrency)
+    api = TranslationAPI(http_client=client)
+    api.api_key = "bench-key"
+    api.base_url = base_url
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> bool:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await api.translate_text(f"texto {i}", "en", "es")
+            latencies.append(time.perf_counter() - start)
+            return result["success"]
+
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+        await server.stop()
+
+    latencies.sort()
+    print(f"requests:     {total} (concurrency {concurrency}, stub latency {latency * 1000:.0f} ms)")
+    print(f"succeeded:    {sum(results)}")
+    print(f"elapsed:      {elapsed:.3f} s")
+    print(f"throughput:   {total / elapsed:.1f} req/s")
+    print(f"latency p50:  {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"latency p95:  {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms")
+    print(f"connections:  {len(server.peers)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()